@@ -0,0 +1,98 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.core.models import Task, UsageReservation
+from apps.core.models.task import TASK_RUNNING_STATUS
+from apps.agent_management.services.task_processor import TaskProcessor
+
+logger = logging.getLogger(__name__)
+
+# Seconds between writes of download progress to the task
+DOWNLOAD_PROGRESS_INTERVAL = 2
+
+
+class DownloadProgress:
+    """Thread-safe byte counter for download callbacks, drained periodically by the job thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def __call__(self, nbytes):
+        with self._lock:
+            self._pending += nbytes
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, 0
+        return pending
+
+
+def _prefetch(asset, progress):
+    try:
+        return asset.get_file_path(progress)
+    finally:
+        # Resolving a storage key writes to the database; release this pool thread's connection
+        close_old_connections()
+
+
+def prefetch_assets(task):
+    """Stream the task's assets into the asset cache, recording bytes received on the task.
+
+    Extraction then reads the cached copies. A download that fails here is only logged;
+    extraction tries it again and records the failure against the asset.
+    """
+    progress = DownloadProgress()
+    with ThreadPoolExecutor(max_workers=settings.ASSET_PREFETCH_CONCURRENCY) as executor:
+        pending = {executor.submit(_prefetch, asset, progress): asset for asset in task.assets.all()}
+        while pending:
+            done, _ = wait(pending, timeout=DOWNLOAD_PROGRESS_INTERVAL)
+            task.record_download_progress(progress.take())
+            for future in done:
+                asset = pending.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Prefetch of asset {asset.id} for task {task.id} failed: {e}")
+
+
+def process_task_job(job):
+    """Job handler that runs TaskProcessor for the job's task and tracks its status"""
+    task = job.task
+    if task is None:
+        raise ValueError(f"Job {job.id} has no task attached")
+
+    task.status = TASK_RUNNING_STATUS.RUNNING
+    task.started_at = timezone.now()
+    task.completed_at = None
+    task.total_files = task.assets.count()
+    task.processed_files = 0
+    task.failed_files = 0
+    task.downloaded_bytes = 0
+    task.results_prefix = None
+    task.llm_cache_hits = 0
+    task.llm_cache_misses = 0
+    task.save(update_fields=[
+        'status', 'started_at', 'completed_at', 'total_files', 'processed_files', 'failed_files',
+        'downloaded_bytes', 'results_prefix', 'llm_cache_hits', 'llm_cache_misses', 'updated_at'
+    ])
+
+    task.clear_results()
+
+    try:
+        prefetch_assets(task)
+        processor = TaskProcessor()
+        structured_output = processor.process(task)
+    except Exception:
+        Task.objects.filter(id=task.id).update(status=TASK_RUNNING_STATUS.FAILED, completed_at=timezone.now())
+        raise
+
+    Task.objects.filter(id=task.id).update(status=TASK_RUNNING_STATUS.COMPLETED, completed_at=timezone.now())
+    UsageReservation.settle(job.payload.get('reservation_id'), success=True)
+    logger.info(f"Task {task.id} finished processing")
+    return {'results_url': structured_output.get('results_url'), 'llm_cache': structured_output.get('llm_cache')}
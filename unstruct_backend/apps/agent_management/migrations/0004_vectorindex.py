@@ -0,0 +1,40 @@
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agent_management', '0003_modelconfiguration_organization_and_more'),
+        ('core', '0035_task_downloaded_bytes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VectorIndex',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('IMAGE', 'Image'), ('TEXT', 'Text')], max_length=20)),
+                ('index_key', models.CharField(max_length=64)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('embedding_model', models.CharField(max_length=200)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('table_name', models.CharField(blank=True, max_length=200)),
+                ('item_count', models.IntegerField(default=0)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_items', to='core.organization')),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('kind', 'index_key'), name='agent_vectorindex_kind_key_uniq')],
+            },
+        ),
+    ]
@@ -1,3 +1,16 @@
+from .completion_cache import CompletionCacheEntry
+from .gemini_upload import GeminiUpload
 from .model_configuration import ModelConfiguration
+from .rate_limit_bucket import RateLimitBucket
+from .transcript import Transcript
+from .vector_index import VectorIndex, VECTOR_INDEX_KIND
 
-__all__ = ["ModelConfiguration"]
+__all__ = [
+    "CompletionCacheEntry",
+    "GeminiUpload",
+    "ModelConfiguration",
+    "RateLimitBucket",
+    "Transcript",
+    "VectorIndex",
+    "VECTOR_INDEX_KIND",
+]
@@ -0,0 +1,31 @@
+from django.db import models
+
+from apps.common.models import NBaseModel
+
+
+class CompletionCacheEntry(NBaseModel):
+    """A stored LLM response, reused when the same request is made again within an organization.
+
+    `cache_key` fingerprints everything that determines the response: model, temperature,
+    the rendered prompt messages (including retrieved context) and the asset's content hash.
+    Entries are evicted least recently used first once an organization's entries exceed
+    LLM_CACHE_MAX_BYTES_PER_ORG.
+    """
+
+    cache_key = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=200)
+    response = models.TextField()
+    size = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["organization", "cache_key"], name="agent_completion_org_key_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["organization", "last_used_at"], name="agent_completion_lru_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.cache_key[:12]}"
@@ -0,0 +1,31 @@
+from django.db import models
+
+from apps.common.models import NBaseModel
+
+
+class GeminiUpload(NBaseModel):
+    """A file uploaded to the Gemini Files API, shared by every worker using the same API key.
+
+    Keyed by the file's content hash, so changed content gets a new upload and identical
+    files are uploaded once. Gemini deletes uploads after `expires_at`; entries close to
+    expiry are uploaded again instead of being reused.
+    """
+
+    api_key_hash = models.CharField(max_length=64)
+    content_hash = models.CharField(max_length=64)
+    file_name = models.CharField(max_length=200)
+    uri = models.CharField(max_length=500)
+    mime_type = models.CharField(max_length=100)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["api_key_hash", "content_hash"], name="agent_geminiupload_key_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.content_hash[:12]})"
+
+    def as_part(self) -> dict:
+        """Content part referencing the uploaded file, accepted by generate_content"""
+        return {"file_data": {"mime_type": self.mime_type, "file_uri": self.uri}}
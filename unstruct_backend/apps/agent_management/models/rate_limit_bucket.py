@@ -0,0 +1,21 @@
+from django.db import models
+
+from apps.common.models import NBaseModel
+
+
+class RateLimitBucket(NBaseModel):
+    """Shared token bucket for one provider and API key, so every worker draws from the same budget.
+
+    `requests` and `tokens` are what is left as of `refilled_at`; callers refill them for the
+    time elapsed under a row lock before taking from them. After a 429, `blocked_until`
+    holds every caller back until the provider's Retry-After has passed.
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    requests = models.FloatField(default=0.0)
+    tokens = models.FloatField(default=0.0)
+    refilled_at = models.DateTimeField()
+    blocked_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,30 @@
+from django.db import models
+
+from apps.common.models import NBaseModel
+
+
+class Transcript(NBaseModel):
+    """Transcript of one piece of audio by one transcriber, shared by every asset with that content.
+
+    `words` holds {"word", "start", "end"} entries with times in seconds from the start of
+    the file, and `segments` groups them into {"start", "end", "text"} spans that are
+    indexed for retrieval, so extraction references can point to a time in the recording.
+    """
+
+    content_hash = models.CharField(max_length=64)
+    transcriber = models.CharField(max_length=100)
+    text = models.TextField(blank=True)
+    words = models.JSONField(default=list, blank=True)
+    segments = models.JSONField(default=list, blank=True)
+    duration = models.FloatField(default=0.0)
+    chunk_count = models.IntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_hash", "transcriber"], name="agent_transcript_content_transcriber_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.transcriber} {self.content_hash[:12]}"
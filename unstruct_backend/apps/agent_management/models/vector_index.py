@@ -0,0 +1,34 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from apps.common.models import NBaseModel
+
+
+class VECTOR_INDEX_KIND(models.TextChoices):
+    IMAGE = "IMAGE", _("Image")
+    TEXT = "TEXT", _("Text")
+
+
+class VectorIndex(NBaseModel):
+    """Manifest entry for a complete LanceDB table built from one piece of content.
+
+    `index_key` fingerprints everything that determines the table's vectors: the content
+    hash, the embedding model and the parameters used to extract and chunk items. Assets
+    with identical content share the entry. A table is only recorded here once fully built.
+    """
+
+    kind = models.CharField(max_length=20, choices=VECTOR_INDEX_KIND.choices)
+    index_key = models.CharField(max_length=64)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    embedding_model = models.CharField(max_length=200)
+    params = models.JSONField(default=dict, blank=True)
+    table_name = models.CharField(max_length=200, blank=True)
+    item_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "index_key"], name="agent_vectorindex_kind_key_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.table_name or '(empty)'}"
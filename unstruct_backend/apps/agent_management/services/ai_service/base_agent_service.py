@@ -1,12 +1,121 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from concurrent.futures import as_completed
+from typing import Any, Dict, List
 
-from apps.core.models import Task
+from django.conf import settings
+
+from apps.core.models import Action, Asset, Task
+
+from .concurrency import submit_llm_call
+from .field_batching import EXTRACTION_MODE_MULTI_FIELD, batch_actions
+
+logger = logging.getLogger(__name__)
 
 
 class BaseAgentService(ABC):
+    # Key into settings.LLM_MAX_IN_FLIGHT, shared by every service calling the same provider
+    provider: str = "default"
+    handlers: Dict[str, Any] = {}
+
     @abstractmethod
     def process_task(self, task: Task) -> Dict[str, Any]:
         """
         Process the given task and return structured output.
         """
+
+    @abstractmethod
+    def extract_field(self, handler: Any, action: Action, asset: Asset) -> Dict[str, Any]:
+        """
+        Extract a single field from a single asset and return the parsed response.
+        """
+
+    def extract_field_batch(self, handler: Any, actions: List[Action], asset: Asset) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract several fields from one asset, keyed by field name.
+
+        Services that can ask for a batch in a single call override this; by default each
+        field is extracted on its own.
+        """
+        return {action.output_column_name: self.extract_field(handler, action, asset) for action in actions}
+
+    def get_extraction_units(self, handler: Any, actions: List[Action]) -> List[List[Action]]:
+        """
+        Group actions into the units sent to the model: one per field, or a few
+        context-sized batches when multi-field mode is enabled and the handler supports it.
+        """
+        if settings.EXTRACTION_MODE == EXTRACTION_MODE_MULTI_FIELD and getattr(handler, "supports_multi_field", False):
+            return batch_actions(actions)
+        return [[action] for action in actions]
+
+    def extract_unit(self, handler: Any, unit: List[Action], asset: Asset) -> Dict[str, Dict[str, Any]]:
+        if len(unit) == 1:
+            return {unit[0].output_column_name: self.extract_field(handler, unit[0], asset)}
+        return self.extract_field_batch(handler, unit, asset)
+
+    def extract_fields(self, task: Task, actions: List[Action]) -> Dict[str, Any]:
+        """
+        Schedule every extraction unit of every asset at once on the provider executor.
+        Each field's results keep the task's asset order regardless of completion order.
+        """
+        actions = list(actions)
+        results = {action.output_column_name: [] for action in actions}
+        try:
+            assets = list(task.assets.all())
+            slots = {action.output_column_name: [None] * len(assets) for action in actions}
+            responses = {}
+            pending = {}
+            remaining = {}
+            failed = {}
+
+            for asset_index, asset in enumerate(assets):
+                handler = self.handlers.get(asset.file_type)
+                if not handler:
+                    logger.warning(f"No handler found for asset type: {asset.file_type}")
+                    task.record_file_result(failed=True)
+                    continue
+                units = self.get_extraction_units(handler, actions)
+                remaining[asset_index] = len(units)
+                failed[asset_index] = False
+                responses[asset_index] = []
+                for unit in units:
+                    future = submit_llm_call(self.provider, self.extract_unit, handler, unit, asset)
+                    pending[future] = (asset_index, unit)
+
+            for future in as_completed(pending):
+                asset_index, unit = pending[future]
+                asset = assets[asset_index]
+                try:
+                    unit_results = future.result()
+                except Exception as e:
+                    field_names = ", ".join(action.output_column_name for action in unit)
+                    logger.error(f"Error extracting field(s) {field_names} from asset {asset.id}: {e}")
+                    unit_results = {action.output_column_name: {"error": str(e)} for action in unit}
+
+                for action in unit:
+                    parsed_response = unit_results.get(action.output_column_name, {"error": "No result returned"})
+                    if "error" in parsed_response:
+                        failed[asset_index] = True
+                    responses[asset_index].append((action, parsed_response))
+                    slots[action.output_column_name][asset_index] = {
+                        "asset": asset.name,
+                        "data": parsed_response,
+                        "source": asset.url,
+                    }
+
+                # An asset counts as processed, and its results are stored, once all of its fields are done
+                remaining[asset_index] -= 1
+                if remaining[asset_index] == 0:
+                    task.record_asset_results(
+                        asset, asset_index, responses.pop(asset_index), failed=failed[asset_index]
+                    )
+
+            results = {
+                field_name: [item for item in items if item is not None]
+                for field_name, items in slots.items()
+            }
+        except Exception as e:
+            logger.error(f"Error extracting fields for task {task.id}: {e}")
+            results["error"] = str(e)
+
+        return results
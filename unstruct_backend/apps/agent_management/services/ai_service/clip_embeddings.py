@@ -0,0 +1,88 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _batches(items: List, size: int) -> List[List]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class CLIPEmbeddings(Embeddings):
+    """OpenCLIP embeddings that encode images and texts in batches.
+
+    Produces the same normalized vectors as langchain's OpenCLIPEmbeddings, but instead of
+    one forward pass per item, images are decoded and preprocessed on a thread pool while
+    the previous batch runs through the model, and each forward pass covers `batch_size`
+    items.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "ViT-B-32",
+        checkpoint: str = "openai",
+        batch_size: int = 32,
+        preprocess_workers: int = 4,
+        torch_threads: int = 0,
+    ):
+        import open_clip
+        import torch
+
+        if torch_threads:
+            # Intra-op threads for the forward pass; preprocessing has its own pool
+            torch.set_num_threads(torch_threads)
+        self.model, _, self.preprocess = open_clip.create_model_and_transforms(model_name, pretrained=checkpoint)
+        self.model.eval()
+        self.tokenizer = open_clip.get_tokenizer(model_name)
+        self.batch_size = batch_size
+        self.preprocess_workers = preprocess_workers
+        # One forward pass at a time: each already uses every torch thread, and indexing
+        # of different assets shares this model
+        self._model_lock = threading.Lock()
+        logger.info(
+            f"Loaded CLIP {model_name}/{checkpoint} (batch size {batch_size}, torch threads {torch.get_num_threads()})"
+        )
+
+    def _load_image(self, uri: str):
+        from PIL import Image
+
+        with Image.open(uri) as image:
+            return self.preprocess(image.convert("RGB"))
+
+    def _encode(self, encode, inputs) -> List[List[float]]:
+        import torch
+
+        with self._model_lock, torch.inference_mode():
+            features = encode(inputs)
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.tolist()
+
+    def embed_image(self, uris: List[str]) -> List[List[float]]:
+        import torch
+
+        if not uris:
+            return []
+        embeddings = []
+        batches = _batches(list(uris), self.batch_size)
+        with ThreadPoolExecutor(max_workers=self.preprocess_workers) as executor:
+            futures = [executor.submit(self._load_image, uri) for uri in batches[0]]
+            for index in range(len(batches)):
+                tensors = [future.result() for future in futures]
+                # Decode the next batch while this one is in the model
+                if index + 1 < len(batches):
+                    futures = [executor.submit(self._load_image, uri) for uri in batches[index + 1]]
+                embeddings.extend(self._encode(self.model.encode_image, torch.stack(tensors)))
+        return embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for batch in _batches(list(texts), self.batch_size):
+            embeddings.extend(self._encode(self.model.encode_text, self.tokenizer(batch)))
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
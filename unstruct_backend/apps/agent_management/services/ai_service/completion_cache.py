@@ -0,0 +1,176 @@
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.agent_management.models import CompletionCacheEntry
+from apps.common.utils.asset_cache import get_asset_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the key layout changes so old entries stop matching
+KEY_VERSION = 1
+
+_current_session: contextvars.ContextVar = contextvars.ContextVar("completion_cache_session", default=None)
+
+
+def _render_part(part: Any) -> Any:
+    if isinstance(part, str):
+        return part
+    content = getattr(part, "content", None)
+    if content is not None:
+        # LangChain messages, including retrieved chunks and base64 images
+        return {"type": getattr(part, "type", type(part).__name__), "content": content}
+    # Uploaded files and PIL images are the asset itself; its content hash stands in for them
+    return {"type": type(part).__name__}
+
+
+def render_prompt(prompt: Any) -> Any:
+    """JSON-serializable form of a prompt as sent to the provider"""
+    if isinstance(prompt, dict):
+        prompt = prompt.get("parts", [])
+    if isinstance(prompt, (list, tuple)):
+        return [_render_part(part) for part in prompt]
+    return _render_part(prompt)
+
+
+def completion_key(model: str, temperature: Optional[float], prompt: Any, content_hash: str) -> str:
+    payload = {
+        "version": KEY_VERSION,
+        "model": model,
+        "temperature": temperature,
+        "prompt": render_prompt(prompt),
+        "content": content_hash,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CompletionCacheSession:
+    """Completion cache lookups for one task run, scoped to the task's organization.
+
+    Counts hits and misses so they can be reported on the task. Shared by the provider
+    executor threads extracting the task's fields.
+    """
+
+    def __init__(self, organization_id):
+        self.organization_id = organization_id
+        self.hits = 0
+        self.misses = 0
+        self._content_hashes: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, asset) -> str:
+        # Fields of an asset share one hash; cached blob paths are named by their hash
+        with self._lock:
+            content_hash = self._content_hashes.get(asset.id)
+        if content_hash is None:
+            content_hash = get_asset_cache().content_hash(asset.get_file_path())
+            with self._lock:
+                self._content_hashes[asset.id] = content_hash
+        return content_hash
+
+    def get(self, key: str) -> Optional[str]:
+        entry = (
+            CompletionCacheEntry.objects.filter(organization_id=self.organization_id, cache_key=key)
+            .only("id", "response")
+            .first()
+        )
+        if entry is None:
+            return None
+        CompletionCacheEntry.objects.filter(id=entry.id).update(hits=F("hits") + 1, last_used_at=timezone.now())
+        return entry.response
+
+    def set(self, key: str, model: str, response: str):
+        try:
+            with transaction.atomic():
+                CompletionCacheEntry.objects.create(
+                    organization_id=self.organization_id,
+                    cache_key=key,
+                    model_name=model,
+                    response=response,
+                    size=len(response.encode("utf-8")),
+                )
+        except IntegrityError:
+            # Stored meanwhile by a concurrent run of the same request
+            pass
+
+    def complete(
+        self, model: str, temperature: Optional[float], prompt: Any, asset, call: Callable[[], str],
+        cacheable: Callable[[str], bool] = None,
+    ) -> str:
+        key = completion_key(model, temperature, prompt, self.content_hash(asset))
+        response = self.get(key)
+        with self._lock:
+            if response is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if response is not None:
+            return response
+        response = call()
+        if cacheable is None or cacheable(response):
+            self.set(key, model, response)
+        return response
+
+
+@contextmanager
+def completion_cache_session(task):
+    """Serve the task's LLM calls from the completion cache while the block runs.
+
+    The session is held in a context variable, which submit_llm_call carries over to the
+    provider executor threads. Yields None when the cache is disabled.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        yield None
+        return
+    session = CompletionCacheSession(task.organization_id)
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+
+
+def cached_completion(
+    model: str, temperature: Optional[float], prompt: Any, asset, call: Callable[[], str],
+    cacheable: Callable[[str], bool] = None,
+) -> str:
+    """Return the cached response for this request, or make it with `call`.
+
+    The new response is stored unless `cacheable` rejects it, so a malformed answer is
+    asked for again on the next run instead of being replayed.
+    """
+    session = _current_session.get()
+    if session is None:
+        return call()
+    return session.complete(model, temperature, prompt, asset, call, cacheable)
+
+
+def evict_completions(organization_id, max_bytes: int) -> int:
+    """Delete an organization's least recently used entries past `max_bytes`; returns the number removed"""
+    if not max_bytes:
+        return 0
+    entries = CompletionCacheEntry.all_objects.filter(organization_id=organization_id)
+    total = entries.aggregate(total=Sum("size"))["total"] or 0
+    if total <= max_bytes:
+        return 0
+
+    kept = 0
+    stale = []
+    for entry_id, size in entries.order_by("-last_used_at").values_list("id", "size").iterator():
+        if kept + size <= max_bytes and not stale:
+            kept += size
+        else:
+            stale.append(entry_id)
+    removed, _ = CompletionCacheEntry.all_objects.filter(id__in=stale).delete()
+    logger.info(f"Evicted {removed} completion cache entries of organization {organization_id}")
+    return removed
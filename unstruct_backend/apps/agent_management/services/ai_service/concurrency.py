@@ -0,0 +1,49 @@
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_max_in_flight(provider: str) -> int:
+    """Maximum number of concurrent LLM calls allowed for a provider in this process"""
+    return settings.LLM_MAX_IN_FLIGHT.get(provider, settings.LLM_DEFAULT_MAX_IN_FLIGHT)
+
+
+def get_provider_executor(provider: str) -> ThreadPoolExecutor:
+    """Return the process-wide executor for a provider.
+
+    The executor is shared by every task running in the process, so its size is the
+    provider's max-in-flight limit regardless of how many tasks fan out at once.
+    """
+    with _executors_lock:
+        executor = _executors.get(provider)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=get_max_in_flight(provider),
+                thread_name_prefix=f"llm-{provider}",
+            )
+            _executors[provider] = executor
+        return executor
+
+
+def submit_llm_call(provider: str, fn: Callable, *args, **kwargs) -> Future:
+    """Schedule `fn` on the provider executor, releasing Django DB connections around it.
+
+    `fn` runs in a copy of the caller's context, so context variables such as the task's
+    completion cache session reach the executor thread.
+    """
+
+    def _run():
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return get_provider_executor(provider).submit(contextvars.copy_context().run, _run)
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List
+
+from django.conf import settings
+
+from apps.core.models import Action
+
+EXTRACTION_MODE_PER_FIELD = "per_field"
+EXTRACTION_MODE_MULTI_FIELD = "multi_field"
+
+# Rough size of the JSON the model writes back for one field (value, confidence, reference)
+RESPONSE_TOKENS_PER_FIELD = 80
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting prompts"""
+    return len(text) // 4 + 1
+
+
+def render_field_spec(action: Action) -> str:
+    return f"Field: {action.output_column_name}\nDescription: {action.description}"
+
+
+def batch_actions(actions: List[Action], max_fields: int = None, token_budget: int = None) -> List[List[Action]]:
+    """Split actions into batches that each fit one multi-field extraction call.
+
+    A batch is closed when adding the next field would exceed either the field count limit
+    or the token budget for the field list plus the expected JSON response.
+    """
+    max_fields = max_fields or settings.EXTRACTION_MAX_FIELDS_PER_CALL
+    token_budget = token_budget or settings.EXTRACTION_BATCH_TOKEN_BUDGET
+
+    batches = []
+    current = []
+    current_tokens = 0
+    for action in actions:
+        cost = estimate_tokens(render_field_spec(action)) + RESPONSE_TOKENS_PER_FIELD
+        if current and (len(current) >= max_fields or current_tokens + cost > token_budget):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(action)
+        current_tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def render_field_list(actions: List[Action]) -> str:
+    return "\n\n".join(render_field_spec(action) for action in actions)
+
+
+def render_response_schema(actions: List[Action]) -> str:
+    lines = []
+    for action in actions:
+        name = action.output_column_name
+        lines.append(f'    "{name}": "<extracted value>",')
+        lines.append(f'    "{name}_confidence": <confidence score>,')
+        lines.append(f'    "{name}_reference": "<reference>",')
+    lines[-1] = lines[-1].rstrip(",")
+    return "{\n" + "\n".join(lines) + "\n}"
+
+
+def build_retrieval_query(actions: List[Action]) -> str:
+    return " ".join(f"{action.output_column_name} {action.description}" for action in actions)
+
+
+def split_multi_field_response(parsed: Dict[str, Any], actions: List[Action]) -> Dict[str, Dict[str, Any]]:
+    """Split one multi-field JSON response into the per-field shape used by single-field extraction"""
+    if "error" in parsed and not any(action.output_column_name in parsed for action in actions):
+        return {action.output_column_name: dict(parsed) for action in actions}
+
+    results = {}
+    for action in actions:
+        name = action.output_column_name
+        if name not in parsed:
+            results[name] = {"error": f"Field '{name}' missing from response"}
+            continue
+        results[name] = {
+            name: parsed.get(name),
+            f"{name}_confidence": parsed.get(f"{name}_confidence"),
+            f"{name}_reference": parsed.get(f"{name}_reference"),
+        }
+    return results
+
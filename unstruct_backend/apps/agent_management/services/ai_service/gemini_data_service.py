@@ -12,6 +12,10 @@ from langchain_core.messages import HumanMessage
 from apps.core.models import Action, Asset, Task, ASSET_FILE_TYPE
 from apps.core.models.action import ACTION_TYPE
 from .base_agent_service import BaseAgentService
+from .completion_cache import cached_completion
+from .gemini_uploads import GeminiUploadRegistry
+from .rate_limit import estimate_prompt_tokens, get_rate_limiter
+from .field_batching import estimate_tokens, render_field_list, render_response_schema, split_multi_field_response
 from .vector_store import VectorStore
 import os
 
@@ -40,32 +44,59 @@ Respond in JSON format:
 }}
 """
 
+MULTI_FIELD_DOCUMENT_HUMAN_TEMPLATE = """
+Extract the following fields from the given document:
+
+{fields}
+
+For each field provide:
+1. The extracted value
+2. A confidence score (0-1)
+3. Reference location in document
+
+Respond with a single JSON object:
+{schema}
+"""
+
 # Similar templates for other content types...
 
 class GeminiExtractionHandler:
     """Base class for handling different asset types in Gemini."""
+    # Handlers that set this implement construct_multi_field_prompt(actions, asset)
+    supports_multi_field = False
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
 
     def construct_prompt(self, field_name: str, description: str, asset: Asset) -> str:
         raise NotImplementedError
 
+    def single_field_text(self, field_name: str, description: str) -> str:
+        return f"{DOCUMENT_SYSTEM_TEMPLATE}\n\n{DOCUMENT_HUMAN_TEMPLATE.format(field_name=field_name, description=description)}"
+
+    def multi_field_text(self, actions: List[Action]) -> str:
+        human_prompt = MULTI_FIELD_DOCUMENT_HUMAN_TEMPLATE.format(
+            fields=render_field_list(actions),
+            schema=render_response_schema(actions),
+        )
+        return f"{DOCUMENT_SYSTEM_TEMPLATE}\n\n{human_prompt}"
+
 
 class GeminiDocumentHandler(GeminiExtractionHandler):
-    def __init__(self):
+    supports_multi_field = True
+
+    def __init__(self, uploads: GeminiUploadRegistry):
         self.logger = logging.getLogger(__name__)
-        self.cache = dict()
+        self.uploads = uploads
+
+    def get_file_part(self, asset: Asset):
+        # Uploads are shared by content hash across fields, tasks and workers until they near expiry
+        return self.uploads.get(asset.get_document_from_asset()).as_part()
 
     def construct_prompt(self, field_name: str, description: str, asset: Asset) -> Dict:
         try:
-            if asset.id in self.cache:
-                pdf_file = self.cache[asset.id]
-            else:
-                doc_path = asset.get_document_from_asset()
-                pdf_file = genai.upload_file(doc_path)
-                self.cache[asset.id] = pdf_file
-            
-            prompt = f"{DOCUMENT_SYSTEM_TEMPLATE}\n\n{DOCUMENT_HUMAN_TEMPLATE.format(field_name=field_name, description=description)}"
+            pdf_file = self.get_file_part(asset)
+            prompt = self.single_field_text(field_name, description)
             
             return {
                 "parts": [prompt, pdf_file]  # Gemini accepts a list of parts including text and files
@@ -74,23 +105,38 @@ class GeminiDocumentHandler(GeminiExtractionHandler):
             self.logger.exception(f"Error constructing document prompt: {str(e)}")
             raise
 
+    def construct_multi_field_prompt(self, actions: List[Action], asset: Asset) -> Dict:
+        try:
+            pdf_file = self.get_file_part(asset)
+            return {
+                "parts": [self.multi_field_text(actions), pdf_file]
+            }
+        except Exception as e:
+            self.logger.exception(f"Error constructing multi-field document prompt: {str(e)}")
+            raise
+
 class GeminiImageHandler(GeminiExtractionHandler):
+    supports_multi_field = True
+
+    def get_image_parts(self, asset: Asset) -> List:
+        images = asset.get_images_from_asset()
+
+        # Convert base64 images to PIL Images
+        image_parts = []
+        for image_data in images:
+            # Convert base64 to bytes
+            image_bytes = BytesIO(image_data)
+            # Open as PIL Image
+            pil_image = PIL.Image.open(image_bytes)
+            image_parts.append(pil_image)
+        return image_parts
+
     def construct_prompt(self, field_name: str, description: str, asset: Asset) -> Dict:
         try:
-            images = asset.get_images_from_asset()
-            prompt = f"{DOCUMENT_SYSTEM_TEMPLATE}\n\n{DOCUMENT_HUMAN_TEMPLATE.format(field_name=field_name, description=description)}"
-            
-            # Convert base64 images to PIL Images
-            image_parts = []
-            for image_data in images:
-                # Convert base64 to bytes
-                image_bytes = BytesIO(image_data)
-                # Open as PIL Image
-                pil_image = PIL.Image.open(image_bytes)
-                image_parts.append(pil_image)
+            prompt = self.single_field_text(field_name, description)
             
             # Combine prompt and images as parts
-            parts = [prompt] + image_parts
+            parts = [prompt] + self.get_image_parts(asset)
             
             return {
                 "parts": parts  # Gemini accepts text prompt and PIL images
@@ -99,7 +145,18 @@ class GeminiImageHandler(GeminiExtractionHandler):
             self.logger.exception(f"Error constructing image prompt: {str(e)}")
             raise
 
+    def construct_multi_field_prompt(self, actions: List[Action], asset: Asset) -> Dict:
+        try:
+            return {
+                "parts": [self.multi_field_text(actions)] + self.get_image_parts(asset)
+            }
+        except Exception as e:
+            self.logger.exception(f"Error constructing multi-field image prompt: {str(e)}")
+            raise
+
 class GeminiAgentService(BaseAgentService):
+    provider = "gemini"
+
     def __init__(self, api_key: str):
         if not api_key:
             logger.error("Gemini API key is not set in the environment variables.")
@@ -109,9 +166,12 @@ class GeminiAgentService(BaseAgentService):
         self.text_model = GenerativeModel(os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'))  # Model name should come from environment, with a default
         self.vision_model = GenerativeModel(os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'))  # Model name should come from environment, with a default
 
+        self.uploads = GeminiUploadRegistry(api_key)
+        self.rate_limiter = get_rate_limiter(self.provider, api_key)
+
         # Initialize handlers
         self.handlers = {
-            ASSET_FILE_TYPE.PDF: GeminiDocumentHandler(),
+            ASSET_FILE_TYPE.PDF: GeminiDocumentHandler(self.uploads),
             ASSET_FILE_TYPE.JPEG: GeminiImageHandler(),
             ASSET_FILE_TYPE.JPG: GeminiImageHandler(),
             ASSET_FILE_TYPE.PNG: GeminiImageHandler(),
@@ -125,6 +185,7 @@ class GeminiAgentService(BaseAgentService):
             generation_actions = task.actions.filter(action_type=ACTION_TYPE.GENERATION)
 
             if extraction_actions.exists():
+                self.upload_documents(task)
                 structured_output["extractions"] = self.extract_fields(task, extraction_actions)
 
             if generation_actions.exists():
@@ -136,55 +197,50 @@ class GeminiAgentService(BaseAgentService):
 
         return structured_output
 
-    def extract_fields(self, task: Task, actions: List[Action]) -> Dict[str, Any]:
-        results = {}
-        try:
-            for action in actions:
-                field_name = action.output_column_name
-                description = action.description
-                action_results = []
-                
-                for asset in task.assets.all():
-                    handler = self.handlers.get(asset.file_type)
-                    if not handler:
-                        logger.warning(f"No handler found for asset type: {asset.file_type}")
-                        continue
-
-                    prompt_data = handler.construct_prompt(field_name, description, asset)
-                    
-                    # Generate content with parts and enable streaming
-                    response = self.vision_model.generate_content(
-                        prompt_data.get("parts", []),
-                        stream=True
-                    )
-                    
-                    # Always handle as streaming response
-                    response_text = ""
-                    for chunk in response:
-                        response_text += chunk.text
-                    
-                    parsed_response = self.parse_response(response_text)
-                    
-                    action_results.append({
-                        "asset": asset.name,
-                        "data": parsed_response,
-                        "source": asset.url,
-                    })
-                
-                results[field_name] = action_results
-                
-        except Exception as e:
-            logger.error(f"Error extracting fields: {e}")
-            results["error"] = str(e)
+    def upload_documents(self, task: Task):
+        """Upload the task's PDFs concurrently before extraction, instead of on each one's first field"""
+        self.uploads.purge_expired()
+        documents = [asset for asset in task.assets.all() if asset.file_type == ASSET_FILE_TYPE.PDF]
+        self.uploads.upload_many(asset.get_document_from_asset for asset in documents)
 
-        return results
+    def extract_field(self, handler: GeminiExtractionHandler, action: Action, asset: Asset) -> Dict[str, Any]:
+        prompt_data = handler.construct_prompt(action.output_column_name, action.description, asset)
+        return self.parse_response(self._cached_generate(prompt_data, asset))
+
+    def extract_field_batch(self, handler: GeminiExtractionHandler, actions: List[Action], asset: Asset) -> Dict[str, Dict[str, Any]]:
+        prompt_data = handler.construct_multi_field_prompt(actions, asset)
+        parsed_response = self.parse_response(self._cached_generate(prompt_data, asset))
+        return split_multi_field_response(parsed_response, actions)
+
+    def _cached_generate(self, prompt_data: Dict, asset: Asset) -> str:
+        # Requests use the model's default generation config, so there is no temperature to key on
+        return cached_completion(
+            self.vision_model.model_name, None, prompt_data, asset,
+            lambda: self.rate_limiter.call(lambda: self._generate(prompt_data), estimate_prompt_tokens(prompt_data)),
+            cacheable=self._is_valid_response,
+        )
+
+    def _generate(self, prompt_data: Dict) -> str:
+        # Generate content with parts and enable streaming
+        response = self.vision_model.generate_content(
+            prompt_data.get("parts", []),
+            stream=True
+        )
+
+        # Always handle as streaming response
+        response_text = ""
+        for chunk in response:
+            response_text += chunk.text
+        return response_text
 
     def generate_contents(self, task: Task, actions: List[Action]) -> Dict[str, str]:
         content_results = {}
         try:
             for action in actions:
                 prompt = action.description
-                response = self.text_model.generate_content(prompt)
+                response = self.rate_limiter.call(
+                    lambda: self.text_model.generate_content(prompt), estimate_tokens(prompt)
+                )
                 content_results[action.output_column_name] = response.text
         except Exception as e:
             logger.error(f"Error generating contents: {e}")
@@ -192,6 +248,9 @@ class GeminiAgentService(BaseAgentService):
 
         return content_results
 
+    def _is_valid_response(self, response: str) -> bool:
+        return "error" not in self.parse_response(response)
+
     def parse_response(self, response: str) -> Dict[str, Any]:
         try:
             # Clean up the response text to ensure it's valid JSON
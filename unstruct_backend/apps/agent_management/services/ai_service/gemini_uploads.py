@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.agent_management.models import GeminiUpload
+from apps.common.utils.asset_cache import get_asset_cache
+from apps.common.utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+# Gemini keeps uploaded files for 48 hours; used when the response carries no expiration time
+GEMINI_FILE_TTL = timedelta(hours=48)
+
+
+def upload_file(path: str, mime_type: str):
+    import google.generativeai as genai
+
+    return genai.upload_file(path, mime_type=mime_type)
+
+
+class GeminiUploadRegistry:
+    """Uploads files to Gemini once per content hash and API key, recorded in the database.
+
+    Every worker reuses a recorded upload until it is within GEMINI_UPLOAD_EXPIRY_MARGIN
+    seconds of expiring, so a handle never expires in the middle of a task. Uploads of
+    the same content within a process are serialized; workers racing on a new file may
+    both upload it, and the last one recorded wins.
+    """
+
+    def __init__(self, api_key: str, upload: Callable = upload_file):
+        self.api_key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+        self.upload = upload
+        self._lock = KeyedLock()
+
+    def _reusable(self, content_hash: str):
+        fresh_until = timezone.now() + timedelta(seconds=settings.GEMINI_UPLOAD_EXPIRY_MARGIN)
+        return GeminiUpload.objects.filter(
+            api_key_hash=self.api_key_hash, content_hash=content_hash, expires_at__gt=fresh_until
+        ).first()
+
+    def get(self, path: str) -> GeminiUpload:
+        """The upload of the file at `path`, uploading it if there is none still fresh"""
+        content_hash = get_asset_cache().content_hash(path)
+        with self._lock(content_hash):
+            upload = self._reusable(content_hash)
+            if upload is not None:
+                return upload
+
+            mime_type = mimetypes.guess_type(path)[0] or "application/pdf"
+            uploaded = self.upload(path, mime_type)
+            expires_at = getattr(uploaded, "expiration_time", None) or timezone.now() + GEMINI_FILE_TTL
+            upload, _ = GeminiUpload.objects.update_or_create(
+                api_key_hash=self.api_key_hash,
+                content_hash=content_hash,
+                defaults={
+                    "file_name": uploaded.name,
+                    "uri": uploaded.uri,
+                    "mime_type": getattr(uploaded, "mime_type", None) or mime_type,
+                    "expires_at": expires_at,
+                },
+            )
+            logger.info(f"Uploaded {path} to Gemini as {uploaded.name}, expires {expires_at}")
+            return upload
+
+    def upload_many(self, paths: Iterable[Callable[[], str]]):
+        """Resolve and upload files concurrently; each item is a callable returning a local path.
+
+        Failures are only logged: extraction asks for the file again and records the error there.
+        """
+
+        def _run(get_path):
+            close_old_connections()
+            try:
+                return self.get(get_path())
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=settings.GEMINI_UPLOAD_CONCURRENCY) as executor:
+            futures = [executor.submit(_run, get_path) for get_path in paths]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Gemini pre-upload failed: {e}")
+
+    def purge_expired(self) -> int:
+        """Forget uploads Gemini has already deleted"""
+        removed, _ = GeminiUpload.all_objects.filter(
+            api_key_hash=self.api_key_hash, expires_at__lte=timezone.now()
+        ).delete()
+        return removed
@@ -16,6 +16,15 @@ from apps.core.models import Action, Asset, Task, ASSET_FILE_TYPE
 from apps.core.models.action import ACTION_TYPE
 
 from .base_agent_service import BaseAgentService
+from .completion_cache import cached_completion
+from .field_batching import (
+    build_retrieval_query,
+    estimate_tokens,
+    render_field_list,
+    render_response_schema,
+    split_multi_field_response,
+)
+from .rate_limit import estimate_prompt_tokens, get_rate_limiter
 from .vector_store import VectorStore
 import os
 
@@ -83,8 +92,38 @@ Respond in the following JSON format:
 }}
 """
 
+# Multi-field templates: every field of a task is extracted from the asset in one request
+MULTI_FIELD_DOCUMENT_HUMAN_TEMPLATE = """
+Extract the following fields from the given document:
+
+{fields}
+
+For each extracted field, also provide:
+1. A confidence score between 0 and 1, where 1 is highest confidence.
+2. A reference to where in the document the information was found (e.g., "Page 3, Paragraph 2").
+
+Respond with a single JSON object in the following format:
+{schema}
+"""
+
+MULTI_FIELD_IMAGE_HUMAN_TEMPLATE = """
+Extract the following fields from the given images:
+
+{fields}
+
+For each extracted field, also provide:
+1. A confidence score between 0 and 1, where 1 is highest confidence.
+2. A reference to where in the image the information was found (e.g., "Image 1").
+
+Respond with a single JSON object in the following format only:
+{schema}
+"""
+
 class ExtractionHandler:
     """Base class for handling different asset types."""
+    # Handlers that set this implement construct_multi_field_prompt(actions, asset)
+    supports_multi_field = False
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
 
@@ -95,9 +134,12 @@ class ExtractionHandler:
         return document.replace("\n", " ").strip()
 
 class DocumentExtractionHandler(ExtractionHandler):
-    def __init__(self, chat_prompt: ChatPromptTemplate):
+    supports_multi_field = True
+
+    def __init__(self, chat_prompt: ChatPromptTemplate, multi_field_prompt: ChatPromptTemplate = None):
         super().__init__()  # Initialize base class logger
         self.chat_prompt = chat_prompt
+        self.multi_field_prompt = multi_field_prompt
 
     def construct_prompt(self, field_name: str, description: str, asset: Asset) -> str:
         try:
@@ -129,10 +171,37 @@ class DocumentExtractionHandler(ExtractionHandler):
             self.logger.exception(f"Error constructing document prompt: {str(e)}")
             raise
 
+    def construct_multi_field_prompt(self, actions: List[Action], asset: Asset) -> List[HumanMessage]:
+        try:
+            doc_path = asset.get_document_from_asset()
+
+            vector_store = VectorStore(str(asset.id))
+            vector_store.index_document(doc_path=doc_path)
+            data = vector_store.invoke(build_retrieval_query(actions))
+
+            px = self.multi_field_prompt.format_prompt(
+                fields=render_field_list(actions),
+                schema=render_response_schema(actions),
+            )
+
+            text_content = []
+            if data.get('texts'):
+                text_content.append(
+                    HumanMessage(content="\n".join(data['texts']))
+                )
+
+            return px.messages + text_content
+        except Exception as e:
+            self.logger.exception(f"Error constructing multi-field document prompt: {str(e)}")
+            raise
+
 class ImageExtractionHandler(ExtractionHandler):
-    def __init__(self, chat_prompt: ChatPromptTemplate):
+    supports_multi_field = True
+
+    def __init__(self, chat_prompt: ChatPromptTemplate, multi_field_prompt: ChatPromptTemplate = None):
         super().__init__()
         self.chat_prompt = chat_prompt
+        self.multi_field_prompt = multi_field_prompt
 
     def construct_prompt(self, field_name: str, description: str, asset: Asset) -> List[HumanMessage]:
         try:
@@ -160,6 +229,30 @@ class ImageExtractionHandler(ExtractionHandler):
             self.logger.exception(f"Error constructing image prompt: {str(e)}")
             raise
 
+    def construct_multi_field_prompt(self, actions: List[Action], asset: Asset) -> List[HumanMessage]:
+        try:
+            images = asset.get_images_from_asset()
+            if not images:
+                raise ValueError("Image data is empty")
+
+            px = self.multi_field_prompt.format_prompt(
+                fields=render_field_list(actions),
+                schema=render_response_schema(actions),
+            )
+
+            human_messages = [
+                HumanMessage(
+                    content=[{
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{img}"}
+                    } for img in images]
+                )
+            ]
+            return px.messages + human_messages
+        except Exception as e:
+            self.logger.exception(f"Error constructing multi-field image prompt: {str(e)}")
+            raise
+
 class VideoExtractionHandler(ExtractionHandler):
     def __init__(self, chat_prompt: ChatPromptTemplate):
         super().__init__()
@@ -238,11 +331,17 @@ class AudioExtractionHandler(ExtractionHandler):
             raise
 
 class OpenAIAgentService(BaseAgentService):
+    provider = "openai"
+
     def __init__(self, api_key: str):
         if not api_key:
             logger.error("OpenAI API key is not set in the environment variables.")
             raise ValueError("OpenAI API key is not set in the environment variables.")
-        self.llm = ChatOpenAI(openai_api_key=api_key, temperature=0, model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+        # Retries are left to the rate limiter, which honours Retry-After and backs off across workers
+        self.llm = ChatOpenAI(
+            openai_api_key=api_key, temperature=0, model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), max_retries=0
+        )
+        self.rate_limiter = get_rate_limiter(self.provider, api_key)
 
         # Initialize prompt templates
         self.document_chat_prompt = ChatPromptTemplate.from_messages([
@@ -260,12 +359,22 @@ class OpenAIAgentService(BaseAgentService):
             HumanMessagePromptTemplate.from_template(VIDEO_HUMAN_TEMPLATE)
         ])
 
+        self.multi_field_document_chat_prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(DOCUMENT_SYSTEM_TEMPLATE),
+            HumanMessagePromptTemplate.from_template(MULTI_FIELD_DOCUMENT_HUMAN_TEMPLATE)
+        ])
+
+        self.multi_field_image_chat_prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(IMAGE_SYSTEM_TEMPLATE),
+            HumanMessagePromptTemplate.from_template(MULTI_FIELD_IMAGE_HUMAN_TEMPLATE)
+        ])
+
         # Initialize handlers
         self.handlers = {
-            ASSET_FILE_TYPE.PDF: DocumentExtractionHandler(self.video_chat_prompt),
-            ASSET_FILE_TYPE.JPEG: ImageExtractionHandler(self.image_chat_prompt),
-            ASSET_FILE_TYPE.JPG: ImageExtractionHandler(self.image_chat_prompt),
-            ASSET_FILE_TYPE.PNG: ImageExtractionHandler(self.image_chat_prompt),
+            ASSET_FILE_TYPE.PDF: DocumentExtractionHandler(self.video_chat_prompt, self.multi_field_document_chat_prompt),
+            ASSET_FILE_TYPE.JPEG: ImageExtractionHandler(self.image_chat_prompt, self.multi_field_image_chat_prompt),
+            ASSET_FILE_TYPE.JPG: ImageExtractionHandler(self.image_chat_prompt, self.multi_field_image_chat_prompt),
+            ASSET_FILE_TYPE.PNG: ImageExtractionHandler(self.image_chat_prompt, self.multi_field_image_chat_prompt),
             ASSET_FILE_TYPE.MP4: VideoExtractionHandler(self.video_chat_prompt),
             ASSET_FILE_TYPE.MP3: AudioExtractionHandler(self.video_chat_prompt),  # Add MP3 handler
 
@@ -290,62 +399,44 @@ class OpenAIAgentService(BaseAgentService):
 
         return structured_output
 
-    def extract_fields(self, task: Task, actions: List[Action]) -> Dict[str, Any]:
-        results = {}
-        try:
-            for action in actions:
-                field_name = action.output_column_name
-                description = action.description
-                action_results = []
-                for asset in task.assets.all():
-                    asset_type = asset.file_type # Assume Asset has a 'type' attribute
-                    
-                    handler = self.handlers.get(asset_type)
-                    print(asset_type, handler)
-                    if not handler:
-                        logger.warning(f"No handler found for asset type: {asset_type}")
-                        continue
-
-                    prompt = handler.construct_prompt(field_name, description, asset)
-                    
-                    if isinstance(prompt, str):
-                        response = self.llm.invoke(prompt)  # Use invoke for string prompts
-                    elif isinstance(prompt, list):
-                        response = self.llm.invoke(prompt)  # Use invoke_messages for message lists
-                    else:
-                        logger.error(f"Unsupported prompt type for asset type: {asset_type}")
-                        continue
-
-                    # Clean response content if necessary
-                    if isinstance(response.content, str):
-                        response_content = response.content
-                        if 'json' in response_content:
-                            response_content = response_content.replace('json', '')
-                        response_content = response_content.replace('```', '')
-                    else:
-                        response_content = str(response.content)
-
-                    parsed_response = self.parse_response(response_content)
-                    action_results.append(
-                        {
-                            "asset": asset.name,
-                            "data": parsed_response,
-                            "source": asset.url,
-                        }
-                    )
-                results[field_name] = action_results
-        except Exception as e:
-            logger.error(f"Error extracting fields for task {task.id}: {e}")
-            results["error"] = str(e)
-
-        return results
+    def extract_field(self, handler: ExtractionHandler, action: Action, asset: Asset) -> Dict[str, Any]:
+        prompt = handler.construct_prompt(action.output_column_name, action.description, asset)
+        return self.parse_response(self._invoke(prompt, asset))
+
+    def extract_field_batch(self, handler: ExtractionHandler, actions: List[Action], asset: Asset) -> Dict[str, Dict[str, Any]]:
+        prompt = handler.construct_multi_field_prompt(actions, asset)
+        parsed_response = self.parse_response(self._invoke(prompt, asset))
+        return split_multi_field_response(parsed_response, actions)
+
+    def _invoke(self, prompt: Union[str, List[HumanMessage]], asset: Asset) -> str:
+        if not isinstance(prompt, (str, list)):
+            raise ValueError(f"Unsupported prompt type for asset type: {asset.file_type}")
+        return cached_completion(
+            self.llm.model_name, self.llm.temperature, prompt, asset,
+            lambda: self.rate_limiter.call(lambda: self._call_llm(prompt), estimate_prompt_tokens(prompt)),
+            cacheable=self._is_valid_response,
+        )
+
+    def _call_llm(self, prompt: Union[str, List[HumanMessage]]) -> str:
+        response = self.llm.invoke(prompt)
+
+        # Clean response content if necessary
+        if isinstance(response.content, str):
+            response_content = response.content
+            if 'json' in response_content:
+                response_content = response_content.replace('json', '')
+            response_content = response_content.replace('```', '')
+        else:
+            response_content = str(response.content)
+        return response_content
 
     def generate_contents(self, task: Task, actions: List[Action]) -> Dict[str, str]:
         content_results = {}
         try:
             for action in actions:
                 prompt = action.description
-                response = self.llm.invoke(prompt)  # Assuming generate content doesn't depend on asset type
+                # Assuming generate content doesn't depend on asset type
+                response = self.rate_limiter.call(lambda: self.llm.invoke(prompt), estimate_tokens(prompt))
                 logger.debug(f"Generation response: {response}")
                 content_results[action.output_column_name] = response.content
         except Exception as e:
@@ -354,6 +445,9 @@ class OpenAIAgentService(BaseAgentService):
 
         return content_results
 
+    def _is_valid_response(self, response: str) -> bool:
+        return "error" not in self.parse_response(response)
+
     def parse_response(self, response: str) -> Dict[str, Any]:
         try:
             return json.loads(response)
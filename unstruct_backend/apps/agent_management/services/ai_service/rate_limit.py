@@ -0,0 +1,290 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.agent_management.models import RateLimitBucket
+
+from .completion_cache import render_prompt
+from .concurrency import get_max_in_flight
+from .field_batching import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Buckets hold this many seconds of a per-minute limit, so a burst cannot spend a whole minute at once
+BURST_SECONDS = 10
+# Rough token cost of an image or uploaded file; their real size is not known before the call
+ATTACHMENT_TOKENS = 1000
+# Statuses worth retrying; the first two also mean the provider is overloaded
+OVERLOAD_STATUSES = {429, 503}
+RETRYABLE_STATUSES = OVERLOAD_STATUSES | {500, 502, 504}
+# Longest single sleep while waiting for the bucket, so a changed budget is noticed quickly
+MAX_WAIT_SLICE = 5.0
+
+
+def estimate_prompt_tokens(prompt: Any) -> int:
+    """Input tokens of a prompt as budgeted against the provider's tokens-per-minute limit"""
+    rendered = render_prompt(prompt)
+    parts = rendered if isinstance(rendered, list) else [rendered]
+    total = 0
+    for part in parts:
+        content = part.get("content") if isinstance(part, dict) else part
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        elif isinstance(content, list):
+            for item in content:
+                is_text = isinstance(item, dict) and item.get("type") == "text"
+                total += estimate_tokens(item.get("text", "")) if is_text else ATTACHMENT_TOKENS
+        else:
+            total += ATTACHMENT_TOKENS
+    return total
+
+
+def error_status(error: Exception) -> Optional[int]:
+    """HTTP status of an OpenAI or Google API error, if it carries one"""
+    for attribute in ("status_code", "http_status", "code"):
+        value = getattr(error, attribute, None)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Seconds from the error's Retry-After header, given as a number or an HTTP date"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class BucketLimits:
+    """Refill rates and capacities derived from per-minute limits; 0 means unlimited"""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.request_rate = requests_per_minute / 60
+        self.token_rate = tokens_per_minute / 60
+        self.request_capacity = max(self.request_rate * BURST_SECONDS, 1.0)
+        self.token_capacity = self.token_rate * BURST_SECONDS
+
+    def refill(self, requests: float, tokens: float, elapsed: float):
+        return (
+            min(self.request_capacity, requests + elapsed * self.request_rate),
+            min(self.token_capacity, tokens + elapsed * self.token_rate),
+        )
+
+    def take(self, requests: float, tokens: float, cost: int):
+        """Remaining (requests, tokens) after taking one request of `cost` tokens, and the wait if it does not fit"""
+        # A request larger than the whole bucket waits for a full bucket rather than forever
+        cost = min(cost, self.token_capacity)
+        request_short = 1 - requests if self.request_rate else 0
+        token_short = cost - tokens if self.token_rate else 0
+        if request_short <= 0 and token_short <= 0:
+            return (
+                requests - 1 if self.request_rate else requests,
+                tokens - cost if self.token_rate else tokens,
+                0.0,
+            )
+        wait = max(
+            request_short / self.request_rate if request_short > 0 else 0,
+            token_short / self.token_rate if token_short > 0 else 0,
+        )
+        return requests, tokens, wait
+
+
+class LocalTokenBucket:
+    """Token bucket held in process memory, for development and single-process workers"""
+
+    def __init__(self, limits: BucketLimits, clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.clock = clock
+        self._requests = limits.request_capacity
+        self._tokens = limits.token_capacity
+        self._refilled_at = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost: int) -> float:
+        with self._lock:
+            now = self.clock()
+            if self._blocked_until > now:
+                return self._blocked_until - now
+            requests, tokens = self.limits.refill(self._requests, self._tokens, now - self._refilled_at)
+            self._requests, self._tokens, wait = self.limits.take(requests, tokens, cost)
+            self._refilled_at = now
+            return wait
+
+    def block(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+
+
+class DatabaseTokenBucket:
+    """Token bucket stored as a RateLimitBucket row, shared by every worker process.
+
+    Each acquire is one short transaction holding the row lock.
+    """
+
+    def __init__(self, key: str, limits: BucketLimits):
+        self.key = key
+        self.limits = limits
+
+    def _locked_row(self):
+        bucket, _ = RateLimitBucket.objects.select_for_update().get_or_create(
+            key=self.key,
+            defaults={
+                "requests": self.limits.request_capacity,
+                "tokens": self.limits.token_capacity,
+                "refilled_at": timezone.now(),
+            },
+        )
+        return bucket
+
+    def try_acquire(self, cost: int) -> float:
+        with transaction.atomic():
+            bucket = self._locked_row()
+            now = timezone.now()
+            if bucket.blocked_until and bucket.blocked_until > now:
+                return (bucket.blocked_until - now).total_seconds()
+            elapsed = max((now - bucket.refilled_at).total_seconds(), 0.0)
+            requests, tokens = self.limits.refill(bucket.requests, bucket.tokens, elapsed)
+            bucket.requests, bucket.tokens, wait = self.limits.take(requests, tokens, cost)
+            bucket.refilled_at = now
+            bucket.save(update_fields=["requests", "tokens", "refilled_at", "updated_at"])
+            return wait
+
+    def block(self, seconds: float):
+        with transaction.atomic():
+            bucket = self._locked_row()
+            until = timezone.now() + timedelta(seconds=seconds)
+            if not bucket.blocked_until or bucket.blocked_until < until:
+                bucket.blocked_until = until
+                bucket.save(update_fields=["blocked_until", "updated_at"])
+
+
+class AdaptiveConcurrency:
+    """Limits concurrent calls with additive increase, multiplicative decrease.
+
+    The limit grows by about one per `limit` successful calls, up to `max_limit`, and is
+    halved when the provider reports overload or a call is slower than `latency_target`
+    seconds (0 disables the latency signal).
+    """
+
+    def __init__(self, max_limit: int, latency_target: float = 0):
+        self.max_limit = max(max_limit, 1)
+        self.latency_target = latency_target
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float] = None):
+        """Release a slot; a latency is given for calls that succeeded"""
+        with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                if self.latency_target and latency > self.latency_target:
+                    self._decrease()
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def decrease(self):
+        with self._condition:
+            self._decrease()
+
+    def _decrease(self):
+        self.limit = max(1.0, self.limit / 2)
+
+
+class RateLimiter:
+    """Throttles one provider and API key: shared request/token budget, adaptive concurrency and retries"""
+
+    def __init__(self, provider: str, bucket, concurrency: AdaptiveConcurrency, sleep: Callable = time.sleep):
+        self.provider = provider
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.sleep = sleep
+
+    def wait_for_budget(self, tokens: int):
+        while True:
+            wait = self.bucket.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self.sleep(min(wait, MAX_WAIT_SLICE))
+
+    def call(self, fn: Callable, tokens: int = 0):
+        """Run `fn` within the budget, retrying overload and server errors with jittered backoff"""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.wait_for_budget(tokens)
+            self.concurrency.acquire()
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self.concurrency.release()
+                status = error_status(e)
+                if status not in RETRYABLE_STATUSES or attempt >= settings.LLM_RETRY_MAX_ATTEMPTS:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if status in OVERLOAD_STATUSES:
+                    self.concurrency.decrease()
+                    if retry_after:
+                        # Hold back every worker, not only this call
+                        self.bucket.block(retry_after)
+                delay = backoff_delay(attempt, retry_after)
+                logger.warning(
+                    f"{self.provider} call failed with status {status} (attempt {attempt}), retrying in {delay:.1f}s"
+                )
+                self.sleep(delay)
+                continue
+            self.concurrency.release(latency=time.monotonic() - started)
+            return result
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter(provider: str, api_key: str) -> RateLimiter:
+    """The process-wide limiter for a provider and API key"""
+    limits = BucketLimits(**settings.LLM_RATE_LIMITS.get(provider, {}))
+    key = f"{provider}:{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]}"
+    # Without limits there is no budget to share, only Retry-After pauses
+    if settings.LLM_RATE_LIMIT_BACKEND == "database" and (limits.request_rate or limits.token_rate):
+        bucket = DatabaseTokenBucket(key, limits)
+    else:
+        bucket = LocalTokenBucket(limits)
+    return RateLimiter(provider, bucket, AdaptiveConcurrency(get_max_in_flight(provider), settings.LLM_LATENCY_TARGET))
@@ -0,0 +1,256 @@
+import logging
+import math
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+
+from apps.common.utils.asset_cache import get_asset_cache
+from apps.common.utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+# Audio is decoded at this rate for silence detection and sent to the transcriber; speech needs no more
+SAMPLE_RATE = 16000
+# Loudness is measured over windows of this many seconds
+LEVEL_WINDOW = 0.05
+# Level of digital silence, for windows with no signal at all
+SILENCE_FLOOR_DB = -96.0
+# Words ending a sentence, where a segment may close early
+SENTENCE_END = (".", "?", "!")
+
+# Serializes transcription of the same content across threads
+_transcribe_lock = KeyedLock()
+
+
+class TranscriptionError(Exception):
+    """Audio could not be decoded or transcribed"""
+
+
+def _ffmpeg() -> str:
+    # The binary moviepy resolves, bundled with imageio-ffmpeg unless FFMPEG_BINARY is set
+    from moviepy.config import get_setting
+
+    return get_setting("FFMPEG_BINARY")
+
+
+def audio_levels(path: str) -> List[float]:
+    """Loudness in dBFS of each LEVEL_WINDOW of the file's audio track, decoded as a stream.
+
+    Works for audio and video files alike; only one window of samples is held in memory.
+    A file without an audio track (a silent video) has no levels.
+    """
+    import numpy as np
+
+    window_bytes = int(SAMPLE_RATE * LEVEL_WINDOW) * 2
+    command = [
+        _ffmpeg(), "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-",
+    ]
+    levels = []
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        for data in iter(lambda: process.stdout.read(window_bytes), b""):
+            samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16).astype(np.float32)
+            rms = float(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0.0
+            levels.append(20 * math.log10(rms / 32768) if rms > 0 else SILENCE_FLOOR_DB)
+        errors = process.stderr.read().decode("utf-8", errors="replace").strip()
+    if process.returncode:
+        if "does not contain any stream" in errors:
+            return []
+        raise TranscriptionError(f"Could not decode the audio of {os.path.basename(path)}: {errors}")
+    return levels
+
+
+def _cut_point(levels: List[float], first: int, last: int, silence_db: float, min_silence: float) -> int:
+    """Window to cut at between `first` and `last`: the middle of the longest silence, else the quietest window"""
+    best_start, best_length = None, 0
+    run_start = None
+    for index in range(first, last + 1):
+        silent = levels[index] < silence_db
+        if silent and run_start is None:
+            run_start = index
+        if run_start is not None and (not silent or index == last):
+            length = index - run_start + (1 if silent else 0)
+            if length >= best_length:
+                best_start, best_length = run_start, length
+            run_start = None
+    if best_start is not None and best_length * LEVEL_WINDOW >= min_silence:
+        return best_start + best_length // 2
+    return min(range(first, last + 1), key=lambda index: (levels[index], -index))
+
+
+def plan_chunks(levels: List[float], chunk_seconds: float, search_seconds: float, silence_db: float,
+                min_silence: float) -> List[Tuple[float, float]]:
+    """Split audio into (start, end) spans of at most `chunk_seconds`, cutting in silences.
+
+    Each cut is made in the longest silence within the last `search_seconds` before the
+    limit, so words are not split between chunks; without one, at the quietest moment.
+    """
+    duration = len(levels) * LEVEL_WINDOW
+    chunk_windows = max(int(chunk_seconds / LEVEL_WINDOW), 2)
+    search_windows = max(int(search_seconds / LEVEL_WINDOW), 1)
+    chunks = []
+    start = 0
+    while len(levels) - start > chunk_windows:
+        last = start + chunk_windows - 1
+        cut = _cut_point(levels, max(last - search_windows, start + 1), last, silence_db, min_silence)
+        chunks.append((start * LEVEL_WINDOW, cut * LEVEL_WINDOW))
+        start = cut
+    chunks.append((start * LEVEL_WINDOW, duration))
+    return chunks
+
+
+def extract_chunk(path: str, start: float, end: float, chunk_path: str):
+    """Write the audio between `start` and `end` seconds as mono FLAC"""
+    command = [
+        _ffmpeg(), "-v", "error", "-y", "-ss", f"{start:.3f}", "-i", path, "-t", f"{end - start:.3f}",
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-c:a", "flac", chunk_path,
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode:
+        errors = result.stderr.decode("utf-8", errors="replace").strip()
+        raise TranscriptionError(f"Could not extract audio {start:.1f}-{end:.1f}s: {errors}")
+
+
+class DeepgramTranscriber:
+    name = "deepgram/nova-2"
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def transcribe(self, path: str, duration: float) -> Dict:
+        from deepgram import DeepgramClient, FileSource, PrerecordedOptions
+
+        # Chunks are at most TRANSCRIPTION_CHUNK_SECONDS of 16 kHz mono FLAC, a few MB each
+        with open(path, "rb") as f:
+            payload: FileSource = {"buffer": f.read()}
+        options = PrerecordedOptions(model="nova-2", smart_format=True)
+        response = DeepgramClient(self.api_key).listen.prerecorded.v("1").transcribe_file(payload, options)
+        alternative = response.results.channels[0].alternatives[0]
+        words = [
+            {"word": getattr(word, "punctuated_word", None) or word.word, "start": word.start, "end": word.end}
+            for word in alternative.words or []
+        ]
+        return {"text": alternative.transcript, "words": words}
+
+
+class LocalTranscriber:
+    """Offline stand-in for tests and development: one placeholder word per second of audio"""
+
+    name = "local/stub"
+
+    def transcribe(self, path: str, duration: float) -> Dict:
+        words = [{"word": f"word{i}", "start": float(i), "end": i + 0.5} for i in range(int(duration))]
+        return {"text": " ".join(word["word"] for word in words), "words": words}
+
+
+def get_transcriber():
+    if settings.TRANSCRIPTION_BACKEND == "local":
+        return LocalTranscriber()
+    return DeepgramTranscriber(settings.DEEPGRAM_API_KEY)
+
+
+def stitch(results: Iterable[Tuple[float, Dict]]) -> Tuple[str, List[Dict]]:
+    """Join chunk transcripts given as (chunk start, result), moving word times to the whole file's clock"""
+    texts, words = [], []
+    for offset, result in results:
+        if result["text"].strip():
+            texts.append(result["text"].strip())
+        words += [
+            {"word": word["word"], "start": round(word["start"] + offset, 3), "end": round(word["end"] + offset, 3)}
+            for word in result["words"]
+        ]
+    return " ".join(texts), words
+
+
+def segment_words(words: List[Dict], seconds: float) -> List[Dict]:
+    """Group words into spans of at most `seconds`, closing early at a sentence end past half of it"""
+    segments, current = [], []
+    for word in words:
+        if current and word["end"] - current[0]["start"] > seconds:
+            segments.append(current)
+            current = []
+        current.append(word)
+        if word["end"] - current[0]["start"] >= seconds / 2 and word["word"].endswith(SENTENCE_END):
+            segments.append(current)
+            current = []
+    if current:
+        segments.append(current)
+    return [
+        {"start": segment[0]["start"], "end": segment[-1]["end"], "text": " ".join(w["word"] for w in segment)}
+        for segment in segments
+    ]
+
+
+def _transcribe_chunk(transcriber, path: str, duration: float) -> Dict:
+    attempts = max(settings.TRANSCRIPTION_MAX_ATTEMPTS, 1)
+    for attempt in range(1, attempts + 1):
+        try:
+            return transcriber.transcribe(path, duration)
+        except Exception as e:
+            if attempt == attempts:
+                raise TranscriptionError(f"{transcriber.name} failed after {attempts} attempts: {e}") from e
+            delay = min(2 ** attempt, 30)
+            logger.warning(f"{transcriber.name} failed on {os.path.basename(path)} ({e}), retrying in {delay}s")
+            time.sleep(delay)
+
+
+def transcribe_audio(path: str, transcriber=None):
+    """The transcript of an audio or video file, transcribing it only if its content never was.
+
+    Long audio is split on silences into chunks of at most TRANSCRIPTION_CHUNK_SECONDS,
+    which are transcribed TRANSCRIPTION_CONCURRENCY at a time and stitched back together
+    with word timestamps. Returns a Transcript. Files without an audio track get an empty
+    transcript; otherwise it raises TranscriptionError rather than returning an empty one
+    when the audio cannot be decoded or a chunk keeps failing.
+    """
+    # Imported here so the vector store can be imported before Django is set up
+    from apps.agent_management.models import Transcript
+
+    transcriber = transcriber or get_transcriber()
+    content_hash = get_asset_cache().content_hash(path)
+    with _transcribe_lock(content_hash):
+        transcript = Transcript.objects.filter(content_hash=content_hash, transcriber=transcriber.name).first()
+        if transcript is not None:
+            logger.info(f"Reusing {transcriber.name} transcript of {os.path.basename(path)}")
+            return transcript
+
+        levels = audio_levels(path)
+        chunks = plan_chunks(
+            levels,
+            chunk_seconds=settings.TRANSCRIPTION_CHUNK_SECONDS,
+            search_seconds=settings.TRANSCRIPTION_SILENCE_SEARCH_SECONDS,
+            silence_db=settings.TRANSCRIPTION_SILENCE_DB,
+            min_silence=settings.TRANSCRIPTION_MIN_SILENCE_SECONDS,
+        ) if levels else []
+        started = time.monotonic()
+        with tempfile.TemporaryDirectory(prefix="audio_chunks_") as chunk_dir:
+            def _run(numbered):
+                number, (start, end) = numbered
+                chunk_path = os.path.join(chunk_dir, f"{number:05d}.flac")
+                extract_chunk(path, start, end, chunk_path)
+                return _transcribe_chunk(transcriber, chunk_path, end - start)
+
+            with ThreadPoolExecutor(max_workers=max(settings.TRANSCRIPTION_CONCURRENCY, 1)) as executor:
+                results = list(executor.map(_run, enumerate(chunks)))
+
+        text, words = stitch(zip((start for start, _ in chunks), results))
+        transcript, _ = Transcript.objects.get_or_create(
+            content_hash=content_hash,
+            transcriber=transcriber.name,
+            defaults={
+                "text": text,
+                "words": words,
+                "segments": segment_words(words, settings.TRANSCRIPT_SEGMENT_SECONDS),
+                "duration": len(levels) * LEVEL_WINDOW,
+                "chunk_count": len(chunks),
+            },
+        )
+        logger.info(
+            f"Transcribed {os.path.basename(path)} ({transcript.duration:.0f}s) in {len(chunks)} chunks "
+            f"with {transcriber.name} in {time.monotonic() - started:.1f}s"
+        )
+        return transcript
@@ -1,30 +1,33 @@
 import os
+import socket
 import uuid
 import ssl
+import tempfile
+import threading
 import certifi
 
 # Configure SSL context to use certifi's certificates
 ssl_context = ssl.create_default_context(cafile=certifi.where())
 ssl._create_default_https_context = lambda: ssl_context
 
-import numpy as np
-from langchain_community.vectorstores import LanceDB
-
-from langchain_experimental.open_clip import OpenCLIPEmbeddings
-from PIL import Image as _PILImage
-
 import base64
+import hashlib
 import io
-from io import BytesIO
+import json
+import logging
+
+from django.db import transaction
+
+from apps.common.utils.asset_cache import get_asset_cache
+from apps.common.utils.locks import KeyedLock
+from apps.common.utils.pdf_rasterizer import PdfRasterizer
+
 
-import numpy as np
-from PIL import Image
+logger = logging.getLogger(__name__)
 
-from moviepy.editor import VideoFileClip
-from functools import lru_cache
-from pdf2image import convert_from_path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+# Heavy dependencies (torch/open_clip, LanceDB, langchain loaders, pdf2image, deepgram)
+# are imported where they are used, so importing this module stays cheap for web processes,
+# management commands and migrations.
 
 
 def resize_base64_image(base64_string, size=(128, 128)):
@@ -38,6 +41,8 @@ def resize_base64_image(base64_string, size=(128, 128)):
     Returns:
     str: Base64 string of the resized image.
     """
+    from PIL import Image
+
     # Decode the Base64 string
     img_data = base64.b64decode(base64_string)
     img = Image.open(io.BytesIO(img_data))
@@ -78,255 +83,361 @@ def split_image_text_types(docs):
             text.append(doc)
     return {"images": images, "texts": text}
 
-clip_embd = OpenCLIPEmbeddings(model_name="ViT-B-32", checkpoint="openai")
 
+_clip_embd = None
+_clip_lock = threading.Lock()
+
+
+def get_clip_embeddings():
+    """Process-wide CLIP embedding model, loaded on first use"""
+    global _clip_embd
+    if _clip_embd is None:
+        with _clip_lock:
+            if _clip_embd is None:
+                from django.conf import settings
+                from .clip_embeddings import CLIPEmbeddings
+
+                _clip_embd = CLIPEmbeddings(
+                    model_name="ViT-B-32",
+                    checkpoint="openai",
+                    batch_size=settings.CLIP_BATCH_SIZE,
+                    preprocess_workers=settings.CLIP_PREPROCESS_WORKERS,
+                    torch_threads=settings.CLIP_TORCH_THREADS,
+                )
+    return _clip_embd
+
+
+def preload():
+    """Load the CLIP weights and indexing dependencies up front, for long-running worker processes"""
+    get_clip_embeddings()
+    import lancedb  # noqa: F401
+    import pdf2image  # noqa: F401
+    import deepgram  # noqa: F401
+    from langchain_community.document_loaders import PyPDFLoader  # noqa: F401
+
+
+# Serializes indexing of the same table across threads
+_index_lock = KeyedLock()
 
-import cv2
-import os
 
 def get_images_from_video(video_path, output_dir='/tmp'):
     """
-    Extracts frames from a video, saves them as JPEG files in the specified directory,
+    Saves the frames FrameSampler picks from a video as JPEG files in the specified directory,
     and returns a list of the saved file paths.
 
     :param video_path: Path to the input video file.
     :param output_dir: Directory where frames will be saved. Defaults to '/tmp'.
     :return: List of file paths to the saved frames.
     """
+    import cv2
+    from apps.common.utils.frame_sampler import FrameSampler
+
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Initialize video capture
-    video = cv2.VideoCapture(video_path)
-    
-    if not video.isOpened():
-        raise IOError(f"Cannot open video file {video_path}")
-    
     frame_paths = []
-    frame_count = 0
     name = os.path.basename(video_path)
    
-    while True:
-        success, frame = video.read()
-        if not success:
-            break  # Exit loop if no frame is returned
-        
+    for frame in FrameSampler().sample(video_path):
         # Construct the filename with zero-padded frame number
-        frame_filename = os.path.join(output_dir, f"{name}_frame_{frame_count:05d}.jpg")
-        
-        # Save the frame as a JPEG file
-        cv2.imwrite(frame_filename, frame)
-        
-        # Append the file path to the list
+        frame_filename = os.path.join(output_dir, f"{name}_frame_{frame.index:05d}.jpg")
+        cv2.imwrite(frame_filename, frame.image)
         frame_paths.append(frame_filename)
-        
-        frame_count += 1
-    
-    # Release the video capture object
-    video.release()
     
-    print(f"{frame_count} frames saved to {output_dir}.")
+    logger.info(f"{len(frame_paths)} frames saved to {output_dir}")
     return frame_paths
 
-@lru_cache(maxsize=None)
-def get_audio_from_video(video_path,  output_dir='/tmp'):
-    name = os.path.basename(video_path)
-    mp3_file = os.path.join(output_dir, f"{name}.mp3")
 
-    # Load the video clip
-    video_clip = VideoFileClip(video_path)
+def get_images_from_document(doc_path, output_dir='/tmp'):
+    """Render every page of a PDF into output_dir and return the image paths in page order"""
+    pages = PdfRasterizer().render(doc_path, output_dir)
+    return [page.path for page in sorted(pages)]
 
-    # Extract the audio from the video clip
-    audio_clip = video_clip.audio
 
-    # Write the audio to a separate file
-    try:
-        audio_clip.write_audiofile(mp3_file)
-
-        # Close the video and audio clips
-        audio_clip.close()
-    except:
-        pass
-    video_clip.close()
-
-    print("Audio extraction successful!")
-    return mp3_file
-# Create chroma
-
-def get_images_from_document(doc_path,  output_dir='/tmp'):
-    images = convert_from_path(doc_path)
-    if not images or len(images) == 0:
-        return []
-    
+def _add_image_batch(store, paths):
+    """Embed and add the images at `paths` to `store`, then delete the files and clear the list"""
+    if not paths:
+        return 0
+    store.add_images(paths)
+    for path in paths:
+        os.remove(path)
+    count = len(paths)
+    paths.clear()
+    return count
 
-    name = os.path.basename(doc_path)
 
-    frame_paths = []
-    for i, image in enumerate(images):
-        image_filename =  os.path.join(output_dir, f"{name}_frame_{i:05d}.jpg")
-        print(image_filename)
-    
-        image.save(image_filename)
-    
-    # Append the file path to the list
-        frame_paths.append(image_filename)
-    
-    return frame_paths
+def transcript_params(transcriber):
+    """Extraction parameters of a transcript index; segments are what gets embedded"""
+    from django.conf import settings
 
+    return {
+        "source": "transcript",
+        "transcriber": transcriber.name,
+        "segment_seconds": settings.TRANSCRIPT_SEGMENT_SECONDS,
+    }
 
-import os
 
-from deepgram import (
-    DeepgramClient,
-    PrerecordedOptions,
-)
+def _timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
 
 
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-# URL to the audio file
-# main.py (python example)
+CLIP_MODEL_ID = "open_clip/ViT-B-32/openai"
+DOCUMENT_CHUNK_SIZE = 1000
+DOCUMENT_CHUNK_OVERLAP = 200
 
-import os
 
-from deepgram import (
-    DeepgramClient,
-    PrerecordedOptions,
-    FileSource,
-)
+class VectorIndexError(Exception):
+    """One or more of an asset's vector indexes could not be built"""
 
 
+def index_fingerprint(content_hash, embedding_model, params, location=""):
+    """Key of a vector table: changes whenever content, model, extraction parameters or storage change"""
+    payload = {"content": content_hash, "model": embedding_model, "params": params}
+    if location:
+        payload["location"] = location
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
 
-@lru_cache(maxsize=None)
-def transcribe(audio_file):
-    try:
-        # STEP 1 Create a Deepgram client using the API key
-        deepgram = DeepgramClient(DEEPGRAM_API_KEY)
 
-        with open(audio_file, "rb") as file:
-            buffer_data = file.read()
+def vdb_uri(kind):
+    """LanceDB location of a kind of index under VECTOR_STORE_URI"""
+    from django.conf import settings
 
-        payload: FileSource = {
-            "buffer": buffer_data,
-        }
+    return f"{settings.VECTOR_STORE_URI.rstrip('/')}/vdb_{kind.lower()}s"
 
-        #STEP 2: Configure Deepgram options for audio analysis
-        options = PrerecordedOptions(
-            model="nova-2",
-            smart_format=True,
-        )
 
-        # STEP 3: Call the transcribe_file method with the text payload and options
-        response = deepgram.listen.prerecorded.v("1").transcribe_file(payload, options)
+def storage_location():
+    """Where this process's tables live; a local directory is only visible to this host"""
+    from django.conf import settings
 
-        # STEP 4: Print the response
-        transcript = response.results.channels[0].alternatives[0].transcript
-        return transcript
-        
+    uri = settings.VECTOR_STORE_URI
+    return uri if "://" in uri else f"{socket.gethostname()}:{uri}"
 
-    except Exception as e:
-        print(f"Exception: {e}")
-    return ""
 
+def _table_exists(uri, table_name):
+    import lancedb
+
+    return bool(table_name) and table_name in lancedb.connect(uri).table_names()
 
 
+def _drop_table(uri, table_name):
+    import lancedb
+
+    try:
+        lancedb.connect(uri).drop_table(table_name)
+    except Exception as e:
+        logger.warning(f"Could not drop vector table {table_name}: {e}")
+
 
 class VectorStore:
+    """Retrieval over the CLIP-embedded page images, frames and texts of one asset.
+
+    Tables are looked up in the VectorIndex manifest by content hash, embedding model and
+    extraction parameters, so unchanged content - including the same file uploaded as another
+    asset - is never embedded twice. A (re)build writes a new staging table and only points
+    the manifest at it once complete; an interrupted build leaves the manifest untouched.
+
+    Manifest entries are scoped to the storage holding their tables: with a local
+    VECTOR_STORE_URI each host keeps its own entries and only ever replaces its own tables,
+    while a shared URI (e.g. s3://) lets every host reuse the same tables.
+    """
+
     def __init__(self, name, video_path=None, image_only=False) -> None:
-        self.indexed_image = False
-        self.indexed_text = False
-        self.transcript = ""
-    
-        self.image_vectorstore = LanceDB(
-            table_name=name, embedding=clip_embd,
-            uri="/tmp/vdb_images"
-        )
-
-        self.text_vectorstore =  LanceDB(
-            table_name=name, embedding=clip_embd,
-            uri="/tmp/vdb_texts"
-        )
-        if self.image_vectorstore.get_table(name):
-            self.indexed_image = True
-        if self.text_vectorstore.get_table(name):
-            self.indexed_text = True
-        if image_only and self.image_vectorstore.get_table(name):
-            self.indexed_image = True
-        
+        self.name = name
+        self.image_vectorstore = None
+        self.text_vectorstore = None
+        # Kinds whose index could not be built, with the error
+        self.errors = {}
+
+    def _open(self, uri, table_name):
+        from langchain_community.vectorstores import LanceDB
+
+        return LanceDB(table_name=table_name, embedding=get_clip_embeddings(), uri=uri)
+
+    def _ensure_index(self, kind, content_hash, params, build):
+        """Return the LanceDB store for this content and parameters, building it with `build(store)` if needed"""
+        from apps.agent_management.models import VectorIndex
+
+        uri = vdb_uri(kind)
+        index_key = index_fingerprint(content_hash, CLIP_MODEL_ID, params, storage_location())
+        # Fields of one asset, and assets with the same content, are extracted concurrently
+        with _index_lock(f"{kind}:{index_key}"):
+            index = VectorIndex.objects.filter(kind=kind, index_key=index_key).first()
+            if index and (index.item_count == 0 or _table_exists(uri, index.table_name)):
+                logger.info(f"Reusing {kind} index {index.table_name or '(empty)'} for {self.name}")
+                return self._open(uri, index.table_name) if index.item_count else None
+
+            staging = f"{kind.lower()}_{index_key[:16]}_{uuid.uuid4().hex[:8]}"
+            store = self._open(uri, staging)
+            try:
+                item_count = build(store)
+            except Exception:
+                _drop_table(uri, staging)
+                raise
+            index = self._publish(kind, index_key, content_hash, params, staging if item_count else "", item_count, uri)
+            return self._open(uri, index.table_name) if index.item_count else None
+
+    def _publish(self, kind, index_key, content_hash, params, table_name, item_count, uri):
+        """Point the manifest at a freshly built table and drop the table it replaces"""
+        from apps.agent_management.models import VectorIndex
+
+        with transaction.atomic():
+            index, created = VectorIndex.objects.select_for_update().get_or_create(
+                kind=kind,
+                index_key=index_key,
+                defaults={
+                    "content_hash": content_hash,
+                    "embedding_model": CLIP_MODEL_ID,
+                    "params": params,
+                    "table_name": table_name,
+                    "item_count": item_count,
+                },
+            )
+            replaced = None
+            if not created:
+                if index.item_count and _table_exists(uri, index.table_name):
+                    # Another worker finished the same build first; keep theirs
+                    replaced = table_name
+                else:
+                    replaced = index.table_name
+                    index.table_name = table_name
+                    index.item_count = item_count
+                    index.save(update_fields=["table_name", "item_count", "updated_at"])
+        if replaced:
+            _drop_table(uri, replaced)
+        return index
+
+    def _index_kinds(self, content_hash, builds):
+        """Build each (kind, params, build) independently so one failure does not block the others.
+
+        Raises VectorIndexError once all were attempted if any failed, so a missing index is
+        never mistaken for empty content; the failures are also kept in `errors`.
+        """
+        for kind, params, build in builds:
+            try:
+                store = self._ensure_index(kind, content_hash, params, build)
+            except Exception as e:
+                logger.error(f"Error building {kind} index for {self.name}: {e}")
+                self.errors[kind] = str(e)
+                continue
+            if kind == "IMAGE":
+                self.image_vectorstore = store
+            else:
+                self.text_vectorstore = store
+        if self.errors:
+            failed = "; ".join(f"{kind}: {error}" for kind, error in self.errors.items())
+            raise VectorIndexError(f"Could not index {self.name} ({failed})")
 
     def index_video(self, video_path):
-        if self.indexed_image and self.indexed_text:
-            print("already indexed", video_path)
-            return
-        images = get_images_from_video(video_path=video_path)
-        audio_file = get_audio_from_video(video_path)
-        self.transcript  = transcribe(audio_file)
-        
-        if not self.indexed_image:
-            try:
-                self.image_vectorstore.delete(delete_all=True)
-            except:
-                pass
-            self.image_vectorstore.add_images(images)
-            self.indexed_image = True
-        
-        if not self.indexed_text:
-            self.text_vectorstore.add_texts([self.transcript])
-            self.indexed_text = True
+        from django.conf import settings
+
+        def build_frames(store):
+            # Frames are only needed until they are embedded
+            with tempfile.TemporaryDirectory(prefix="frames_") as frame_dir:
+                images = get_images_from_video(video_path=video_path, output_dir=frame_dir)
+                if images:
+                    store.add_images(images)
+            return len(images)
+
+        from .transcription import get_transcriber
+
+        transcriber = get_transcriber()
+
+        def build_transcript(store):
+            from .transcription import transcribe_audio
+
+            # ffmpeg reads the audio track straight from the video
+            return self._add_transcript(store, transcribe_audio(video_path, transcriber))
+
+        frame_params = {
+            "source": "video_frames",
+            "fps": settings.VIDEO_SAMPLE_FPS,
+            "scene_threshold": settings.VIDEO_SCENE_THRESHOLD,
+            "max_frames": settings.VIDEO_MAX_FRAMES,
+        }
+        self._index_kinds(get_asset_cache().content_hash(video_path), [
+            ("IMAGE", frame_params, build_frames),
+            ("TEXT", transcript_params(transcriber), build_transcript),
+        ])
 
     def index_audio(self, audio_path):
-        if self.indexed_text:
-            print("already indexed", audio_path)
-            return
-        
-        self.transcript  = transcribe(audio_path)
-        if not self.indexed_text:
-            self.text_vectorstore.add_texts([self.transcript])
-            self.indexed_text = True
+        from .transcription import get_transcriber
 
-    def index_images(self, images):
-        if not self.indexed_image:
-            try:
-                self.image_vectorstore.delete(delete_all=True)
-            except:
-                pass
-            self.image_vectorstore.add_images(images)
-            self.indexed_image = True
+        transcriber = get_transcriber()
 
-    def index_document(self, doc_path):
-        error = None
-        if self.indexed_image and self.indexed_text:
-            print("already indexed", doc_path)
-            return
-        try:
-            images = get_images_from_document(doc_path=doc_path)
-            if not self.indexed_image:
-                try:
-                    self.image_vectorstore.delete(delete_all=True)
-                except:
-                    pass
-                self.image_vectorstore.add_images(images)
-                self.indexed_image = True
-        except:
-            error = True
+        def build_transcript(store):
+            from .transcription import transcribe_audio
 
-        try:
-            loader = PyPDFLoader(doc_path)
+            return self._add_transcript(store, transcribe_audio(audio_path, transcriber))
 
-            docs = loader.load()
-            print(len(docs))
+        self._index_kinds(get_asset_cache().content_hash(audio_path), [
+            ("TEXT", transcript_params(transcriber), build_transcript),
+        ])
 
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    def _add_transcript(self, store, transcript):
+        """Embed the transcript's segments, each prefixed with the span of the recording it covers"""
+        segments = transcript.segments
+        if segments:
+            store.add_texts(
+                [f"[{_timestamp(s['start'])}-{_timestamp(s['end'])}] {s['text']}" for s in segments],
+                metadatas=[{"start": s["start"], "end": s["end"]} for s in segments],
+            )
+        return len(segments)
+
+    def index_images(self, images):
+        def build_images(store):
+            store.add_images(images)
+            return len(images)
+
+        digest = hashlib.sha256()
+        for image in images:
+            digest.update(get_asset_cache().content_hash(image).encode("utf-8"))
+        self._index_kinds(digest.hexdigest(), [
+            ("IMAGE", {"source": "images"}, build_images),
+        ])
+
+    def index_document(self, doc_path):
+        from django.conf import settings
+
+        rasterizer = PdfRasterizer()
+
+        def build_pages(store):
+            # Pages are embedded as they are rendered and removed once embedded, so a long
+            # document never has more than a few ranges of pages on disk
+            count = 0
+            batch = []
+            with tempfile.TemporaryDirectory(prefix="pages_") as page_dir:
+                for page in rasterizer.render(doc_path, page_dir):
+                    batch.append(page.path)
+                    if len(batch) >= settings.CLIP_BATCH_SIZE:
+                        count += _add_image_batch(store, batch)
+                count += _add_image_batch(store, batch)
+            return count
+
+        def build_chunks(store):
+            from langchain_community.document_loaders import PyPDFLoader
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            docs = PyPDFLoader(doc_path).load()
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=DOCUMENT_CHUNK_SIZE, chunk_overlap=DOCUMENT_CHUNK_OVERLAP
+            )
             splits = text_splitter.split_documents(docs)
-            if not self.indexed_text:
-                self.text_vectorstore.add_documents(
-                    documents=splits
-                )
-                self.indexed_text = True
-        except:
-            error = True
-        if not error:
-            self.indexed_image = True
-            self.indexed_text = True
+            if splits:
+                store.add_documents(documents=splits)
+            return len(splits)
+
+        page_params = {"source": "pdf_pages", "dpi": rasterizer.dpi, "format": rasterizer.fmt}
+        chunk_params = {
+            "source": "pdf_text",
+            "splitter": "recursive",
+            "chunk_size": DOCUMENT_CHUNK_SIZE,
+            "chunk_overlap": DOCUMENT_CHUNK_OVERLAP,
+        }
+        self._index_kinds(get_asset_cache().content_hash(doc_path), [
+            ("IMAGE", page_params, build_pages),
+            ("TEXT", chunk_params, build_chunks),
+        ])
 
     def invoke(self, query, k=10):
         data = {
@@ -334,15 +445,17 @@ class VectorStore:
             'texts': []
         }
         try:
-            results =  self.image_vectorstore.as_retriever().invoke(query, k=k)
-            data = split_image_text_types(results)
+            if self.image_vectorstore:
+                results =  self.image_vectorstore.as_retriever().invoke(query, k=k)
+                data = split_image_text_types(results)
         except:
             pass
         try:
-            text_data = self.text_vectorstore.as_retriever().invoke(query, k=k)
-            texts = [t.page_content for t in text_data]
+            if self.text_vectorstore:
+                text_data = self.text_vectorstore.as_retriever().invoke(query, k=k)
+                texts = [t.page_content for t in text_data]
 
-            data['texts'] = texts
+                data['texts'] = texts
         except:
             pass
-        return data
\ No newline at end of file
+        return data
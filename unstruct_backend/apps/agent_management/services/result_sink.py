@@ -0,0 +1,247 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects multipart parts under 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Presigned result URLs expire after 7 days
+RESULT_URL_EXPIRY = 7 * 24 * 60 * 60
+
+
+class S3MultipartWriter:
+    """Uploads a file to S3 as it is written, one multipart part per `part_size` bytes"""
+
+    def __init__(self, client, bucket: str, key: str, content_type: str, part_size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = client.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type
+        )["UploadId"]
+
+    def write(self, data: bytes):
+        self._buffer.extend(data)
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        number = len(self._parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=bytes(self._buffer)
+        )
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+        self._buffer.clear()
+
+    def close(self):
+        if self._buffer or not self._parts:
+            self._upload_part()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={"Parts": self._parts}
+        )
+
+    def abort(self):
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            logger.warning(f"Failed to abort multipart upload of {self.key}: {e}")
+
+
+class LocalFileWriter:
+    """Writes a file to local disk, renamed into place when complete"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._partial = f"{path}.part"
+        self._file = open(self._partial, "wb")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._partial, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._partial):
+            os.remove(self._partial)
+
+
+class S3ResultStorage:
+    def __init__(self, bucket: str, part_size: int):
+        from apps.common.utils.s3_clients import get_s3_client
+
+        self.bucket = bucket
+        self.part_size = part_size
+        # Presigned URLs must be signed for the bucket's region or they fail immediately
+        self.client = get_s3_client(settings.AWS_S3_REGION)
+
+    def open(self, key: str, content_type: str):
+        return S3MultipartWriter(self.client, self.bucket, key, content_type, self.part_size)
+
+    def put(self, key: str, body: bytes, content_type: str):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+
+    def read(self, key: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=RESULT_URL_EXPIRY
+        )
+
+
+class LocalResultStorage:
+    """Development backend: results are written under RESULT_LOCAL_DIR"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def open(self, key: str, content_type: str):
+        return LocalFileWriter(os.path.join(self.root, key))
+
+    def put(self, key: str, body: bytes, content_type: str):
+        writer = self.open(key, content_type)
+        writer.write(body)
+        writer.close()
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.root, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def url(self, key: str) -> str:
+        return f"file://{os.path.join(self.root, key)}"
+
+
+def get_result_storage():
+    bucket = getattr(settings, "AWS_STORAGE_BUCKET_NAME", None)
+    if settings.RESULT_STORAGE_BACKEND == "s3" and bucket:
+        return S3ResultStorage(bucket, settings.RESULT_UPLOAD_PART_SIZE)
+    return LocalResultStorage(settings.RESULT_LOCAL_DIR)
+
+
+class ResultSink:
+    """Streams a task's results to storage as CSV and NDJSON while the task runs.
+
+    Each asset's TaskResult rows become one CSV row (asset, source, one column per
+    extraction field) and one NDJSON line as soon as the asset finishes. Nothing is
+    buffered beyond the current upload part. `close` completes both files and writes a
+    manifest describing them; `abort` discards the uploads.
+
+    A storage error never fails the task: it is logged, the uploads are discarded and the
+    results remain available from the task's rows.
+    """
+
+    def __init__(self, task, fields: List[str], storage=None):
+        self.task = task
+        self.fields = list(fields)
+        self.storage = storage or get_result_storage()
+        self.prefix = f"task_results/{task.id}/results_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
+        self.csv_key = f"{self.prefix}.csv"
+        self.ndjson_key = f"{self.prefix}.ndjson"
+        self.manifest_key = f"{self.prefix}.manifest.json"
+        self.rows = 0
+        self.failed = False
+        self._lock = threading.Lock()
+        self._started_at = timezone.now()
+        self._csv = self.storage.open(self.csv_key, "text/csv")
+        try:
+            self._ndjson = self.storage.open(self.ndjson_key, "application/x-ndjson")
+        except Exception:
+            self._csv.abort()
+            raise
+        self._write_csv(["asset", "source"] + self.fields)
+
+    def _write_csv(self, row: List):
+        out = io.StringIO()
+        csv.writer(out).writerow(row)
+        self._csv.write(out.getvalue().encode("utf-8"))
+
+    def _write_ndjson(self, record: Dict):
+        self._ndjson.write((json.dumps(record, default=str) + "\n").encode("utf-8"))
+
+    def write_rows(self, rows):
+        """Write one finished asset's TaskResult rows"""
+        if not rows:
+            return
+        first = rows[0]
+        values = {row.field_name: row for row in rows}
+        with self._lock:
+            self._guarded(self._write_row, first, values, rows)
+
+    def _write_row(self, first, values, rows):
+        self._write_csv([first.asset_name, first.source] + [
+            values[field].value if field in values and values[field].value is not None else ""
+            for field in self.fields
+        ])
+        self._write_ndjson({
+            "type": "extraction",
+            "position": first.position,
+            "asset": first.asset_name,
+            "source": first.source,
+            "data": {row.field_name: row.as_data() for row in rows},
+        })
+        self.rows += 1
+
+    def write_generations(self, generations: Dict):
+        with self._lock:
+            for field, content in (generations or {}).items():
+                self._guarded(self._write_ndjson, {"type": "generation", "field": field, "content": content})
+
+    def _guarded(self, write, *args):
+        if self.failed:
+            return
+        try:
+            write(*args)
+        except Exception as e:
+            logger.error(f"Failed to write results of task {self.task.id}: {e}")
+            self.abort()
+
+    def close(self) -> Optional[Dict]:
+        """Complete the uploads and write the manifest; returns the manifest, or None if writing failed"""
+        with self._lock:
+            self._guarded(self._complete)
+            return None if self.failed else self.manifest
+
+    def _complete(self):
+        self._csv.close()
+        self._ndjson.close()
+        self.manifest = {
+            "task_id": str(self.task.id),
+            "fields": self.fields,
+            "rows": self.rows,
+            "files": {"csv": self.csv_key, "ndjson": self.ndjson_key},
+            "started_at": self._started_at.isoformat(),
+            "completed_at": timezone.now().isoformat(),
+        }
+        self.storage.put(self.manifest_key, json.dumps(self.manifest).encode("utf-8"), "application/json")
+
+    def abort(self):
+        if self.failed:
+            return
+        self.failed = True
+        self._csv.abort()
+        self._ndjson.abort()
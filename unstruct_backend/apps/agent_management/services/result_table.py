@@ -0,0 +1,198 @@
+import datetime
+import io
+import json
+import logging
+from typing import Dict, List
+
+from apps.core.models import TaskResult
+from apps.core.models.action import ACTION_TYPE, OUTPUT_COLUMN_TYPE
+
+from .result_sink import get_result_storage
+
+logger = logging.getLogger(__name__)
+
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+# Result rows fetched per database round trip while materializing
+FETCH_CHUNK_SIZE = 2000
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError("booleans are not numbers")
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace(",", "").strip())
+
+
+def _to_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value).strip()[:10])
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def typed_array(values: List, column_type: str):
+    """Arrow array for a field's values, typed by its OUTPUT_COLUMN_TYPE.
+
+    A NUMBER or DATE column falls back to text if any of its values does not parse, so
+    nothing the model extracted is lost.
+    """
+    import pyarrow as pa
+
+    converters = {
+        OUTPUT_COLUMN_TYPE.NUMBER: (_to_number, pa.float64()),
+        OUTPUT_COLUMN_TYPE.DATE: (_to_date, pa.date32()),
+    }
+    if column_type in converters:
+        convert, arrow_type = converters[column_type]
+        try:
+            return pa.array([None if value in (None, "") else convert(value) for value in values], type=arrow_type)
+        except (TypeError, ValueError):
+            pass
+    return pa.array([_to_text(value) for value in values], type=pa.string())
+
+
+def build_results_table(task):
+    """Materialize the task's extraction results: one row per asset, four columns per field"""
+    import pyarrow as pa
+
+    field_types: Dict[str, str] = dict(
+        task.actions.filter(action_type=ACTION_TYPE.EXTRACTION)
+        .order_by("created_at")
+        .values_list("output_column_name", "output_column_type")
+    )
+    assets = []
+    values: Dict[str, Dict[str, List]] = {}
+    rows = (
+        TaskResult.objects.filter(task=task, action_type=ACTION_TYPE.EXTRACTION)
+        .order_by("position", "created_at")
+        .values_list(
+            "position", "asset_id", "asset_name", "source", "field_name", "value", "confidence", "reference", "error"
+        )
+        .iterator(chunk_size=FETCH_CHUNK_SIZE)
+    )
+    last_position = None
+    for position, asset_id, asset_name, source, field_name, value, confidence, reference, error in rows:
+        if position != last_position:
+            # Results of a deleted asset keep a key unique within the task: its position
+            assets.append((str(asset_id) if asset_id else f"position:{position}", asset_name, source))
+            last_position = position
+        # Fields of deleted actions are kept as text
+        field_types.setdefault(field_name, OUTPUT_COLUMN_TYPE.TEXT)
+        columns = values.setdefault(field_name, {"value": {}, "confidence": {}, "reference": {}, "error": {}})
+        index = len(assets) - 1
+        columns["value"][index] = value
+        columns["confidence"][index] = confidence
+        columns["reference"][index] = reference
+        columns["error"][index] = error
+
+    count = len(assets)
+    arrays = {
+        "TASK_ID": pa.array([str(task.id)] * count, type=pa.string()),
+        "ASSET_ID": pa.array([asset_id for asset_id, _, _ in assets], type=pa.string()),
+        "ASSET": pa.array([asset for _, asset, _ in assets], type=pa.string()),
+        "SOURCE": pa.array([source for _, _, source in assets], type=pa.string()),
+    }
+    for field_name, column_type in field_types.items():
+        columns = values.get(field_name, {"value": {}, "confidence": {}, "reference": {}, "error": {}})
+        name = field_name.upper()
+        arrays[name] = typed_array([columns["value"].get(i) for i in range(count)], column_type)
+        arrays[f"{name}_CONFIDENCE"] = pa.array([columns["confidence"].get(i) for i in range(count)], type=pa.float64())
+        arrays[f"{name}_REFERENCE"] = pa.array([columns["reference"].get(i) for i in range(count)], type=pa.string())
+        arrays[f"{name}_ERROR"] = pa.array([columns["error"].get(i) for i in range(count)], type=pa.string())
+    return pa.table(arrays)
+
+
+def with_extraction_type(table):
+    """The table with an EXTRACTION_TYPE column after ASSET, completing the key warehouse exports merge on"""
+    import pyarrow as pa
+
+    return table.add_field(
+        table.column_names.index("ASSET") + 1,
+        pa.field("EXTRACTION_TYPE", pa.string()),
+        pa.array([ACTION_TYPE.EXTRACTION.value] * table.num_rows, type=pa.string()),
+    )
+
+
+def parquet_key(task):
+    return f"{task.results_prefix}.parquet" if task.results_prefix else None
+
+
+def write_results_parquet(task, storage=None):
+    """Materialize the task's results and store them as Parquet next to its CSV; returns the table"""
+    table = build_results_table(task)
+    key = parquet_key(task)
+    if key:
+        (storage or get_result_storage()).put(key, table_to_parquet(table), PARQUET_CONTENT_TYPE)
+    return table
+
+
+def load_results_table(task, storage=None):
+    """The task's results as an Arrow table, read from its Parquet file when there is one.
+
+    Tasks that are still running (or were processed before results were materialized) are
+    built from the result rows; finished tasks missing their file get it written now.
+    """
+    import pyarrow.parquet as pq
+
+    key = parquet_key(task)
+    if not key:
+        return build_results_table(task)
+    storage = storage or get_result_storage()
+    data = storage.read(key)
+    if data is not None:
+        table = pq.read_table(io.BytesIO(data))
+        # Files written before rows carried their asset id are rebuilt below
+        if "ASSET_ID" in table.column_names:
+            return table
+    try:
+        return write_results_parquet(task, storage)
+    except Exception as e:
+        logger.error(f"Failed to store results table of task {task.id}: {e}")
+        return build_results_table(task)
+
+
+def table_to_parquet(table) -> bytes:
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def table_to_csv(table) -> bytes:
+    import pyarrow.csv as pa_csv
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer)
+    return buffer.getvalue()
+
+
+def table_to_excel(table) -> bytes:
+    """Write the table as .xlsx row by row (XlsxWriter constant-memory mode)"""
+    import pyarrow as pa
+    import xlsxwriter
+
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Results")
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    date_columns = {index for index, field in enumerate(table.schema) if pa.types.is_date(field.type)}
+    worksheet.write_row(0, 0, table.column_names)
+
+    row_number = 1
+    for batch in table.to_batches():
+        for row in batch.to_pylist():
+            for column, value in enumerate(row.values()):
+                if column in date_columns and value is not None:
+                    worksheet.write_datetime(row_number, column, value, date_format)
+                else:
+                    worksheet.write(row_number, column, value)
+            row_number += 1
+    workbook.close()
+    return buffer.getvalue()
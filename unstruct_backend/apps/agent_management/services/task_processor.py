@@ -1,68 +1,45 @@
 from typing import Dict
 import json
-import boto3
-import csv
-import io
-from collections import defaultdict
+import logging
 from django.conf import settings
-from django.utils import timezone
-from botocore.config import Config
 
 from apps.core.models import Task, ASSET_FILE_TYPE
+from apps.core.models.action import ACTION_TYPE
 from .agent_service_factory import AgentServiceFactory
+from .ai_service.completion_cache import completion_cache_session, evict_completions
+from .result_sink import ResultSink
+from .result_table import write_results_parquet
+
+logger = logging.getLogger(__name__)
 
 
 class TaskProcessor:
     def __init__(self):
         self.model = settings.AI_MODEL  # e.g., "OpenAI"
         self.preview_limit = 5  # Number of results to show in preview
-        self.s3_client = boto3.client(
-            's3',
-            region_name='us-east-2',
-            config=Config(signature_version='s3v4')
+
+    def _open_sink(self, task: Task):
+        fields = (
+            task.actions.filter(action_type=ACTION_TYPE.EXTRACTION)
+            .order_by('created_at')
+            .values_list('output_column_name', flat=True)
         )
+        try:
+            return ResultSink(task, fields)
+        except Exception as e:
+            # Results are still stored on the task; only the downloadable files are skipped
+            logger.error(f"Failed to open result files for task {task.id}: {e}")
+            return None
 
-    def _convert_to_csv(self, results: Dict) -> str:
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Collect all values by column
-        columns = defaultdict(list)
-        
-        # Process extractions
-        if 'extractions' in results:
-            for action_name, items in results['extractions'].items():
-                if isinstance(items, list):
-                    for item in items:
-                        value = item['data'].get(action_name, '')
-                        columns[action_name].append(value)
-        
-        # Process generations if they exist
-        if 'generations' in results:
-            for action_name, items in results['generations'].items():
-                if isinstance(items, list):
-                    for item in items:
-                        value = item['data'].get(action_name, '')
-                        columns[action_name].append(value)
-        
-        # Write headers (column names)
-        headers = list(columns.keys())
-        if not headers:  # If no data, return empty CSV with a message
-            writer.writerow(['message'])
-            writer.writerow(['No results available'])
-            return output.getvalue()
-            
-        writer.writerow(headers)
-        
-        # Find the maximum length of any column
-        max_length = max((len(values) for values in columns.values()), default=0)
-        
-        # Write values row by row
-        for i in range(max_length):
-            row = [columns[header][i] if i < len(columns[header]) else '' for header in headers]
-            writer.writerow(row)
-        
-        return output.getvalue()
+    def _store_generations(self, task: Task, generations):
+        if not isinstance(generations, dict):
+            return
+        actions = task.actions.filter(action_type=ACTION_TYPE.GENERATION)
+        task.record_generations([
+            (action, generations[action.output_column_name])
+            for action in actions
+            if action.output_column_name in generations
+        ])
 
     def process(self, task: Task) -> Dict[str, any]:
         # Get the file type of the first asset in the task
@@ -81,66 +58,54 @@ class TaskProcessor:
         if not agent_service:
             raise ValueError(f"AI model '{self.model}' is not supported.")
 
-        # Get full results
-        full_results = agent_service.process_task(task)
-
-        # Create preview results
-        preview_results = {}
-        if 'extractions' in full_results:
-            preview_results['extractions'] = {
-                field: results[:self.preview_limit] if isinstance(results, list) else results
-                for field, results in full_results['extractions'].items()
-            }
-        if 'generations' in full_results:
-            preview_results['generations'] = {
-                field: results[:self.preview_limit] if isinstance(results, list) else results
-                for field, results in full_results['generations'].items()
-            }
+        # Results are stored as TaskResult rows and streamed to the result files as each asset finishes
+        sink = self._open_sink(task)
+        task.result_sink = sink
+        try:
+            with completion_cache_session(task) as cache:
+                full_results = agent_service.process_task(task)
+            self._store_generations(task, full_results.get('generations'))
+            if sink:
+                sink.write_generations(full_results.get('generations'))
+        except Exception:
+            if sink:
+                sink.abort()
+            raise
+        finally:
+            task.result_sink = None
 
-        # Store full results in both CSV and JSON formats
-        timestamp = timezone.now().strftime("%Y%m%d_%H%M%S")
-        base_key = f"task_results/{task.id}/results_{timestamp}"
-        
-        # Store JSON version
         presigned_url = None
-        try:
-            if settings.AWS_STORAGE_BUCKET_NAME:
-                json_key = f"{base_key}.json"
-                self.s3_client.put_object(
-                    Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                    Key=json_key,
-                    Body=json.dumps(full_results),
-                    ContentType='application/json'
-                )
-                
-                # Convert and store CSV version
-                csv_key = f"{base_key}.csv"
-                csv_content = self._convert_to_csv(full_results)
-                self.s3_client.put_object(
-                    Bucket=settings.AWS_STORAGE_BUCKET_NAME,
-                    Key=csv_key,
-                    Body=csv_content,
-                    ContentType='text/csv'
-                )
+        if sink and sink.close():
+            task.results_prefix = sink.prefix
+            try:
+                # Materialize once for exports, stored as Parquet next to the CSV
+                write_results_parquet(task, sink.storage)
+            except Exception as e:
+                logger.error(f"Failed to store results table of task {task.id}: {e}")
+            try:
+                presigned_url = sink.storage.url(sink.csv_key)
+            except Exception as e:
+                logger.error(f"Failed to sign results URL for task {task.id}: {e}")
 
-                # Generate a pre-signed URL for the CSV file
-                presigned_url = self.s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={
-                        'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                        'Key': csv_key
-                    },
-                    ExpiresIn=604800  # URL expires in 7 days (7 * 24 * 60 * 60 seconds)
-                )
+        if cache:
+            task.llm_cache_hits = cache.hits
+            task.llm_cache_misses = cache.misses
+            try:
+                evict_completions(task.organization_id, settings.LLM_CACHE_MAX_BYTES_PER_ORG)
+            except Exception as e:
+                logger.error(f"Failed to evict completion cache entries after task {task.id}: {e}")
 
-                # Update task with results URL and properly serialized preview results
-                task.result_file_url = presigned_url
-        except Exception as e:
-            pass
-        task.process_results = json.dumps(preview_results)  # Properly serialize as JSON
-        task.save()
+        # Preview: the first few results of each field
+        preview_results = task.get_process_results(limit=self.preview_limit)
+        task.result_file_url = presigned_url
+        task.process_results = json.dumps(preview_results)
+        # Only touch our own columns; progress counters are updated concurrently with F() expressions
+        task.save(update_fields=[
+            'result_file_url', 'results_prefix', 'process_results', 'llm_cache_hits', 'llm_cache_misses', 'updated_at'
+        ])
 
         return {
             'preview': preview_results,
-            'results_url': presigned_url
+            'results_url': presigned_url,
+            'llm_cache': {'hits': task.llm_cache_hits, 'misses': task.llm_cache_misses},
         }
@@ -0,0 +1,52 @@
+import threading
+
+import torch
+from django.test import SimpleTestCase
+
+from apps.agent_management.services.ai_service.clip_embeddings import CLIPEmbeddings
+
+
+class FakeModel:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode_image(self, images):
+        self.batch_sizes.append(len(images))
+        # The ratio of the two components survives normalization, so each vector identifies its input
+        return torch.stack([torch.tensor([float(image[0]), 1.0]) for image in images])
+
+    def encode_text(self, tokens):
+        self.batch_sizes.append(len(tokens))
+        return torch.stack([torch.tensor([0.0, float(token[0])]) for token in tokens])
+
+
+def make_embeddings(batch_size):
+    # Skip __init__, which downloads real CLIP weights
+    embeddings = CLIPEmbeddings.__new__(CLIPEmbeddings)
+    embeddings.model = FakeModel()
+    embeddings.batch_size = batch_size
+    embeddings.preprocess_workers = 3
+    embeddings.tokenizer = lambda texts: torch.tensor([[len(text)] for text in texts])
+    embeddings._model_lock = threading.Lock()
+    embeddings._load_image = lambda uri: torch.tensor([float(uri)])
+    return embeddings
+
+
+class CLIPEmbeddingsTestCase(SimpleTestCase):
+    def test_images_are_embedded_in_batches_and_order(self):
+        embeddings = make_embeddings(batch_size=4)
+        vectors = embeddings.embed_image([str(i + 1) for i in range(10)])
+
+        self.assertEqual(embeddings.model.batch_sizes, [4, 4, 2])
+        self.assertEqual([round(vector[0] / vector[1]) for vector in vectors], list(range(1, 11)))
+
+    def test_texts_are_embedded_in_batches(self):
+        embeddings = make_embeddings(batch_size=3)
+        vectors = embeddings.embed_documents(["a", "bb", "ccc", "dddd"])
+
+        self.assertEqual(embeddings.model.batch_sizes, [3, 1])
+        self.assertEqual(len(vectors), 4)
+        self.assertEqual(embeddings.embed_query("x"), [0.0, 1.0])
+
+    def test_no_images(self):
+        self.assertEqual(make_embeddings(batch_size=4).embed_image([]), [])
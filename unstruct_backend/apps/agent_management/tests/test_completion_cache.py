@@ -0,0 +1,114 @@
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.agent_management.models import CompletionCacheEntry
+from apps.agent_management.services.ai_service.completion_cache import (
+    cached_completion,
+    completion_cache_session,
+    evict_completions,
+)
+from apps.agent_management.services.ai_service.concurrency import submit_llm_call
+
+User = get_user_model()
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, response='{"total": "42"}'):
+        self.calls += 1
+        return response
+
+
+class CompletionCacheFixtures:
+    def setUp(self):
+        self.organization = User.objects.create_user(
+            username="owner", email="owner@example.com", password="password123"
+        ).personal_organization
+        self.task = SimpleNamespace(organization_id=self.organization.id)
+        self.llm = FakeLLM()
+        self.asset = self.make_asset(b"invoice")
+
+    def make_asset(self, content):
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, "wb") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return SimpleNamespace(id=uuid.uuid4(), get_file_path=lambda: path)
+
+
+@override_settings(LLM_CACHE_ENABLED=True)
+class CompletionCacheTestCase(CompletionCacheFixtures, TestCase):
+    def run_extraction(self, task=None, prompt="Extract total", asset=None, response='{"total": "42"}'):
+        with completion_cache_session(task or self.task) as cache:
+            result = cached_completion(
+                "gpt-4o-mini", 0, prompt, asset or self.asset, lambda: self.llm(response),
+                cacheable=lambda r: r.startswith("{"),
+            )
+        return result, cache
+
+    def test_repeated_request_is_served_from_cache(self):
+        first, cache = self.run_extraction()
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        second, cache = self.run_extraction()
+        self.assertEqual(second, first)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        self.assertEqual(self.llm.calls, 1)
+
+    def test_same_content_in_another_asset_hits(self):
+        self.run_extraction()
+        _, cache = self.run_extraction(asset=self.make_asset(b"invoice"))
+        self.assertEqual(cache.hits, 1)
+
+    def test_changed_prompt_or_content_misses(self):
+        self.run_extraction()
+        self.run_extraction(prompt="Extract subtotal")
+        self.run_extraction(asset=self.make_asset(b"receipt"))
+        self.assertEqual(self.llm.calls, 3)
+
+    def test_entries_are_isolated_per_organization(self):
+        self.run_extraction()
+        other = User.objects.create_user(username="other", email="other@example.com", password="password123")
+        _, cache = self.run_extraction(task=SimpleNamespace(organization_id=other.personal_organization.id))
+        self.assertEqual(cache.misses, 1)
+
+    def test_rejected_response_is_not_stored(self):
+        self.run_extraction(response="not json")
+        self.assertFalse(CompletionCacheEntry.objects.exists())
+
+    @override_settings(LLM_CACHE_ENABLED=False)
+    def test_disabled_cache_always_calls(self):
+        self.run_extraction()
+        _, cache = self.run_extraction()
+        self.assertIsNone(cache)
+        self.assertEqual(self.llm.calls, 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for prompt in ("a", "b", "c"):
+            self.run_extraction(prompt=prompt)
+        self.run_extraction(prompt="a")
+
+        size = CompletionCacheEntry.objects.first().size
+        self.assertEqual(evict_completions(self.organization.id, max_bytes=2 * size), 1)
+        _, cache = self.run_extraction(prompt="b")
+        self.assertEqual(cache.misses, 1)
+
+
+@override_settings(LLM_CACHE_ENABLED=True)
+class CompletionCacheExecutorTestCase(CompletionCacheFixtures, TransactionTestCase):
+    """Executor threads use their own connections, so the rows they write must be committed to be seen"""
+
+    def test_cache_miss_in_provider_executor_is_stored(self):
+        with completion_cache_session(self.task) as cache:
+            call = lambda: cached_completion("gpt-4o-mini", 0, "Extract total", self.asset, self.llm)
+            self.assertEqual(submit_llm_call("test", call).result(), '{"total": "42"}')
+        self.assertEqual(cache.misses, 1)
+        entry = CompletionCacheEntry.objects.get()
+        self.assertEqual(entry.organization_id, self.organization.id)
@@ -0,0 +1,90 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.agent_management.services.ai_service.base_agent_service import BaseAgentService
+from apps.agent_management.services.ai_service.field_batching import EXTRACTION_MODE_MULTI_FIELD
+
+
+class FakeAssets:
+    def __init__(self, assets):
+        self._assets = assets
+
+    def all(self):
+        return self._assets
+
+
+class FakeTask:
+    def __init__(self, assets):
+        self.id = "task"
+        self.assets = FakeAssets(assets)
+        self.file_results = []
+        self.stored = {}
+
+    def record_file_result(self, failed=False):
+        self.file_results.append(failed)
+
+    def record_asset_results(self, asset, position, responses, failed=False):
+        self.stored[position] = {action.output_column_name: response for action, response in responses}
+        self.record_file_result(failed=failed)
+
+
+class FakeAgentService(BaseAgentService):
+    provider = "test"
+    handlers = {"PDF": object()}
+
+    def process_task(self, task):
+        return {}
+
+    def extract_field(self, handler, action, asset):
+        # Finish out of order to make sure results are re-assembled in asset order
+        time.sleep(random.uniform(0, 0.01))
+        if asset.name == "broken.pdf":
+            raise RuntimeError("model unavailable")
+        return {action.output_column_name: f"{asset.name}:{action.output_column_name}"}
+
+
+def make_asset(name, file_type="PDF"):
+    return SimpleNamespace(id=name, name=name, url=f"/tmp/{name}", file_type=file_type)
+
+
+class ExtractionFanOutTestCase(SimpleTestCase):
+    def test_results_keep_asset_order(self):
+        assets = [make_asset(f"doc{i}.pdf") for i in range(12)]
+        actions = [SimpleNamespace(output_column_name=name) for name in ("total", "date")]
+        task = FakeTask(assets)
+
+        results = FakeAgentService().extract_fields(task, actions)
+
+        for field in ("total", "date"):
+            self.assertEqual([item["asset"] for item in results[field]], [a.name for a in assets])
+            self.assertEqual(results[field][3]["data"][field], f"doc3.pdf:{field}")
+        self.assertEqual(task.file_results, [False] * len(assets))
+        self.assertEqual(task.stored[3]["date"], {"date": "doc3.pdf:date"})
+
+    def test_failures_are_isolated_per_asset(self):
+        assets = [make_asset("ok.pdf"), make_asset("broken.pdf"), make_asset("photo.gif", "OTHER")]
+        actions = [SimpleNamespace(output_column_name="total")]
+        task = FakeTask(assets)
+
+        results = FakeAgentService().extract_fields(task, actions)
+
+        self.assertEqual([item["asset"] for item in results["total"]], ["ok.pdf", "broken.pdf"])
+        self.assertIn("error", results["total"][1]["data"])
+        self.assertEqual(sorted(task.file_results), [False, True, True])
+        self.assertEqual(sorted(task.stored), [0, 1])
+        self.assertIn("error", task.stored[1]["total"])
+
+    @override_settings(EXTRACTION_MODE=EXTRACTION_MODE_MULTI_FIELD)
+    def test_services_without_batch_calls_extract_each_field(self):
+        service = FakeAgentService()
+        service.handlers = {"PDF": SimpleNamespace(supports_multi_field=True)}
+        actions = [SimpleNamespace(output_column_name=name, description="") for name in ("total", "date")]
+        task = FakeTask([make_asset("doc.pdf")])
+
+        results = service.extract_fields(task, actions)
+
+        self.assertEqual(results["date"][0]["data"], {"date": "doc.pdf:date"})
+        self.assertEqual(task.stored[0]["total"], {"total": "doc.pdf:total"})
@@ -0,0 +1,55 @@
+import json
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from apps.agent_management.services.ai_service.field_batching import (
+    batch_actions,
+    render_response_schema,
+    split_multi_field_response,
+)
+
+
+def make_action(name, description="Some field"):
+    return SimpleNamespace(output_column_name=name, description=description)
+
+
+class FieldBatchingTestCase(SimpleTestCase):
+    def test_batches_respect_field_limit(self):
+        actions = [make_action(f"field_{i}") for i in range(7)]
+        batches = batch_actions(actions, max_fields=3, token_budget=100000)
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        self.assertEqual([a for batch in batches for a in batch], actions)
+
+    def test_batches_respect_token_budget(self):
+        actions = [make_action(f"field_{i}", "x" * 800) for i in range(4)]
+        batches = batch_actions(actions, max_fields=100, token_budget=400)
+        self.assertEqual(len(batches), 4)
+
+    def test_oversized_field_gets_its_own_batch(self):
+        actions = [make_action("huge", "x" * 10000), make_action("small")]
+        batches = batch_actions(actions, max_fields=100, token_budget=500)
+        self.assertEqual([[a.output_column_name for a in batch] for batch in batches], [["huge"], ["small"]])
+
+    def test_response_schema_lists_every_key(self):
+        schema = render_response_schema([make_action("total"), make_action("date")])
+        for key in ("total", "total_confidence", "total_reference", "date_reference"):
+            self.assertIn(f'"{key}"', schema)
+        self.assertFalse(schema.rstrip("}\n").endswith(","))
+
+    def test_split_response_into_per_field_shape(self):
+        actions = [make_action("total"), make_action("date"), make_action("vendor")]
+        parsed = json.loads(
+            '{"total": "42", "total_confidence": 0.9, "total_reference": "Page 1",'
+            ' "date": "2024-01-01", "date_confidence": 0.5, "date_reference": "Page 2"}'
+        )
+        split = split_multi_field_response(parsed, actions)
+        self.assertEqual(split["total"], {"total": "42", "total_confidence": 0.9, "total_reference": "Page 1"})
+        self.assertEqual(split["date"]["date"], "2024-01-01")
+        self.assertIn("error", split["vendor"])
+
+    def test_split_propagates_parse_errors(self):
+        actions = [make_action("total"), make_action("date")]
+        split = split_multi_field_response({"error": "Invalid JSON response"}, actions)
+        self.assertEqual(split["total"], {"error": "Invalid JSON response"})
+        self.assertEqual(split["date"], {"error": "Invalid JSON response"})
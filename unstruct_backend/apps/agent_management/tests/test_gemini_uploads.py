@@ -0,0 +1,93 @@
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.agent_management.models import GeminiUpload
+from apps.agent_management.services.ai_service.gemini_uploads import GeminiUploadRegistry
+
+
+class FakeFilesAPI:
+    """Stands in for genai.upload_file, counting uploads"""
+
+    def __init__(self, ttl=timedelta(hours=48)):
+        self.ttl = ttl
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def __call__(self, path, mime_type):
+        with self._lock:
+            self.uploads.append(path)
+            name = f"files/{len(self.uploads)}"
+        return SimpleNamespace(
+            name=name, uri=f"https://example.invalid/{name}", mime_type=mime_type,
+            expiration_time=timezone.now() + self.ttl,
+        )
+
+
+class RegistryMixin:
+    def setUp(self):
+        self.files = FakeFilesAPI()
+        self.registry = GeminiUploadRegistry("api-key", upload=self.files)
+
+    def make_pdf(self, content):
+        handle, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(handle, "wb") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+
+@override_settings(GEMINI_UPLOAD_EXPIRY_MARGIN=3600)
+class GeminiUploadRegistryTestCase(RegistryMixin, TestCase):
+    def test_same_content_is_uploaded_once(self):
+        first = self.registry.get(self.make_pdf(b"%PDF invoice"))
+        # A fresh registry stands in for another worker
+        second = GeminiUploadRegistry("api-key", upload=self.files).get(self.make_pdf(b"%PDF invoice"))
+        self.assertEqual(first.uri, second.uri)
+        self.assertEqual(len(self.files.uploads), 1)
+        self.assertEqual(first.as_part()["file_data"]["mime_type"], "application/pdf")
+
+    def test_changed_content_is_uploaded_again(self):
+        self.registry.get(self.make_pdf(b"%PDF v1"))
+        self.registry.get(self.make_pdf(b"%PDF v2"))
+        self.assertEqual(len(self.files.uploads), 2)
+
+    def test_upload_near_expiry_is_replaced(self):
+        path = self.make_pdf(b"%PDF invoice")
+        self.registry.get(path)
+        GeminiUpload.objects.update(expires_at=timezone.now() + timedelta(minutes=30))
+
+        upload = self.registry.get(path)
+        self.assertEqual(len(self.files.uploads), 2)
+        self.assertEqual(GeminiUpload.objects.get().file_name, upload.file_name)
+
+    def test_other_api_key_does_not_reuse_uploads(self):
+        path = self.make_pdf(b"%PDF invoice")
+        self.registry.get(path)
+        GeminiUploadRegistry("other-key", upload=self.files).get(path)
+        self.assertEqual(len(self.files.uploads), 2)
+
+    def test_expired_uploads_are_purged(self):
+        self.registry.get(self.make_pdf(b"%PDF invoice"))
+        GeminiUpload.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.registry.purge_expired(), 1)
+
+
+@override_settings(GEMINI_UPLOAD_EXPIRY_MARGIN=3600, GEMINI_UPLOAD_CONCURRENCY=4)
+class GeminiPreUploadTestCase(RegistryMixin, TransactionTestCase):
+    # Uploads are recorded from pool threads, which use their own database connections
+
+    def test_upload_many_uploads_each_file_and_skips_failures(self):
+        paths = [self.make_pdf(f"%PDF {i}".encode()) for i in range(5)]
+
+        def missing():
+            raise FileNotFoundError("gone")
+
+        self.registry.upload_many([lambda p=p: p for p in paths] + [missing])
+        self.assertEqual(sorted(self.files.uploads), sorted(paths))
+        self.assertEqual(GeminiUpload.objects.count(), 5)
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+HEAVY_MODULES = ["torch", "open_clip", "lancedb", "moviepy", "pdf2image", "deepgram"]
+
+
+class LazyImportTestCase(SimpleTestCase):
+    def test_vector_store_import_does_not_load_models(self):
+        # Run in a fresh interpreter: other tests may already have imported these modules
+        code = (
+            "import sys\n"
+            "import apps.agent_management.services.ai_service.vector_store\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "")
@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.agent_management.services.ai_service.rate_limit import (
+    AdaptiveConcurrency,
+    BucketLimits,
+    DatabaseTokenBucket,
+    LocalTokenBucket,
+    RateLimiter,
+)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": retry_after} if retry_after else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the limiter sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FlakyCall:
+    """Fails with the given errors, then returns "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class BucketLimitsTestCase(SimpleTestCase):
+    def test_take_reports_wait_for_missing_tokens(self):
+        limits = BucketLimits(requests_per_minute=60, tokens_per_minute=600)
+        requests, tokens, wait = limits.take(5, 100, 40)
+        self.assertEqual((requests, tokens, wait), (4, 60, 0.0))
+        _, _, wait = limits.take(5, 10, 40)
+        self.assertAlmostEqual(wait, 3.0)
+
+    def test_unlimited_never_waits(self):
+        self.assertEqual(LocalTokenBucket(BucketLimits()).try_acquire(10 ** 6), 0.0)
+
+
+@override_settings(LLM_RETRY_MAX_ATTEMPTS=3, LLM_RETRY_BASE_DELAY=0.5, LLM_RETRY_MAX_DELAY=4)
+class RateLimiterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sleeps = self.clock.sleeps
+        self.bucket = LocalTokenBucket(BucketLimits(), clock=self.clock)
+        self.concurrency = AdaptiveConcurrency(max_limit=8)
+        self.limiter = RateLimiter("test", self.bucket, self.concurrency, sleep=self.clock.sleep)
+
+    def test_rate_limited_call_is_retried_after_retry_after(self):
+        call = FlakyCall(ProviderError(429, retry_after="7"))
+        self.assertEqual(self.limiter.call(call), "ok")
+        self.assertEqual(call.calls, 2)
+        self.assertGreaterEqual(self.clock.now, 7)
+        self.assertLess(self.concurrency.limit, 8)
+
+    def test_retry_after_pauses_every_caller(self):
+        self.bucket.block(7)
+        self.assertEqual(self.bucket.try_acquire(0), 7)
+        self.clock.now = 7
+        self.assertEqual(self.bucket.try_acquire(0), 0.0)
+
+    def test_budget_is_waited_for(self):
+        bucket = LocalTokenBucket(BucketLimits(requests_per_minute=6), clock=self.clock)
+        limiter = RateLimiter("test", bucket, self.concurrency, sleep=self.clock.sleep)
+        for _ in range(3):
+            limiter.call(FlakyCall())
+        # One request of burst, then one every ten seconds
+        self.assertAlmostEqual(self.clock.now, 20.0)
+
+    def test_server_errors_back_off_with_jitter(self):
+        call = FlakyCall(ProviderError(503), ProviderError(500))
+        self.assertEqual(self.limiter.call(call), "ok")
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(all(0 <= delay <= 1 for delay in self.sleeps))
+
+    def test_gives_up_after_max_attempts(self):
+        call = FlakyCall(*[ProviderError(429)] * 3)
+        with self.assertRaises(ProviderError):
+            self.limiter.call(call)
+        self.assertEqual(call.calls, 3)
+
+    def test_client_errors_are_not_retried(self):
+        call = FlakyCall(ProviderError(400))
+        with self.assertRaises(ProviderError):
+            self.limiter.call(call)
+        self.assertEqual(call.calls, 1)
+
+
+class AdaptiveConcurrencyTestCase(SimpleTestCase):
+    def test_additive_increase_multiplicative_decrease(self):
+        concurrency = AdaptiveConcurrency(max_limit=8)
+        concurrency.decrease()
+        concurrency.decrease()
+        self.assertEqual(concurrency.limit, 2)
+        for _ in range(4):
+            concurrency.acquire()
+            concurrency.release(latency=0.1)
+        self.assertGreater(concurrency.limit, 3)
+        self.assertLess(concurrency.limit, 4)
+
+    def test_slow_calls_decrease_the_limit(self):
+        concurrency = AdaptiveConcurrency(max_limit=8, latency_target=2)
+        concurrency.acquire()
+        concurrency.release(latency=5)
+        self.assertEqual(concurrency.limit, 4)
+
+
+class DatabaseTokenBucketTestCase(TestCase):
+    def test_workers_share_one_budget(self):
+        limits = BucketLimits(requests_per_minute=6)
+        first, second = DatabaseTokenBucket("openai:key", limits), DatabaseTokenBucket("openai:key", limits)
+        self.assertEqual(first.try_acquire(0), 0.0)
+        self.assertGreater(second.try_acquire(0), 0)
+        self.assertEqual(DatabaseTokenBucket("openai:other", limits).try_acquire(0), 0.0)
+
+    def test_block_holds_back_other_workers(self):
+        limits = BucketLimits(requests_per_minute=600)
+        DatabaseTokenBucket("gemini:key", limits).block(30)
+        self.assertGreater(DatabaseTokenBucket("gemini:key", limits).try_acquire(0), 25)
@@ -0,0 +1,105 @@
+import csv
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from apps.agent_management.services.result_sink import (
+    MIN_PART_SIZE,
+    LocalResultStorage,
+    ResultSink,
+    S3MultipartWriter,
+)
+from apps.core.models import TaskResult, TASK_RESULT_STATUS
+
+
+def make_rows(position, asset_name, values):
+    return [
+        TaskResult(
+            field_name=field,
+            asset_name=asset_name,
+            source=f"https://example.com/{asset_name}",
+            position=position,
+            value=value,
+            status=TASK_RESULT_STATUS.SUCCESS if value is not None else TASK_RESULT_STATUS.ERROR,
+            error=None if value is not None else "Invalid JSON response",
+        )
+        for field, value in values.items()
+    ]
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.parts = []
+        self.completed = None
+        self.aborted = False
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        self.parts.append((PartNumber, len(Body)))
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.completed = MultipartUpload["Parts"]
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+
+class ResultSinkTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = LocalResultStorage(self.tmp.name)
+        self.task = SimpleNamespace(id="task-1")
+
+    def read(self, key):
+        with open(os.path.join(self.tmp.name, key)) as f:
+            return f.read()
+
+    def test_rows_are_written_as_assets_finish(self):
+        sink = ResultSink(self.task, ["total", "date"], storage=self.storage)
+        sink.write_rows(make_rows(1, "b.pdf", {"total": 20, "date": None}))
+        sink.write_rows(make_rows(0, "a.pdf", {"total": 10, "date": "2024-01-01"}))
+        sink.write_generations({"summary": "Two invoices"})
+        manifest = sink.close()
+
+        rows = list(csv.reader(self.read(sink.csv_key).splitlines()))
+        self.assertEqual(rows, [
+            ["asset", "source", "total", "date"],
+            ["b.pdf", "https://example.com/b.pdf", "20", ""],
+            ["a.pdf", "https://example.com/a.pdf", "10", "2024-01-01"],
+        ])
+        records = [json.loads(line) for line in self.read(sink.ndjson_key).splitlines()]
+        self.assertEqual(records[0]["data"]["date"], {"error": "Invalid JSON response"})
+        self.assertEqual(records[2], {"type": "generation", "field": "summary", "content": "Two invoices"})
+        self.assertEqual(manifest["rows"], 2)
+        self.assertEqual(json.loads(self.read(sink.manifest_key)), manifest)
+
+    def test_abort_leaves_no_files(self):
+        sink = ResultSink(self.task, ["total"], storage=self.storage)
+        sink.write_rows(make_rows(0, "a.pdf", {"total": 1}))
+        sink.abort()
+        self.assertIsNone(sink.close())
+        self.assertEqual([files for _, _, files in os.walk(self.tmp.name) if files], [])
+
+
+class S3MultipartWriterTestCase(SimpleTestCase):
+    def test_parts_are_uploaded_at_part_size(self):
+        client = FakeS3Client()
+        writer = S3MultipartWriter(client, "bucket", "key.csv", "text/csv", part_size=MIN_PART_SIZE)
+        chunk = b"x" * (1024 * 1024)
+        for _ in range(12):
+            writer.write(chunk)
+        writer.close()
+        self.assertEqual([size for _, size in client.parts], [5 * len(chunk), 5 * len(chunk), 2 * len(chunk)])
+        self.assertEqual([part["PartNumber"] for part in client.completed], [1, 2, 3])
+
+    def test_empty_file_uploads_one_part(self):
+        client = FakeS3Client()
+        S3MultipartWriter(client, "bucket", "key.csv", "text/csv", part_size=MIN_PART_SIZE).close()
+        self.assertEqual(client.parts, [(1, 0)])
@@ -0,0 +1,80 @@
+import datetime
+import io
+import tempfile
+
+from django.test import TestCase
+
+from apps.agent_management.services.result_sink import LocalResultStorage
+from apps.agent_management.services.result_table import (
+    build_results_table,
+    load_results_table,
+    parquet_key,
+    table_to_csv,
+    table_to_excel,
+)
+from apps.core.models import Action, Asset, Project, Task
+from apps.core.models.action import OUTPUT_COLUMN_TYPE
+
+
+class ResultTableTestCase(TestCase):
+    def setUp(self):
+        project = Project.objects.create(name="Invoices", description="")
+        self.task = Task.objects.create(name="Extract", project=project, system_prompt="")
+        self.assets = [
+            Asset.objects.create(name=f"doc{i}.pdf", description="", project=project, url=f"https://example.com/doc{i}.pdf")
+            for i in range(2)
+        ]
+        self.total = Action.objects.create(
+            output_column_name="total", description="", output_column_type=OUTPUT_COLUMN_TYPE.NUMBER
+        )
+        self.due = Action.objects.create(
+            output_column_name="due", description="", output_column_type=OUTPUT_COLUMN_TYPE.DATE
+        )
+        self.vendor = Action.objects.create(output_column_name="vendor", description="")
+        self.task.actions.set([self.total, self.due, self.vendor])
+
+    def record(self, index, total, due, vendor):
+        self.task.record_asset_results(self.assets[index], index, [
+            (self.total, {"total": total, "total_confidence": 0.9}),
+            (self.due, {"due": due}),
+            (self.vendor, {"vendor": vendor} if vendor else {"error": "Invalid JSON response"}),
+        ])
+
+    def test_columns_are_typed_by_output_column_type(self):
+        self.record(1, "1,200.50", "2024-03-01", None)
+        self.record(0, 99, "2024-02-01", "Acme")
+
+        table = build_results_table(self.task)
+        self.assertEqual(table.column("ASSET").to_pylist(), ["doc0.pdf", "doc1.pdf"])
+        self.assertEqual(table.column("ASSET_ID").to_pylist(), [str(asset.id) for asset in self.assets])
+        self.assertEqual(str(table.schema.field("TOTAL").type), "double")
+        self.assertEqual(table.column("TOTAL").to_pylist(), [99.0, 1200.5])
+        self.assertEqual(table.column("DUE").to_pylist(), [datetime.date(2024, 2, 1), datetime.date(2024, 3, 1)])
+        self.assertEqual(table.column("VENDOR").to_pylist(), ["Acme", None])
+        self.assertEqual(table.column("VENDOR_ERROR").to_pylist(), [None, "Invalid JSON response"])
+        self.assertEqual(table.column("TOTAL_CONFIDENCE").to_pylist(), [0.9, 0.9])
+
+    def test_unparseable_values_keep_the_column_as_text(self):
+        self.record(0, "about twelve", "next Tuesday", "Acme")
+        table = build_results_table(self.task)
+        self.assertEqual(table.column("TOTAL").to_pylist(), ["about twelve"])
+        self.assertEqual(table.column("DUE").to_pylist(), ["next Tuesday"])
+
+    def test_table_is_stored_once_and_read_back(self):
+        self.record(0, 5, "2024-01-01", "Acme")
+        self.task.results_prefix = f"task_results/{self.task.id}/results_1"
+        with tempfile.TemporaryDirectory() as root:
+            storage = LocalResultStorage(root)
+            load_results_table(self.task, storage)
+            self.assertIsNotNone(storage.read(parquet_key(self.task)))
+
+            # Later reads come from the file, not the rows
+            self.task.clear_results()
+            table = load_results_table(self.task, storage)
+            self.assertEqual(table.column("TOTAL").to_pylist(), [5.0])
+
+    def test_export_formats(self):
+        self.record(0, 5, "2024-01-01", "Acme")
+        table = build_results_table(self.task)
+        self.assertTrue(table_to_csv(table).decode().startswith('"TASK_ID","ASSET_ID","ASSET","SOURCE","TOTAL"'))
+        self.assertEqual(table_to_excel(table)[:2], b"PK")
@@ -0,0 +1,128 @@
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.agent_management.models import Transcript
+from apps.agent_management.services.ai_service import transcription
+from apps.agent_management.services.ai_service.transcription import (
+    LEVEL_WINDOW,
+    LocalTranscriber,
+    TranscriptionError,
+    plan_chunks,
+    segment_words,
+    stitch,
+)
+
+MODULE = "apps.agent_management.services.ai_service.transcription"
+LOUD, QUIET = -10.0, -60.0
+
+
+def levels_of(seconds, silences=()):
+    """Loudness windows for `seconds` of speech, quiet during the (start, end) spans in `silences`"""
+    levels = [LOUD] * int(seconds / LEVEL_WINDOW)
+    for start, end in silences:
+        for index in range(int(start / LEVEL_WINDOW), int(end / LEVEL_WINDOW)):
+            levels[index] = QUIET
+    return levels
+
+
+class PlanChunksTestCase(SimpleTestCase):
+    def plan(self, levels):
+        return plan_chunks(levels, chunk_seconds=60, search_seconds=10, silence_db=-40, min_silence=0.3)
+
+    def test_short_audio_is_one_chunk(self):
+        self.assertEqual(self.plan(levels_of(45)), [(0.0, 45.0)])
+
+    def test_cuts_in_the_longest_silence_before_the_limit(self):
+        chunks = self.plan(levels_of(150, silences=[(52, 53), (55, 57), (110, 111)]))
+        self.assertEqual([round(start, 2) for start, _ in chunks], [0.0, 56.0, 110.5])
+        self.assertEqual(chunks[-1][1], 150.0)
+        self.assertTrue(all(end - start <= 60 for start, end in chunks))
+
+    def test_without_silence_cuts_at_the_quietest_moment(self):
+        levels = levels_of(90)
+        levels[int(57 / LEVEL_WINDOW)] = -30.0
+        self.assertEqual([round(start, 2) for start, _ in self.plan(levels)], [0.0, 57.0])
+
+
+class StitchTestCase(SimpleTestCase):
+    def test_word_times_are_offset_by_their_chunk(self):
+        first = {"text": "Hello there.", "words": [
+            {"word": "Hello", "start": 0.5, "end": 0.9}, {"word": "there.", "start": 1.0, "end": 1.4},
+        ]}
+        second = {"text": "Bye.", "words": [{"word": "Bye.", "start": 0.2, "end": 0.6}]}
+        text, words = stitch([(0.0, first), (300.0, {"text": "", "words": []}), (600.0, second)])
+        self.assertEqual(text, "Hello there. Bye.")
+        self.assertEqual([(w["start"], w["end"]) for w in words], [(0.5, 0.9), (1.0, 1.4), (600.2, 600.6)])
+
+    def test_segments_close_at_sentence_ends(self):
+        words = [{"word": w, "start": float(i * 10), "end": i * 10 + 1.0} for i, w in enumerate(
+            ["One", "two", "three.", "Four", "five", "six", "seven"]
+        )]
+        segments = segment_words(words, seconds=30)
+        self.assertEqual([s["text"] for s in segments], ["One two three.", "Four five six", "seven"])
+        self.assertEqual((segments[1]["start"], segments[1]["end"]), (30.0, 51.0))
+
+
+@override_settings(
+    TRANSCRIPTION_CHUNK_SECONDS=60,
+    TRANSCRIPTION_SILENCE_SEARCH_SECONDS=10,
+    TRANSCRIPTION_CONCURRENCY=2,
+    TRANSCRIPTION_MAX_ATTEMPTS=2,
+    TRANSCRIPT_SEGMENT_SECONDS=30,
+)
+class TranscribeAudioTestCase(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        cache_settings = override_settings(ASSET_CACHE_DIR=cache_dir.name)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
+        audio = tempfile.NamedTemporaryFile(suffix=".mp3")
+        audio.write(b"not really audio")
+        audio.flush()
+        self.addCleanup(audio.close)
+        self.path = audio.name
+
+        # ffmpeg is replaced by 130 seconds of speech with one pause, and empty chunk files
+        for name, replacement in (
+            ("audio_levels", lambda path: levels_of(130, silences=[(55, 56)])),
+            ("extract_chunk", lambda path, start, end, chunk_path: open(chunk_path, "wb").close()),
+            ("time.sleep", lambda seconds: None),
+        ):
+            patcher = mock.patch(f"{MODULE}.{name}", side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.transcriber = LocalTranscriber()
+
+    def test_chunks_are_stitched_and_stored(self):
+        transcript = transcription.transcribe_audio(self.path, self.transcriber)
+        self.assertEqual(transcript.chunk_count, 3)
+        self.assertEqual(transcript.duration, 130.0)
+        starts = [word["start"] for word in transcript.words]
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(starts[55], 55.5)
+        self.assertLessEqual(transcript.words[-1]["end"], 130.0)
+        self.assertTrue(all(s["end"] - s["start"] <= 30 for s in transcript.segments))
+
+    def test_file_without_audio_gets_an_empty_transcript(self):
+        with mock.patch(f"{MODULE}.audio_levels", return_value=[]):
+            transcript = transcription.transcribe_audio(self.path, self.transcriber)
+        self.assertEqual((transcript.text, transcript.words, transcript.chunk_count), ("", [], 0))
+
+    def test_same_content_is_transcribed_once(self):
+        first = transcription.transcribe_audio(self.path, self.transcriber)
+        with mock.patch.object(LocalTranscriber, "transcribe") as transcribe:
+            second = transcription.transcribe_audio(self.path, self.transcriber)
+        transcribe.assert_not_called()
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Transcript.objects.count(), 1)
+
+    def test_failing_chunk_raises_instead_of_storing_an_empty_transcript(self):
+        with mock.patch.object(LocalTranscriber, "transcribe", side_effect=ConnectionError("reset")) as transcribe:
+            with self.assertRaises(TranscriptionError):
+                transcription.transcribe_audio(self.path, self.transcriber)
+        self.assertGreaterEqual(transcribe.call_count, 2)
+        self.assertFalse(Transcript.objects.exists())
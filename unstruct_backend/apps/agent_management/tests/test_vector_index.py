@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from apps.agent_management.models import VectorIndex
+from apps.agent_management.services.ai_service import vector_store
+from apps.agent_management.services.ai_service.vector_store import VectorIndexError, VectorStore
+
+MODULE = "apps.agent_management.services.ai_service.vector_store"
+
+
+class FakeTables:
+    """Stands in for LanceDB: tracks which tables exist"""
+
+    def __init__(self):
+        self.tables = set()
+        self.dropped = []
+
+    def open(self, store, uri, table_name):
+        return table_name
+
+    def exists(self, uri, table_name):
+        return table_name in self.tables
+
+    def drop(self, uri, table_name):
+        self.tables.discard(table_name)
+        self.dropped.append(table_name)
+
+
+class VectorIndexManifestTestCase(TestCase):
+    def setUp(self):
+        self.fake = FakeTables()
+        for name, replacement in (
+            ("VectorStore._open", self.fake.open),
+            ("_table_exists", self.fake.exists),
+            ("_drop_table", self.fake.drop),
+        ):
+            patcher = mock.patch(f"{MODULE}.{name}", side_effect=replacement, autospec=name.startswith("VectorStore"))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.builds = []
+
+    def build(self, count=3):
+        def _build(store):
+            self.builds.append(store)
+            self.fake.tables.add(store)
+            return count
+        return _build
+
+    def test_matching_index_is_reused_across_assets(self):
+        first = VectorStore("asset-1")._ensure_index("TEXT", "hash", {"chunk_size": 1000}, self.build())
+        second = VectorStore("asset-2")._ensure_index("TEXT", "hash", {"chunk_size": 1000}, self.build())
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(VectorIndex.objects.get().table_name, first)
+
+    def test_changed_parameters_rebuild(self):
+        VectorStore("asset")._ensure_index("TEXT", "hash", {"chunk_size": 1000}, self.build())
+        VectorStore("asset")._ensure_index("TEXT", "hash", {"chunk_size": 500}, self.build())
+
+        self.assertEqual(len(self.builds), 2)
+        self.assertEqual(VectorIndex.objects.count(), 2)
+
+    def test_failed_build_is_not_recorded(self):
+        def failing_build(store):
+            self.fake.tables.add(store)
+            raise RuntimeError("embedding crashed")
+
+        with self.assertRaises(RuntimeError):
+            VectorStore("asset")._ensure_index("IMAGE", "hash", {}, failing_build)
+
+        self.assertFalse(VectorIndex.objects.exists())
+        self.assertEqual(self.fake.tables, set())
+
+        VectorStore("asset")._ensure_index("IMAGE", "hash", {}, self.build())
+        self.assertEqual(len(self.builds), 1)
+
+    def test_missing_table_is_rebuilt_and_swapped(self):
+        first = VectorStore("asset")._ensure_index("IMAGE", "hash", {}, self.build())
+        self.fake.tables.discard(first)
+
+        second = VectorStore("asset")._ensure_index("IMAGE", "hash", {}, self.build())
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(VectorIndex.objects.get().table_name, second)
+
+    def test_empty_content_is_recorded_without_a_table(self):
+        store = VectorStore("asset")._ensure_index("IMAGE", "hash", {}, self.build(count=0))
+        again = VectorStore("asset")._ensure_index("IMAGE", "hash", {}, self.build(count=0))
+
+        self.assertIsNone(store)
+        self.assertIsNone(again)
+        self.assertEqual(len(self.builds), 1)
+
+    def test_fingerprint_is_order_independent(self):
+        self.assertEqual(
+            vector_store.index_fingerprint("hash", "model", {"a": 1, "b": 2}),
+            vector_store.index_fingerprint("hash", "model", {"b": 2, "a": 1}),
+        )
+
+    def test_local_tables_are_scoped_to_their_host(self):
+        with mock.patch(f"{MODULE}.socket.gethostname", return_value="worker-a"):
+            first = VectorStore("asset")._ensure_index("TEXT", "hash", {}, self.build())
+        # Another host does not see worker-a's local table, builds its own and leaves worker-a's alone
+        self.fake.tables.discard(first)
+        with mock.patch(f"{MODULE}.socket.gethostname", return_value="worker-b"):
+            second = VectorStore("asset")._ensure_index("TEXT", "hash", {}, self.build())
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(VectorIndex.objects.count(), 2)
+        self.assertEqual(self.fake.dropped, [])
+
+    @override_settings(VECTOR_STORE_URI="s3://vectors")
+    def test_shared_tables_are_reused_by_every_host(self):
+        with mock.patch(f"{MODULE}.socket.gethostname", return_value="worker-a"):
+            first = VectorStore("asset")._ensure_index("TEXT", "hash", {}, self.build())
+        with mock.patch(f"{MODULE}.socket.gethostname", return_value="worker-b"):
+            second = VectorStore("asset")._ensure_index("TEXT", "hash", {}, self.build())
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.builds), 1)
+
+    def test_failed_kind_is_reported_after_the_others_are_built(self):
+        def failing_build(store):
+            raise RuntimeError("transcriber down")
+
+        store = VectorStore("asset")
+        with self.assertRaises(VectorIndexError):
+            store._index_kinds("hash", [("IMAGE", {}, self.build()), ("TEXT", {}, failing_build)])
+
+        self.assertIsNotNone(store.image_vectorstore)
+        self.assertEqual(store.errors, {"TEXT": "transcriber down"})
@@ -2,8 +2,8 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from apps.core.models import Task
-from apps.agent_management.services.task_processor import TaskProcessor
+from apps.core.models import Task, JOB_STATUS
+from apps.core.services.job_queue import ActiveJobExists, get_job_broker
 
 class TaskProcessingViewSet(viewsets.ViewSet):
     name = "tasks"
@@ -15,9 +15,13 @@ class TaskProcessingViewSet(viewsets.ViewSet):
         except Task.DoesNotExist:
             return Response({"error": "Task not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        processor = TaskProcessor()
         try:
-            structured_output = processor.process(task)
-            return Response(structured_output, status=status.HTTP_200_OK)
+            job = task.jobs.filter(status__in=[JOB_STATUS.QUEUED, JOB_STATUS.RUNNING]).first()
+            if not job:
+                try:
+                    job = get_job_broker().enqueue("process_task", task=task, organization=task.organization)
+                except ActiveJobExists as e:
+                    job = e.job
+            return Response({"job_id": str(job.id), "status": job.status}, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
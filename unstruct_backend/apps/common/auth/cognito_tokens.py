@@ -0,0 +1,140 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Optional
+
+from django.conf import settings
+from pycognito.exceptions import TokenVerificationException
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_jwks(url: str) -> dict:
+    import requests
+
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class JWKSCache:
+    """A user pool's signing keys, fetched once and kept for `ttl` seconds.
+
+    A token signed with a key id we do not have triggers an early refetch, so rotated
+    keys are picked up without waiting for the TTL. Refetches for unknown key ids are
+    limited to one per `refresh_interval` seconds, so garbage tokens cannot hammer AWS.
+    """
+
+    def __init__(self, url: str, ttl: float, refresh_interval: float, fetch: Callable[[str], dict] = fetch_jwks):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.fetch = fetch
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        from jwt.algorithms import RSAAlgorithm
+
+        jwks = self.fetch(self.url)
+        self._keys = {jwk["kid"]: RSAAlgorithm.from_jwk(json.dumps(jwk)) for jwk in jwks.get("keys", [])}
+        self._fetched_at = time.monotonic()
+        logger.info(f"Fetched {len(self._keys)} signing keys from {self.url}")
+
+    def get(self, kid: str):
+        with self._lock:
+            age = None if self._fetched_at is None else time.monotonic() - self._fetched_at
+            if age is None or age >= self.ttl or (kid not in self._keys and age >= self.refresh_interval):
+                self._refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise TokenVerificationException(f"Unknown signing key: {kid}")
+        return key
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified tokens (by digest) to the user they authenticated, kept until the token expires"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id
+
+    def set(self, token: str, user_id: str, expires_at: float):
+        if self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+
+class CognitoTokenVerifier:
+    """Verifies Cognito ID tokens locally against the pool's cached signing keys"""
+
+    def __init__(self, user_pool_id: str, client_id: str, region: str, jwks: JWKSCache = None):
+        self.client_id = client_id
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+        self.jwks = jwks or JWKSCache(
+            f"{self.issuer}/.well-known/jwks.json",
+            ttl=settings.COGNITO_JWKS_TTL,
+            refresh_interval=settings.COGNITO_JWKS_REFRESH_INTERVAL,
+        )
+
+    def verify(self, token: str, token_use: str = "id") -> dict:
+        import jwt
+
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            claims = jwt.decode(
+                token,
+                self.jwks.get(kid),
+                algorithms=["RS256"],
+                audience=self.client_id,
+                issuer=self.issuer,
+                options={"require": ["aud", "iss", "exp"]},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationException(f"Your {token_use} token could not be verified ({e}).") from e
+        if claims.get("token_use") != token_use:
+            raise TokenVerificationException(f"Your {token_use} token use ({claims.get('token_use')}) could not be verified.")
+        return claims
+
+
+@lru_cache(maxsize=None)
+def get_token_verifier(user_pool_id: str, client_id: str, region: str) -> CognitoTokenVerifier:
+    """The process-wide verifier for a user pool, so its signing keys are fetched once per process"""
+    return CognitoTokenVerifier(user_pool_id, client_id, region)
+
+
+@lru_cache(maxsize=None)
+def get_verified_token_cache() -> VerifiedTokenCache:
+    return VerifiedTokenCache(settings.COGNITO_TOKEN_CACHE_SIZE)
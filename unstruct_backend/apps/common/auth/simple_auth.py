@@ -2,8 +2,8 @@ from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from apps.core.models.user import User
 from django.conf import settings
-from pycognito import Cognito
 from pycognito.exceptions import TokenVerificationException
+from apps.common.auth.cognito_tokens import get_token_verifier, get_verified_token_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,21 +45,18 @@ class SimpleAuthentication(BaseAuthentication):
                 logger.debug(f"Unsupported token type: {token_type}")
                 return None
 
-            # Initialize Cognito object
-            cognito = Cognito(
-                user_pool_id=settings.USER_POOL_ID,
-                client_id=settings.USER_POOL_CLIENT_ID,
-                user_pool_region=settings.AWS_REGION
-            )
-            
-            logger.debug(f"Cognito initialized with pool_id={settings.USER_POOL_ID}, client_id={settings.USER_POOL_CLIENT_ID}, region={settings.AWS_REGION}")
-            
-            # Verify the token
-            claims = cognito.verify_token(
-                token=token,
-                token_use="id",  # Using ID token
-                id_name="id_token"  # This should be id_token for ID tokens
-            )
+            # A token verified earlier maps straight to its user until it expires
+            token_cache = get_verified_token_cache()
+            cached_user_id = token_cache.get(token)
+            if cached_user_id:
+                user = User.objects.filter(id=cached_user_id).first()
+                if user:
+                    return (user, None)
+                token_cache.discard(token)
+
+            # Verify the token locally against the user pool's cached signing keys
+            verifier = get_token_verifier(settings.USER_POOL_ID, settings.USER_POOL_CLIENT_ID, settings.AWS_REGION)
+            claims = verifier.verify(token, token_use="id")  # Using ID token
             
             logger.debug(f"Token verified successfully. Claims: {claims}")
             
@@ -104,8 +101,11 @@ class SimpleAuthentication(BaseAuthentication):
                         username=email,
                         is_active=True
                     )
+                    # Loaded back so the id is a UUID, as on requests answered from the token cache
+                    user = User.objects.get(id=user.id)
             
             logger.debug(f"User authenticated with ID: {user.id} and email: {user.email}")
+            token_cache.set(token, str(user.id), claims['exp'])
             
             return (user, None)
 
@@ -0,0 +1,258 @@
+import fcntl
+import hashlib
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from apps.common.utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Partial downloads not resumed within this many seconds are discarded
+PARTIAL_MAX_AGE = 24 * 60 * 60
+
+
+def hash_file(path: str) -> str:
+    """sha256 of a file, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssetCache:
+    """Local, content-addressed cache for asset files, shared by every worker on the host.
+
+    Layout under the cache root:
+        blobs/<sha[:2]>/<sha><ext>  file contents, stored once per distinct sha256
+        refs/<key digest>           "<sha><ext>" of the blob a (source key, source version) resolves to
+        refs/<key digest>.lock      lock taken while the entry is filled
+        tmp/                        in-progress and failed partial downloads, renamed into place once complete
+
+    Files are always downloaded to tmp/ and moved into blobs/ with an atomic rename, so a
+    reader never sees a half-written file. Identical content fetched for different assets,
+    projects or sources resolves to the same blob. When the cache grows past its size cap
+    the least recently used blobs are evicted, along with the refs and locks pointing at them.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None, min_age: int = None):
+        self.root = root or settings.ASSET_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.ASSET_CACHE_MAX_BYTES
+        # Blobs used more recently than this are never evicted, so a path handed out a moment ago stays valid
+        self.min_age = min_age if min_age is not None else settings.ASSET_CACHE_MIN_AGE
+        self.blob_dir = os.path.join(self.root, "blobs")
+        self.ref_dir = os.path.join(self.root, "refs")
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        for directory in (self.blob_dir, self.ref_dir, self.tmp_dir):
+            os.makedirs(directory, exist_ok=True)
+        self._thread_lock = KeyedLock()
+
+    def _ref_path(self, source_key: str, version: str) -> str:
+        digest = hashlib.sha256(f"{source_key}\n{version}".encode("utf-8")).hexdigest()
+        return os.path.join(self.ref_dir, digest)
+
+    def _blob_path(self, content_hash: str, extension: str) -> str:
+        return os.path.join(self.blob_dir, content_hash[:2], f"{content_hash}{extension}")
+
+    @contextmanager
+    def _lock(self, ref_path: str):
+        """Serialize fills of the same entry across threads and processes"""
+        lock_path = f"{ref_path}.lock"
+        with self._thread_lock(ref_path):
+            while True:
+                lock_file = open(lock_path, "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Eviction may have unlinked the lock file while we waited; then lock the new one
+                try:
+                    if os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino:
+                        break
+                except FileNotFoundError:
+                    pass
+                lock_file.close()
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _write_atomic(self, path: str, content: str):
+        tmp_path = os.path.join(self.tmp_dir, uuid.uuid4().hex)
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, source_key: str, version: str) -> Optional[str]:
+        """Return the cached path for a source version, or None on a miss"""
+        ref_path = self._ref_path(source_key, version)
+        try:
+            with open(ref_path) as f:
+                blob_name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        blob_path = os.path.join(self.blob_dir, blob_name[:2], blob_name)
+        if not os.path.exists(blob_path):
+            return None
+        self._touch(blob_path)
+        return blob_path
+
+    def get_or_fetch(self, source_key: str, version: str, filename: str, fetch: Callable[[str], None]) -> str:
+        """Return the local path for a source file, calling `fetch(path)` to download it on a miss.
+
+        If an earlier fetch of the same entry failed, its partial file is still at `path`;
+        fetchers that support ranged reads should continue after the bytes already there.
+
+        `source_key` identifies the file in its source system (e.g. "s3://bucket/key") and
+        `version` identifies its current content there (ETag, Drive md5Checksum, Dropbox
+        content_hash). A new version is a cache miss even if the key is unchanged.
+        """
+        version = version or ""
+        cached = self.get(source_key, version)
+        if cached:
+            return cached
+
+        ref_path = self._ref_path(source_key, version)
+        with self._lock(ref_path):
+            # Another worker may have filled the entry while we waited for the lock
+            cached = self.get(source_key, version)
+            if cached:
+                return cached
+
+            extension = os.path.splitext(filename)[1].lower()
+            # Named after the entry so a failed download is resumed by the next fill
+            tmp_path = os.path.join(self.tmp_dir, f"{os.path.basename(ref_path)}.part{extension}")
+            fetch(tmp_path)
+            blob_path = self._store(tmp_path, extension)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._write_atomic(ref_path, os.path.basename(blob_path))
+            logger.info(f"Cached {source_key} at {blob_path}")
+
+        self.evict()
+        return blob_path
+
+    def _store(self, tmp_path: str, extension: str) -> str:
+        content_hash = hash_file(tmp_path)
+        blob_path = self._blob_path(content_hash, extension)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if os.path.exists(blob_path):
+            # Same content already cached for another asset or source
+            self._touch(blob_path)
+        else:
+            os.replace(tmp_path, blob_path)
+        return blob_path
+
+    def content_hash(self, path: str) -> str:
+        """sha256 of a file; free for paths handed out by the cache"""
+        if os.path.dirname(os.path.dirname(path)) == self.blob_dir:
+            return os.path.splitext(os.path.basename(path))[0]
+        return hash_file(path)
+
+    def evict(self):
+        """Remove least recently used blobs, with their refs and locks, until the cache is back under its size cap"""
+        removed = self._remove_stale_partials()
+        removed += self._evict_blobs()
+        if removed:
+            self._remove_dangling_refs()
+
+    def _evict_blobs(self) -> int:
+        if not self.max_bytes:
+            return 0
+        blobs = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.blob_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        cutoff = time.time() - self.min_age
+        for mtime, size, path in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            if mtime > cutoff:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+                logger.info(f"Evicted {path} from asset cache")
+            except FileNotFoundError:
+                continue
+        return evicted
+
+    def _remove_dangling_refs(self):
+        """Remove refs to blobs that are gone, and lock files of entries without a ref"""
+        names = set(os.listdir(self.ref_dir))
+        for name in names:
+            if name.endswith(".lock"):
+                if name[:-len(".lock")] not in names:
+                    self._remove_entry(os.path.join(self.ref_dir, name[:-len(".lock")]))
+            elif not self._ref_target_exists(os.path.join(self.ref_dir, name)):
+                self._remove_entry(os.path.join(self.ref_dir, name))
+
+    def _ref_target_exists(self, ref_path: str) -> bool:
+        try:
+            with open(ref_path) as f:
+                blob_name = f.read().strip()
+        except FileNotFoundError:
+            return False
+        return bool(blob_name) and os.path.exists(os.path.join(self.blob_dir, blob_name[:2], blob_name))
+
+    def _remove_entry(self, ref_path: str):
+        """Remove a dangling ref and its lock file, unless the entry is being filled right now"""
+        lock_path = f"{ref_path}.lock"
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                # Checked again under the lock: a fill may have completed meanwhile
+                if not self._ref_target_exists(ref_path):
+                    for path in (ref_path, lock_path):
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remove_stale_partials(self) -> int:
+        removed = 0
+        cutoff = time.time() - PARTIAL_MAX_AGE
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+@lru_cache(maxsize=None)
+def get_asset_cache() -> AssetCache:
+    """Process-wide asset cache rooted at ASSET_CACHE_DIR"""
+    return AssetCache()
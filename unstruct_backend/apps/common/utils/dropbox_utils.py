@@ -2,7 +2,13 @@ from dropbox import Dropbox
 from dropbox.exceptions import ApiError, AuthError
 from dropbox.files import FileMetadata, FolderMetadata
 import os
-from typing import Dict, Generator, Optional
+import time
+import requests
+from typing import Callable, Dict, Generator, Optional
+
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = 60  # seconds without data before a chunk read is retried
 
 class DropboxService:
     """Service class to handle Dropbox operations"""
@@ -51,24 +57,10 @@ class DropboxService:
             download_path: Optional path to download the file
         """
         try:
-            metadata = self.client.files_get_metadata(file_path)
-            
-            if isinstance(metadata, FolderMetadata):
-                raise Exception("Cannot download a folder directly. Use list_folder_contents instead.")
-            
-            file_info = {
-                'id': metadata.path_display,
-                'name': metadata.name,
-                'size': metadata.size,
-                'mime_type': self._get_mime_type(metadata.name),
-                'last_modified': metadata.client_modified
-            }
+            file_info = self.get_file_metadata(file_path)
             
             if download_path:
-                os.makedirs(os.path.dirname(download_path), exist_ok=True)
-                with open(download_path, 'wb') as f:
-                    metadata, response = self.client.files_download(file_path)
-                    f.write(response.content)
+                self.download_file(file_path, download_path)
                 file_info['local_path'] = download_path
                 
             return file_info
@@ -80,6 +72,56 @@ class DropboxService:
         except Exception as e:
             raise Exception(f"Error getting file: {str(e)}")
     
+    def get_file_metadata(self, file_path: str) -> Dict:
+        """Get metadata for a file, including its content_hash"""
+        metadata = self.client.files_get_metadata(file_path)
+        
+        if isinstance(metadata, FolderMetadata):
+            raise Exception("Cannot download a folder directly. Use list_folder_contents instead.")
+        
+        return {
+            'id': metadata.path_display,
+            'name': metadata.name,
+            'size': metadata.size,
+            'mime_type': self._get_mime_type(metadata.name),
+            'last_modified': metadata.client_modified,
+            'content_hash': metadata.content_hash,
+            'rev': metadata.rev
+        }
+    
+    def download_file(self, file_path: str, local_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                      progress: Optional[Callable[[int], None]] = None, retries: int = DOWNLOAD_RETRIES) -> str:
+        """
+        Stream a file from Dropbox to disk in fixed-size chunks.
+        Bytes already present at local_path are kept and the download continues after them.
+        """
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        # A temporary link accepts Range requests, which files_download does not expose
+        link = self.client.files_get_temporary_link(file_path).link
+        attempt = 0
+        while True:
+            offset = os.path.getsize(local_path) if os.path.exists(local_path) else 0
+            headers = {'Range': f'bytes={offset}-'} if offset else {}
+            try:
+                with requests.get(link, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                    if response.status_code == 416 and offset:
+                        # Nothing left to fetch: the partial file is already complete
+                        return local_path
+                    response.raise_for_status()
+                    # Start over if the server ignored the range and sent the whole file
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+                    with open(local_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                            if progress:
+                                progress(len(chunk))
+                return local_path
+            except Exception as e:
+                attempt += 1
+                if attempt > retries:
+                    raise Exception(f"Error downloading file: {str(e)}")
+                time.sleep(min(2 ** attempt, 30))
+    
     def list_folder_contents(self, folder_path: str = "", recursive: bool = True) -> Generator[Dict, None, None]:
         """
         List contents of a Dropbox folder
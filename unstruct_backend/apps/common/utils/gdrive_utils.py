@@ -1,9 +1,17 @@
+from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.errors import HttpError
 import os
-import io
-from typing import List, Dict, Generator, Optional, Union
+import threading
+import time
+from typing import Callable, List, Dict, Generator, Optional, Tuple, Union
+
+from apps.common.utils.tree_walk import walk_concurrently
+
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_RETRIES = 3
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
 
 class GoogleDriveService:
     """Service class to handle Google Drive operations using either service account or OAuth tokens"""
@@ -13,6 +21,7 @@ class GoogleDriveService:
     def __init__(self, credentials_info: Union[dict, str] = None, oauth_tokens: Optional[dict] = None):
         self.credentials = None
         self.service = None
+        self._local = threading.local()
         self.credentials_info = credentials_info
         self.oauth_tokens = oauth_tokens
         
@@ -44,26 +53,56 @@ class GoogleDriveService:
     def get_file_metadata(self, file_id: str) -> Dict:
         """Get metadata for a file"""
         try:
-            return self.service.files().get(fileId=file_id, fields="id, name, mimeType, parents").execute()
+            return self.service.files().get(fileId=file_id, fields="id, name, mimeType, parents, md5Checksum, modifiedTime, size").execute()
         except Exception as e:
             raise Exception(f"Error getting file metadata: {str(e)}")
+
+    def get_file_version(self, file_id: str) -> str:
+        """Identifier of the file's current content: md5Checksum, or modifiedTime for native Google files"""
+        metadata = self.get_file_metadata(file_id)
+        return metadata.get('md5Checksum') or metadata.get('modifiedTime', '')
     
-    def download_file(self, file_id: str, local_path: str) -> str:
-        """Download a file from Google Drive"""
-        try:
-            request = self.service.files().get_media(fileId=file_id)
-            file = io.BytesIO()
-            downloader = MediaIoBaseDownload(file, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-            
-            file.seek(0)
-            with open(local_path, 'wb') as f:
-                f.write(file.read())
-            return local_path
-        except Exception as e:
-            raise Exception(f"Error downloading file: {str(e)}")
+    def download_file(self, file_id: str, local_path: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                      progress: Optional[Callable[[int], None]] = None, retries: int = DOWNLOAD_RETRIES) -> str:
+        """
+        Stream a file from Google Drive to disk in ranged requests of chunk_size bytes.
+        Bytes already present at local_path are kept and the download continues after them.
+        Native Google Docs, Sheets and Slides have no size or binary content and are refused.
+        """
+        metadata = self.get_file_metadata(file_id)
+        if metadata.get('size') is None:
+            raise Exception(
+                f"Cannot download {metadata.get('name', file_id)} ({metadata.get('mimeType')}): "
+                "Drive reports no size, as for native Google files, which must be exported instead"
+            )
+        size = int(metadata['size'])
+        attempt = 0
+        while True:
+            offset = os.path.getsize(local_path) if os.path.exists(local_path) else 0
+            try:
+                with open(local_path, 'ab') as f:
+                    while offset < size:
+                        request = self.service.files().get_media(fileId=file_id)
+                        request.headers['Range'] = f'bytes={offset}-{min(offset + chunk_size, size) - 1}'
+                        data = request.execute(num_retries=retries)
+                        if not data:
+                            raise Exception(f"Empty response for bytes {offset}- of {size}")
+                        f.write(data)
+                        offset += len(data)
+                        if progress:
+                            progress(len(data))
+                return local_path
+            except HttpError as e:
+                if e.resp.status == 416 and offset:
+                    # Nothing left to fetch: the partial file is already complete
+                    return local_path
+                error = e
+            except Exception as e:
+                error = e
+            attempt += 1
+            if attempt > retries:
+                raise Exception(f"Error downloading file: {str(error)}")
+            time.sleep(min(2 ** attempt, 30))
     
     def get_file_by_id(self, file_id: str, download_path: str = None) -> Dict:
         """Get file content and metadata"""
@@ -120,6 +159,50 @@ class GoogleDriveService:
         except Exception as e:
             raise Exception(f"Error listing folder contents: {str(e)}")
     
+    def _thread_service(self):
+        """A Drive client for the calling thread; clients are not safe to share between threads"""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def list_folder_level(self, folder_id: str) -> Tuple[List[Dict], List[str]]:
+        """List the files directly in a folder, and the ids of its subfolders"""
+        files = []
+        subfolders = []
+        query = f"'{folder_id}' in parents and trashed = false"
+        page_token = None
+        try:
+            while True:
+                results = self._thread_service().files().list(
+                    q=query,
+                    fields="nextPageToken, files(id, name, mimeType, parents, size)",
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+                for item in results.get('files', []):
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        subfolders.append(item['id'])
+                    else:
+                        files.append(item)
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            raise Exception(f"Error listing folder contents: {str(e)}")
+        return files, subfolders
+
+    def list_folder_tree(self, folder_id: str, recursive: bool = True,
+                         max_workers: int = 8) -> Generator[Dict, None, None]:
+        """
+        Like list_folder_contents, but lists up to max_workers folders at once and never yields folders
+        """
+        if not recursive:
+            yield from self.list_folder_level(folder_id)[0]
+            return
+        yield from walk_concurrently([folder_id], self.list_folder_level, max_workers)
+
     def get_files_by_ids(self, file_ids: List[str]) -> Generator[Dict, None, None]:
         """Get multiple files by their IDs"""
         for file_id in file_ids:
@@ -0,0 +1,45 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable
+
+
+class _KeyEntry:
+    __slots__ = ("lock", "holders")
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # Threads holding or waiting for the lock; the entry is dropped when this reaches zero
+        self.holders = 0
+
+
+class KeyedLock:
+    """Hands out one re-entrant lock per key, so work on the same object is serialized across threads.
+
+    Use as `with keyed_lock(key):`. A key's lock only exists while some thread holds or
+    waits for it, so locking many distinct keys does not grow memory.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, _KeyEntry] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key: Hashable):
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = _KeyEntry()
+            entry.holders += 1
+        try:
+            with entry.lock:
+                yield
+        finally:
+            with self._guard:
+                entry.holders -= 1
+                if not entry.holders:
+                    del self._locks[key]
+
+    def __len__(self):
+        """Number of keys currently locked or waited for"""
+        with self._guard:
+            return len(self._locks)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+
+# Credential sets with a client kept at once; temporary credentials rotate, so old entries are dropped
+MAX_CLIENTS = 32
+CREDENTIAL_FIELDS = ("aws_access_key_id", "aws_secret_access_key", "aws_session_token")
+
+_clients: "OrderedDict[tuple, object]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # A forked worker must not share the parent's connection pools, nor a lock held at fork time
+    global _lock
+    _clients.clear()
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _credentials_hash(credentials: Optional[Dict]) -> Optional[str]:
+    fields = {name: credentials[name] for name in CREDENTIAL_FIELDS if credentials and credentials.get(name)}
+    if not fields:
+        return None
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_s3_client(region_name: Optional[str] = None, credentials: Optional[Dict] = None,
+                  endpoint_url: Optional[str] = None):
+    """The process-wide S3 client for a region, credential set and endpoint.
+
+    boto3 clients are thread-safe, so one client and its connection pool of
+    S3_MAX_POOL_CONNECTIONS are shared by every thread. Without credentials the default
+    chain (environment, instance role) is used. Clients are dropped in forked children.
+    """
+    key = (region_name, _credentials_hash(credentials), endpoint_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            return client
+
+        session = boto3.session.Session(
+            region_name=region_name,
+            **{name: credentials[name] for name in CREDENTIAL_FIELDS if credentials and credentials.get(name)},
+        )
+        client = session.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+            ),
+        )
+        _clients[key] = client
+        while len(_clients) > MAX_CLIENTS:
+            _clients.popitem(last=False)
+        return client
+
+
+def get_transfer_config() -> TransferConfig:
+    """Downloads above S3_TRANSFER_THRESHOLD bytes are fetched as parallel ranged GETs"""
+    return TransferConfig(
+        multipart_threshold=settings.S3_TRANSFER_THRESHOLD,
+        multipart_chunksize=settings.S3_TRANSFER_CHUNK_SIZE,
+        max_concurrency=settings.S3_TRANSFER_CONCURRENCY,
+        use_threads=True,
+    )
@@ -1,9 +1,11 @@
-import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
 from urllib.parse import urlparse
-from typing import Dict, List, Generator, Optional
+from typing import Callable, Dict, List, Generator, Optional, Tuple
 import os
 
+from apps.common.utils.s3_clients import get_s3_client, get_transfer_config
+from apps.common.utils.tree_walk import walk_concurrently
+
 class S3Service:
     """Service class to handle AWS S3 operations"""
     
@@ -19,21 +21,9 @@ class S3Service:
     def authenticate(self):
         """Authenticate with AWS using provided credentials or environment variables"""
         try:
-            if self.credentials:
-                kwargs = {}
-                if self.credentials.get('aws_access_key_id'):
-                    kwargs['aws_access_key_id'] = self.credentials.get('aws_access_key_id')
-                if self.credentials.get('aws_secret_access_key'):
-                    kwargs['aws_secret_access_key'] = self.credentials.get('aws_secret_access_key')
-                if self.credentials.get('aws_session_token'):
-                    kwargs['aws_session_token'] = self.credentials.get('aws_session_token')
-                if self.credentials.get('region_name'):
-                    kwargs['region_name'] = self.credentials.get('region_name')
-                    
-                self.s3_client = boto3.client('s3', **kwargs)
-            else:
-                # Use default credentials from environment or IAM role
-                self.s3_client = boto3.client('s3')
+            # Clients are shared per region and credential set, with their connection pools
+            credentials = self.credentials or {}
+            self.s3_client = get_s3_client(credentials.get('region_name'), credentials)
         except Exception as e:
             raise Exception(f"Error authenticating with AWS: {str(e)}")
     
@@ -81,13 +71,56 @@ class S3Service:
         except Exception as e:
             raise Exception(f"Error listing bucket contents: {str(e)}")
     
-    def get_file_by_key(self, bucket: str, key: str, download_path: str = None) -> Dict:
+    def list_level(self, bucket: str, prefix: str = '') -> Tuple[List[Dict], List[str]]:
+        """
+        List the files directly under a prefix, and its sub-prefixes ("folders")
+        Args:
+            bucket: Name of the S3 bucket
+            prefix: Prefix ending in '/', or '' for the bucket root
+        """
+        files = []
+        prefixes = []
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+                prefixes.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+                for obj in page.get('Contents', []):
+                    key = obj['Key']
+                    # Skip "folder" marker objects, including the prefix itself
+                    if key.endswith('/') or key == prefix:
+                        continue
+                    files.append({
+                        'id': key,
+                        'name': os.path.basename(key),
+                        'size': obj['Size'],
+                        'last_modified': obj['LastModified'],
+                        'bucket': bucket
+                    })
+        except Exception as e:
+            raise Exception(f"Error listing bucket contents: {str(e)}")
+        return files, prefixes
+
+    def list_files_concurrently(self, bucket: str, prefix: str = None, recursive: bool = True,
+                                max_workers: int = 8) -> Generator[Dict, None, None]:
+        """
+        Like get_files_from_bucket, but lists sibling prefixes in parallel; files come in no particular order
+        """
+        if prefix:
+            prefix = prefix.rstrip('/') + '/'
+        if not recursive:
+            yield from self.list_level(bucket, prefix or '')[0]
+            return
+        yield from walk_concurrently([prefix or ''], lambda p: self.list_level(bucket, p), max_workers)
+
+    def get_file_by_key(self, bucket: str, key: str, download_path: str = None,
+                        progress: Optional[Callable[[int], None]] = None) -> Dict:
         """
         Get a single file from S3 by its key
         Args:
             bucket: Name of the S3 bucket
             key: Object key in the bucket
             download_path: Optional path to download the file
+            progress: Optional callback receiving the number of bytes written after each chunk
         """
         try:
             file_info = {
@@ -100,7 +133,9 @@ class S3Service:
             if download_path:
                 os.makedirs(os.path.dirname(download_path), exist_ok=True)
                 try:
-                    self.s3_client.download_file(bucket, key, download_path)
+                    self.s3_client.download_file(
+                        bucket, key, download_path, Callback=progress, Config=get_transfer_config()
+                    )
                     file_info['local_path'] = download_path
                 except ClientError as e:
                     if e.response['Error']['Code'] == '404':
@@ -115,12 +150,57 @@ class S3Service:
         except Exception as e:
             raise Exception(f"Error getting file: {str(e)}")
 
+    def head_file(self, bucket: str, key: str) -> Dict:
+        """
+        Get an object's metadata without downloading it
+        Args:
+            bucket: Name of the S3 bucket
+            key: Object key in the bucket
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise Exception(f"File not found: {key}")
+            elif e.response['Error']['Code'] == '403':
+                raise Exception(f"Access denied to file: {key}. Please check your credentials and permissions.")
+            raise Exception(f"Error getting file metadata: {str(e)}")
+        return self._object_info(bucket, key, response)
+
+    def head_first(self, bucket: str, keys: List[str]) -> Optional[Dict]:
+        """
+        Metadata of the first of `keys` that exists, with one HEAD request per key tried
+        Args:
+            bucket: Name of the S3 bucket
+            keys: Candidate object keys, most likely first
+        """
+        for key in dict.fromkeys(keys):
+            try:
+                response = self.s3_client.head_object(Bucket=bucket, Key=key)
+            except ClientError as e:
+                # Without s3:ListBucket, S3 answers 403 rather than 404 for a missing key
+                if e.response['Error']['Code'] in ('403', '404', 'NoSuchKey'):
+                    continue
+                raise Exception(f"Error getting file metadata: {str(e)}")
+            return self._object_info(bucket, key, response)
+        return None
+
+    @staticmethod
+    def _object_info(bucket: str, key: str, response: Dict) -> Dict:
+        return {
+            'id': key,
+            'bucket': bucket,
+            'etag': response['ETag'].strip('"'),
+            'size': response['ContentLength'],
+            'last_modified': response['LastModified'],
+        }
+
 def download_from_s3(s3_url, local_path):
     try:
-        s3 = boto3.client('s3')
+        s3 = get_s3_client()
         bucket_name, key = parse_s3_url(s3_url)
         os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        s3.download_file(bucket_name, key, local_path)
+        s3.download_file(bucket_name, key, local_path, Config=get_transfer_config())
     except NoCredentialsError:
         raise Exception("AWS credentials not available")
     except ClientError as e:
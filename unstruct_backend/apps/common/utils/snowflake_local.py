@@ -0,0 +1,181 @@
+import glob
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Dict, List
+
+IDENTIFIER = r'"(?:[^"]|"")+"'
+COLUMN = re.compile(rf'({IDENTIFIER})\s+([A-Z_]+(?:\(\d+(?:,\d+)?\))?)')
+KEY = re.compile(rf'target\.({IDENTIFIER}) = source\.{IDENTIFIER}')
+
+STATEMENTS = [
+    ("create_like", re.compile(rf"^CREATE TEMPORARY TABLE ({IDENTIFIER}) LIKE ({IDENTIFIER})$")),
+    ("create", re.compile(rf"^CREATE (OR REPLACE |)TABLE (IF NOT EXISTS |)({IDENTIFIER}) \((.*)\)$")),
+    ("describe", re.compile(rf"^DESC TABLE ({IDENTIFIER})$")),
+    ("add_columns", re.compile(rf"^ALTER TABLE ({IDENTIFIER}) ADD COLUMN (.*)$")),
+    ("create_stage", re.compile(rf"^CREATE TEMPORARY STAGE ({IDENTIFIER})")),
+    ("put", re.compile(rf"^PUT 'file://([^']+)' @({IDENTIFIER})")),
+    ("copy", re.compile(rf"^COPY INTO ({IDENTIFIER}) FROM @({IDENTIFIER})")),
+    ("merge", re.compile(rf"^MERGE INTO ({IDENTIFIER}) AS target USING \(SELECT \* FROM ({IDENTIFIER}) .*?\) AS source ON (.*?) WHEN")),
+    ("drop_table", re.compile(rf"^DROP TABLE IF EXISTS ({IDENTIFIER})$")),
+    ("drop_stage", re.compile(rf"^DROP STAGE IF EXISTS ({IDENTIFIER})$")),
+]
+
+
+def unquote(identifier: str) -> str:
+    return identifier[1:-1].replace('""', '"')
+
+
+class LocalSnowflake:
+    """In-process stand-in for a Snowflake account, for running exports offline and in tests.
+
+    Understands exactly the statements SnowflakeManager issues: tables are lists of row dicts,
+    stages are temporary directories, and COPY INTO reads the staged Parquet files with
+    pyarrow. Every statement is recorded in `statements`.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, dict] = {}  # name -> {"columns": {name: type}, "rows": [dict]}
+        self.stages: Dict[str, str] = {}
+        self.statements: List[str] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def connect(self, **config):
+        with self._lock:
+            self.connections += 1
+        return LocalSnowflakeConnection(self)
+
+    def rows(self, table_name: str) -> List[dict]:
+        return self.tables[table_name.upper()]["rows"]
+
+    def columns(self, table_name: str) -> Dict[str, str]:
+        return self.tables[table_name.upper()]["columns"]
+
+    def execute(self, sql: str) -> list:
+        sql = " ".join(sql.split())
+        with self._lock:
+            self.statements.append(sql)
+            for name, pattern in STATEMENTS:
+                match = pattern.match(sql)
+                if match:
+                    return getattr(self, f"_{name}")(*match.groups()) or []
+        raise NotImplementedError(f"Unsupported statement: {sql}")
+
+    def _create(self, replace, if_not_exists, table, definition):
+        table = unquote(table)
+        if table in self.tables and not replace:
+            if if_not_exists:
+                return
+            raise ValueError(f"Table {table} already exists")
+        columns = {unquote(name): column_type for name, column_type in COLUMN.findall(definition)}
+        self.tables[table] = {"columns": columns, "rows": []}
+
+    def _create_like(self, table, source):
+        self.tables[unquote(table)] = {"columns": dict(self.tables[unquote(source)]["columns"]), "rows": []}
+
+    def _describe(self, table):
+        return [(name, column_type) for name, column_type in self.tables[unquote(table)]["columns"].items()]
+
+    def _add_columns(self, table, definition):
+        table = self.tables[unquote(table)]
+        for name, column_type in COLUMN.findall(definition):
+            table["columns"][unquote(name)] = column_type
+            for row in table["rows"]:
+                row.setdefault(unquote(name), None)
+
+    def _create_stage(self, stage):
+        self.stages[unquote(stage)] = tempfile.mkdtemp(prefix="local_snowflake_stage_")
+
+    def _put(self, pattern, stage):
+        directory = self.stages[unquote(stage)]
+        paths = sorted(glob.glob(pattern))
+        for path in paths:
+            shutil.copy(path, directory)
+        return [(os.path.basename(path), os.path.basename(path), "UPLOADED") for path in paths]
+
+    def _copy(self, table, stage):
+        import pyarrow.parquet as pq
+
+        table = self.tables[unquote(table)]
+        directory = self.stages[unquote(stage)]
+        results = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            rows = pq.read_table(path).to_pylist()
+            for row in rows:
+                unknown = set(row) - set(table["columns"])
+                if unknown:
+                    raise ValueError(f"Columns not in table: {', '.join(sorted(unknown))}")
+                table["rows"].append({column: row.get(column) for column in table["columns"]})
+            os.remove(path)  # PURGE = TRUE
+            results.append((name, "LOADED", len(rows), len(rows)))
+        return results
+
+    def _merge(self, target, source, condition):
+        target = self.tables[unquote(target)]
+        keys = [unquote(key) for key in KEY.findall(condition)]
+        existing = {tuple(row[key] for key in keys): row for row in target["rows"]}
+        seen = set()
+        inserted = updated = 0
+        for row in self.tables[unquote(source)]["rows"]:
+            key = tuple(row[k] for k in keys)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key in existing:
+                existing[key].update(row)
+                updated += 1
+            else:
+                target["rows"].append({column: row.get(column) for column in target["columns"]})
+                inserted += 1
+        return [(inserted, updated)]
+
+    def _drop_table(self, table):
+        self.tables.pop(unquote(table), None)
+
+    def _drop_stage(self, stage):
+        directory = self.stages.pop(unquote(stage), None)
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class LocalSnowflakeCursor:
+    def __init__(self, database: LocalSnowflake):
+        self.database = database
+        self._rows = []
+
+    def execute(self, sql: str):
+        self._rows = list(self.database.execute(sql))
+        return self
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self):
+        self._rows = []
+
+
+class LocalSnowflakeConnection:
+    def __init__(self, database: LocalSnowflake):
+        self.database = database
+        self._closed = False
+
+    def cursor(self):
+        return LocalSnowflakeCursor(self.database)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+
+
+# Shared by every SnowflakeManager when SNOWFLAKE_BACKEND is "local"
+local_snowflake = LocalSnowflake()
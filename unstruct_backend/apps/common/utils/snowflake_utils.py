@@ -1,13 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence
+
 from django.conf import settings
-import snowflake.connector
-import pandas as pd
-from snowflake.connector.pandas_tools import write_pandas
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FIELDS = ("account", "user", "password", "warehouse", "database", "schema", "role")
+# Task result rows are identified by these columns when merging into an existing table (asset names
+# are not unique within a task, so rows are keyed on the asset id)
+MERGE_KEYS = ("TASK_ID", "ASSET_ID", "EXTRACTION_TYPE")
+LOAD_MODES = ("append", "replace", "merge")
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_$]*$")
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def snowflake_type(arrow_type) -> str:
+    """Snowflake column type for an Arrow column type"""
+    import pyarrow as pa
+
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "NUMBER(38,0)"
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "FLOAT"
+    if pa.types.is_date(arrow_type):
+        return "DATE"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP_TZ" if arrow_type.tz else "TIMESTAMP_NTZ"
+    if pa.types.is_nested(arrow_type):
+        return "VARIANT"
+    return "VARCHAR"
+
+
+def write_parquet_chunks(table, directory: str, rows_per_file: int) -> List[str]:
+    """Split the table into Parquet files of at most `rows_per_file` rows"""
+    import pyarrow.parquet as pq
+
+    paths = []
+    for offset in range(0, max(table.num_rows, 1), rows_per_file):
+        path = os.path.join(directory, f"part_{len(paths):05d}.parquet")
+        pq.write_table(table.slice(offset, rows_per_file), path, compression="snappy")
+        paths.append(path)
+    return paths
+
+
+class ConnectionPool:
+    """Keeps idle connections for one set of credentials so consecutive exports skip the login round trips"""
+
+    def __init__(self, connect: Callable, max_idle: int, idle_timeout: float):
+        self.connect = connect
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle = []  # (connection, returned at)
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, returned_at = self._idle.pop()
+                if now - returned_at < self.idle_timeout and not conn.is_closed():
+                    return conn
+                self._close(conn)
+        return self.connect()
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.max_idle and not conn.is_closed():
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Failed to close Snowflake connection: {e}")
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            # The session may be mid-statement or hold temporary objects; do not hand it out again
+            self._close(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _default_connect(config: dict):
+    if settings.SNOWFLAKE_BACKEND == "local":
+        from apps.common.utils.snowflake_local import local_snowflake
+
+        return local_snowflake.connect(**config)
+
+    import snowflake.connector
+
+    return snowflake.connector.connect(**config)
+
+
+def get_pool(config: dict, connect: Callable = None) -> ConnectionPool:
+    """The process-wide pool for a credential set (keyed by a digest, so passwords are not kept as keys)"""
+    key = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                lambda: (connect or _default_connect)(config),
+                max_idle=settings.SNOWFLAKE_POOL_SIZE,
+                idle_timeout=settings.SNOWFLAKE_POOL_IDLE_TIMEOUT,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def close_pools():
+    """Close every pooled connection (worker shutdown, tests)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
 
 class SnowflakeManager:
-    def __init__(self, config):
+    def __init__(self, config, connect: Callable = None, rows_per_file: int = None, put_parallel: int = None):
         """
         Initialize with Snowflake configuration
-        
+
         Args:
             config: dict containing Snowflake credentials and configuration:
                 - account
@@ -17,59 +163,125 @@ class SnowflakeManager:
                 - database
                 - schema
                 - role
+            connect: called with the config to open a connection (defaults to the Snowflake
+                connector, or the local test double when SNOWFLAKE_BACKEND is "local")
+            rows_per_file: rows per staged Parquet file
+            put_parallel: files uploaded concurrently by PUT
         """
-        self.config = config
-
-    def get_connection(self):
-        return snowflake.connector.connect(
-            account=self.config['account'],
-            user=self.config['user'],
-            password=self.config['password'],
-            warehouse=self.config['warehouse'],
-            database=self.config['database'],
-            schema=self.config['schema'],
-            role=self.config['role']
-        )
+        self.config = {field: config[field] for field in CONFIG_FIELDS}
+        self.pool = get_pool(self.config, connect)
+        self.rows_per_file = rows_per_file or settings.SNOWFLAKE_EXPORT_ROWS_PER_FILE
+        self.put_parallel = put_parallel or settings.SNOWFLAKE_PUT_PARALLEL
 
-    def upload_dataframe(self, df: pd.DataFrame, table_name: str, if_exists: str = 'append'):
+    def connection(self):
+        """A pooled connection, returned to the pool when the block exits cleanly"""
+        return self.pool.connection()
+
+    def upload_dataframe(self, df, table_name: str, if_exists: str = 'append'):
         """
         Upload a pandas DataFrame to Snowflake table
-        
+
         Args:
             df: Pandas DataFrame to upload
             table_name: Name of the target table
-            if_exists: What to do if table exists ('append', 'replace', 'fail')
+            if_exists: What to do if table exists ('append', 'replace', 'merge')
         """
-        conn = self.get_connection()
-        try:
-            # Create table if it doesn't exist
-            columns = []
-            for col in df.columns:
-                dtype = 'VARCHAR' if df[col].dtype == 'object' else 'FLOAT' if df[col].dtype in ['float64', 'float32'] else 'INTEGER'
-                columns.append(f'"{col}" {dtype}')
-            
-            create_table_sql = f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                {', '.join(columns)}
+        import pyarrow as pa
+
+        return self.bulk_load(pa.Table.from_pandas(df, preserve_index=False), table_name, mode=if_exists)
+
+    def bulk_load(self, table, table_name: str, mode: str = "append", merge_keys: Sequence[str] = MERGE_KEYS):
+        """
+        Load an Arrow table: write it as chunked Parquet files, PUT them to a temporary stage
+        and load them with a single COPY INTO.
+
+        Args:
+            table: pyarrow Table to load
+            table_name: Name of the target table (created if missing; missing columns are added)
+            mode: 'append' adds the rows, 'replace' recreates the table first, 'merge' updates
+                rows whose `merge_keys` match and inserts the rest
+            merge_keys: Columns identifying a row when merging
+        """
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unsupported load mode: {mode}")
+        if not IDENTIFIER.match(table_name):
+            raise ValueError(f"Invalid Snowflake table name: {table_name}")
+        if mode == "merge":
+            missing = [key for key in merge_keys if key not in table.column_names]
+            if missing:
+                raise ValueError(f"Merge key columns missing from the data: {', '.join(missing)}")
+
+        target = quote(table_name.upper())
+        suffix = uuid.uuid4().hex[:12].upper()
+        stage = quote(f"{table_name.upper()}_STAGE_{suffix}")
+        columns = [(field.name, snowflake_type(field.type)) for field in table.schema]
+
+        with tempfile.TemporaryDirectory(prefix="snowflake_export_") as directory, self.connection() as conn:
+            paths = write_parquet_chunks(table, directory, self.rows_per_file)
+            cursor = conn.cursor()
+            try:
+                self._prepare_table(cursor, target, columns, replace=mode == "replace")
+                cursor.execute(f"CREATE TEMPORARY STAGE {stage} FILE_FORMAT = (TYPE = PARQUET)")
+                cursor.execute(
+                    f"PUT 'file://{directory}/*.parquet' @{stage} "
+                    f"PARALLEL = {self.put_parallel} AUTO_COMPRESS = FALSE"
+                )
+                if mode == "merge":
+                    staging = quote(f"{table_name.upper()}_LOAD_{suffix}")
+                    result = self._merge(cursor, target, staging, stage, [name for name, _ in columns], merge_keys)
+                else:
+                    result = {"rows_uploaded": self._copy(cursor, target, stage)}
+            finally:
+                cursor.execute(f"DROP STAGE IF EXISTS {stage}")
+                cursor.close()
+
+        logger.info(f"Loaded {table.num_rows} rows into {table_name} from {len(paths)} files ({mode})")
+        return {"success": True, "mode": mode, "files": len(paths), **result}
+
+    def _prepare_table(self, cursor, target: str, columns, replace: bool):
+        definition = ", ".join(f"{quote(name)} {column_type}" for name, column_type in columns)
+        if replace:
+            cursor.execute(f"CREATE OR REPLACE TABLE {target} ({definition})")
+            return
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {target} ({definition})")
+        # Fields added to the task since the table was created become new columns
+        existing = {row[0] for row in cursor.execute(f"DESC TABLE {target}").fetchall()}
+        added = [(name, column_type) for name, column_type in columns if name not in existing]
+        if added:
+            cursor.execute(
+                f"ALTER TABLE {target} ADD COLUMN "
+                + ", ".join(f"{quote(name)} {column_type}" for name, column_type in added)
             )
-            """
-            
-            conn.cursor().execute(create_table_sql)
-            
-            # Write the DataFrame to Snowflake
-            success, num_chunks, num_rows, output = write_pandas(
-                conn=conn,
-                df=df,
-                table_name=table_name,
-                database=self.config['database'],
-                schema=self.config['schema'],
-                quote_identifiers=True
+
+    @staticmethod
+    def _copy(cursor, target: str, stage: str) -> int:
+        cursor.execute(
+            f"COPY INTO {target} FROM @{stage} "
+            "FILE_FORMAT = (TYPE = PARQUET USE_LOGICAL_TYPE = TRUE) "
+            "MATCH_BY_COLUMN_NAME = CASE_SENSITIVE PURGE = TRUE"
+        )
+        # One row per file: (file, status, rows_parsed, rows_loaded, ...)
+        return sum(row[3] or 0 for row in cursor.fetchall())
+
+    def _merge(self, cursor, target: str, staging: str, stage: str, columns: List[str], merge_keys: Sequence[str]):
+        cursor.execute(f"CREATE TEMPORARY TABLE {staging} LIKE {target}")
+        try:
+            rows = self._copy(cursor, staging, stage)
+            keys = ", ".join(quote(key) for key in merge_keys)
+            match = " AND ".join(f"target.{quote(key)} = source.{quote(key)}" for key in merge_keys)
+            updates = ", ".join(f"target.{quote(name)} = source.{quote(name)}" for name in columns if name not in merge_keys)
+            names = ", ".join(quote(name) for name in columns)
+            values = ", ".join(f"source.{quote(name)}" for name in columns)
+            # Duplicate keys in the data would make the merge nondeterministic; keep one row per key
+            cursor.execute(
+                f"MERGE INTO {target} AS target "
+                f"USING (SELECT * FROM {staging} QUALIFY ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY {keys}) = 1) AS source "
+                f"ON {match} "
+                + (f"WHEN MATCHED THEN UPDATE SET {updates} " if updates else "")
+                + f"WHEN NOT MATCHED THEN INSERT ({names}) VALUES ({values})"
             )
-            
-            return {
-                'success': success,
-                'rows_uploaded': num_rows
-            }
-            
+            # (rows inserted, rows updated); the second is absent when there is nothing to update
+            counts = tuple(cursor.fetchone() or ()) + (0, 0)
         finally:
-            conn.close()
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        return {"rows_uploaded": rows, "rows_inserted": counts[0], "rows_updated": counts[1] if updates else 0}
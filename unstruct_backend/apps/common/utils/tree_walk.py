@@ -0,0 +1,29 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Generator, Hashable, Iterable, List, Tuple, TypeVar
+
+Item = TypeVar("Item")
+
+
+def walk_concurrently(
+    roots: Iterable[Hashable],
+    list_children: Callable[[Hashable], Tuple[List[Item], List[Hashable]]],
+    max_workers: int,
+) -> Generator[Item, None, None]:
+    """Walk a folder tree listing up to `max_workers` folders at once.
+
+    `list_children(folder)` returns the folder's items and its subfolders. Items are
+    yielded as each folder's listing completes, so the order is not deterministic.
+    Listing errors propagate to the caller.
+    """
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        pending = {executor.submit(list_children, root) for root in roots}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    items, children = future.result()
+                    pending |= {executor.submit(list_children, child) for child in children}
+                    yield from items
+        finally:
+            for future in pending:
+                future.cancel()
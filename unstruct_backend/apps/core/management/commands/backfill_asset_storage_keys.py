@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.common.utils.s3_utils import S3Service
+from apps.core.models import Asset
+from apps.core.models.asset import ASSET_UPLOAD_SOURCE
+
+
+class Command(BaseCommand):
+    help = "Record the S3 key of uploaded assets created before storage keys were stored on the asset"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Assets resolved and updated per batch",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Concurrent HEAD requests (and prefix listings with --scan-prefix)",
+        )
+        parser.add_argument(
+            "--scan-prefix",
+            action="append",
+            default=[],
+            help=(
+                "List this prefix once and match the remaining assets by file name; "
+                "names found under more than one key are left unresolved. May be repeated"
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be resolved without updating assets",
+        )
+
+    def scan(self, s3_service, prefixes, workers):
+        """Map file names to keys under the scanned prefixes; None marks ambiguous names"""
+        keys_by_name = {}
+        for prefix in prefixes:
+            for info in s3_service.list_files_concurrently(settings.AWS_STORAGE_BUCKET_NAME, prefix, True, workers):
+                name = info["name"]
+                keys_by_name[name] = info["id"] if name not in keys_by_name else None
+        self.stdout.write(f"Scanned {len(keys_by_name)} file names under {prefixes}")
+        return keys_by_name
+
+    def handle(self, *args, **options):
+        s3_service = S3Service({"region_name": settings.AWS_S3_REGION})
+        s3_service.authenticate()
+        keys_by_name = {}
+        if options["scan_prefix"]:
+            keys_by_name = self.scan(s3_service, options["scan_prefix"], options["workers"])
+
+        def is_local(asset):
+            # Files stored on this host by the local upload backend have no S3 key
+            return bool(asset.url) and os.path.exists(asset.url)
+
+        def resolve(asset):
+            if is_local(asset):
+                return None
+            info = asset.find_storage_key(s3_service)
+            if info:
+                return info["id"]
+            # URLs quote the file name; listed keys do not
+            return keys_by_name.get(unquote(os.path.basename(urlparse(asset.url or "").path)) or asset.name)
+
+        pending = Asset.all_objects.filter(
+            upload_source=ASSET_UPLOAD_SOURCE.UPLOAD, storage_key__isnull=True
+        ).order_by("id")
+        resolved = unresolved = local = 0
+        last_id = None
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as executor:
+            while True:
+                batch = list((pending.filter(id__gt=last_id) if last_id else pending)[:options["batch_size"]])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                updated = []
+                for asset, key in zip(batch, executor.map(resolve, batch)):
+                    if key:
+                        asset.storage_key = key
+                        updated.append(asset)
+                    elif is_local(asset):
+                        local += 1
+                    else:
+                        unresolved += 1
+                        self.stdout.write(f"Unresolved: asset {asset.id} ({asset.url or asset.name})")
+                if updated and not options["dry_run"]:
+                    Asset.all_objects.bulk_update(updated, ["storage_key"])
+                resolved += len(updated)
+                self.stdout.write(f"Resolved {resolved} assets, {unresolved} unresolved so far")
+
+        verb = "Would resolve" if options["dry_run"] else "Resolved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {resolved} assets; {unresolved} left unresolved, {local} stored locally"
+        ))
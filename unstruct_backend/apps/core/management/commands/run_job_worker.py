@@ -0,0 +1,61 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from apps.core.services.job_worker import JobWorker
+
+
+class Command(BaseCommand):
+    help = "Run a background job worker that processes queued tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help="Number of jobs processed in parallel by this worker",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOB_WORKER_POLL_INTERVAL,
+            help="Seconds to wait between polls when the queue is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is drained instead of polling forever",
+        )
+        parser.add_argument(
+            "--no-preload",
+            action="store_true",
+            help="Skip JOB_WORKER_PRELOAD; models are then loaded by the first job that needs them",
+        )
+
+    def preload(self):
+        for path in settings.JOB_WORKER_PRELOAD:
+            started = time.monotonic()
+            import_string(path)()
+            self.stdout.write(f"Preloaded {path} in {time.monotonic() - started:.1f}s")
+
+    def handle(self, *args, **options):
+        if not options["no_preload"]:
+            self.preload()
+
+        worker = JobWorker(
+            concurrency=options["concurrency"],
+            poll_interval=options["poll_interval"],
+        )
+
+        def _shutdown(signum, frame):
+            self.stdout.write("Shutting down job worker, waiting for running jobs to finish...")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, _shutdown)
+        signal.signal(signal.SIGINT, _shutdown)
+
+        self.stdout.write(self.style.SUCCESS(f"Starting job worker {worker.worker_id}"))
+        worker.run(once=options["once"])
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='downloaded_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-17 15:58
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_task_downloaded_bytes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskResult',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('action_type', models.CharField(choices=[('EXTRACT', 'Extraction'), ('GENERATE', 'Generation')], default='EXTRACT', max_length=200)),
+                ('field_name', models.CharField(max_length=200)),
+                ('asset_name', models.CharField(blank=True, default='', max_length=200)),
+                ('source', models.URLField(blank=True, default='', max_length=500)),
+                ('position', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('SUCCESS', 'Success'), ('ERROR', 'Error')], default='SUCCESS', max_length=20)),
+                ('value', models.JSONField(blank=True, null=True)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('reference', models.TextField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('extra', models.JSONField(blank=True, default=dict)),
+                ('action', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='task_results', to='core.action')),
+                ('asset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='task_results', to='core.asset')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_created', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_items', to='core.organization')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='core.task')),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['position', 'created_at'],
+                'indexes': [models.Index(fields=['task', 'action_type', 'position'], name='core_taskresult_task_type_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'asset', 'action'), name='core_taskresult_task_asset_action_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-17 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_taskresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='results_prefix',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_usagereservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='llm_cache_hits',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='llm_cache_misses',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_task_llm_cache_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['project', 'upload_source', 'source_file_id'], name='core_asset_source_file_idx'),
+        ),
+    ]
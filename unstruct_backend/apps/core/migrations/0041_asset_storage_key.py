@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_asset_source_file_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='storage_key',
+            field=models.CharField(blank=True, max_length=1024, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # Keep the oldest queued or running job of each task; later duplicates would never be needed
+    Job = apps.get_model('core', 'Job')
+    seen = set()
+    duplicates = []
+    active = Job.objects.filter(status__in=['QUEUED', 'RUNNING'], task__isnull=False).order_by('created_at')
+    for job_id, task_id in active.values_list('id', 'task_id'):
+        if task_id in seen:
+            duplicates.append(job_id)
+        seen.add(task_id)
+    Job.objects.filter(id__in=duplicates).update(
+        status='FAILED', error='Duplicate of an active job of the same task', completed_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_asset_storage_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['QUEUED', 'RUNNING'])), fields=('task',), name='core_job_one_active_per_task'),
+        ),
+    ]
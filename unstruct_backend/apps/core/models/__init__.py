@@ -3,9 +3,13 @@
 from .action import Action
 from .asset import Asset
 from .asset import ASSET_FILE_TYPE
+from .job import Job, JOB_STATUS, ACTIVE_JOB_STATUSES
 from .organization import Organization
 from .project import Project
 from .task import Task
+from .task_result import TaskResult, TASK_RESULT_STATUS
+from .usage_reservation import RESERVATION_STATUS, UsageReservation
 from .user import User
 
-__all__ = ["Project", "Task", "Action", "User", "Asset", "ASSET_FILE_TYPE", "Organization"]
+__all__ = ["Project", "Task", "Action", "User", "Asset", "ASSET_FILE_TYPE", "Organization", "Job", "JOB_STATUS", "ACTIVE_JOB_STATUSES", "TaskResult",
+           "TASK_RESULT_STATUS", "UsageReservation", "RESERVATION_STATUS"]
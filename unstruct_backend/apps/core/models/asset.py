@@ -3,18 +3,20 @@ from django.utils.translation import gettext_lazy as _
 import nest_asyncio
 import os
 import concurrent.futures
-from typing import List, Generator
+from typing import Dict, List, Generator, Optional
+from urllib.parse import unquote, urlparse
 
-from apps.common.utils.s3_utils import download_from_s3, S3Service
+from apps.common.utils.s3_clients import get_transfer_config
+from apps.common.utils.s3_utils import download_from_s3, parse_s3_url, S3Service
 from apps.common.utils.gdrive_utils import GoogleDriveService
 from apps.common.utils.dropbox_utils import DropboxService
+from apps.common.utils.asset_cache import get_asset_cache
 
 from apps.common.models import NBaseWithOwnerModel
 
 from .project import Project
 from .constants import ASSET_UPLOAD_SOURCE
 
-import cv2
 import base64
 import time
 
@@ -26,8 +28,6 @@ from django.conf import settings
 
 import logging
 
-import boto3
-
 # Configure logger
 logger = logging.getLogger(__name__)
 
@@ -45,6 +45,40 @@ class ASSET_FILE_TYPE(models.TextChoices):
     OTHER = "OTHER", _("Other")
 
 
+FILE_TYPE_BY_EXTENSION = {
+    "pdf": ASSET_FILE_TYPE.PDF,
+    "doc": ASSET_FILE_TYPE.DOC,
+    "docx": ASSET_FILE_TYPE.DOC,
+    "txt": ASSET_FILE_TYPE.TXT,
+    "mp4": ASSET_FILE_TYPE.MP4,
+    "jpeg": ASSET_FILE_TYPE.JPEG,
+    "jpg": ASSET_FILE_TYPE.JPG,
+    "png": ASSET_FILE_TYPE.PNG,
+    "mp3": ASSET_FILE_TYPE.MP3,
+}
+
+
+def file_type_from_name(filename: str) -> str:
+    """Asset file type from a file name's extension"""
+    return FILE_TYPE_BY_EXTENSION.get(filename.split(".")[-1].lower(), ASSET_FILE_TYPE.OTHER)
+
+
+def storage_key_from_url(url: str) -> Optional[str]:
+    """Key in AWS_STORAGE_BUCKET_NAME of an s3:// URL or a virtual-hosted or path-style S3 URL, if it is one"""
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    parsed = urlparse(url)
+    path = parsed.path.lstrip('/')
+    if parsed.scheme == 's3':
+        return path if parsed.netloc == bucket and path else None
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc.endswith('amazonaws.com'):
+        return None
+    if parsed.netloc.startswith(f"{bucket}.s3"):
+        return path or None
+    if parsed.netloc.startswith('s3') and path.startswith(f"{bucket}/"):
+        return path[len(bucket) + 1:] or None
+    return None
+
+
 class ASSET_UPLOAD_SOURCE(models.TextChoices):
     UPLOAD = 'UPLOAD', 'Upload'
     GOOGLE_DRIVE = 'GOOGLE_DRIVE', 'Google Drive'
@@ -80,87 +114,89 @@ class Asset(NBaseWithOwnerModel):
     source_file_id = models.CharField(max_length=500, null=True, blank=True)  # ID in the source system (gdrive_id, dropbox_id etc)
     source_credentials = models.JSONField(null=True, blank=True)  # Source-specific credentials
     metadata = models.JSONField(null=True, blank=True)  # Additional metadata like OAuth tokens
+    storage_key = models.CharField(max_length=1024, null=True, blank=True)  # Key of a direct upload in AWS_STORAGE_BUCKET_NAME
 
     class Meta:
         # Add this to ensure we only get non-deleted assets by default
         default_manager_name = 'objects'
         base_manager_name = 'objects'
+        indexes = [
+            models.Index(fields=["project", "upload_source", "source_file_id"], name="core_asset_source_file_idx"),
+        ]
 
     def __str__(self) -> str:
         return str(self.name)
     
-    def _find_file_in_s3(self, filename):
-        """Search for a file in S3 bucket and return its key"""
-        try:
-            s3 = boto3.client('s3', region_name=settings.AWS_S3_REGION)
-            logger.error(f"[DEBUG] Searching for file {filename} in bucket {settings.AWS_STORAGE_BUCKET_NAME}")
-            
-            paginator = s3.get_paginator('list_objects_v2')
-            for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME):
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        logger.error(f"[DEBUG] Found object: {obj['Key']}")
-                        if filename in obj['Key']:
-                            return obj['Key']
-            return None
-        except Exception as e:
-            logger.error(f"[DEBUG] Error searching S3: {str(e)}")
-            raise
-
-    def get_file_path(self):
-        """Get the local path or download the file if it's from an external source"""
-        local_path = f"/tmp/unstruct/assets/{self.id}/{self.name}"
-        
+    def storage_key_candidates(self) -> List[str]:
+        """Keys a legacy upload without a storage_key may be stored under, most likely first"""
+        candidates = []
+        key = storage_key_from_url(self.url or "")
+        if key:
+            candidates += [key, unquote(key)]
+        filename = unquote(os.path.basename(urlparse(self.url or "").path)) or self.name
+        candidates += [f"{prefix}{filename}" for prefix in settings.ASSET_STORAGE_KEY_PREFIXES]
+        return candidates
+
+    def find_storage_key(self, s3_service: S3Service) -> Optional[Dict]:
+        """HEAD the candidate keys of a legacy upload; returns the metadata of the one that exists"""
+        return s3_service.head_first(settings.AWS_STORAGE_BUCKET_NAME, self.storage_key_candidates())
+
+    def get_file_path(self, progress=None):
+        """Get the local path or download the file if it's from an external source.
+
+        Downloads go through the shared asset cache, keyed by the file's location and its
+        current version in the source, so unchanged files are only downloaded once per host.
+        `progress`, if given, is called with the number of bytes received after each chunk;
+        large S3 files are fetched in parallel ranges, so it may be called from several threads.
+        """
         if self.upload_source == ASSET_UPLOAD_SOURCE.GOOGLE_DRIVE:
-            return self._download_from_gdrive()
+            return self._download_from_gdrive(progress)
         elif self.upload_source == ASSET_UPLOAD_SOURCE.AWS_S3:
-            return self._download_from_s3()
+            return self._download_from_s3(progress)
         elif self.upload_source == ASSET_UPLOAD_SOURCE.DROPBOX:
-            return self._download_from_dropbox()
+            return self._download_from_dropbox(progress)
         else:
-            if not os.path.exists(local_path):
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-                try:
-                    # First try to get the key directly from the URL
-                    url_parts = self.url.split(settings.AWS_STORAGE_BUCKET_NAME + '.s3.' + settings.AWS_S3_REGION + '.amazonaws.com/')
-                    key = None
-                    
-                    if len(url_parts) == 2:
-                        key = url_parts[1]
-                        logger.info(f"Found key from URL: {key}")
-                    else:
-                        # If URL parsing fails, search for the file in S3
-                        filename = os.path.basename(self.url)
-                        logger.info(f"Looking for file: {filename}")
-                        key = self._find_file_in_s3(filename)
-                        if not key:
-                            raise Exception(f"File {filename} not found in S3 bucket")
-                        logger.info(f"Found file with key: {key}")
-                    
-                    # Use S3 client directly
-                    s3 = boto3.client(
-                        's3',
-                        region_name=settings.AWS_S3_REGION,
-                    )
-                    
-                    try:
-                        s3.download_file(settings.AWS_STORAGE_BUCKET_NAME, key, local_path)
-                        logger.info(f"File downloaded successfully to {local_path}")
-                    except s3.exceptions.NoSuchKey:
-                        # If the direct key fails, try with the URL-decoded version
-                        from urllib.parse import unquote
-                        decoded_key = unquote(key)
-                        s3.download_file(settings.AWS_STORAGE_BUCKET_NAME, decoded_key, local_path)
-                        logger.info(f"File downloaded successfully using decoded key: {decoded_key}")
-                    
-                except Exception as e:
-                    logger.error(f"Error downloading file from S3: {str(e)}")
-                    logger.error(f"Error type: {type(e)}")
-                    raise
-                    
-            return local_path
+            return self._download_upload(progress)
+
+    def _cached_download(self, source_key, version, fetch):
+        return get_asset_cache().get_or_fetch(source_key, version, self.name, fetch)
+
+    def _download_upload(self, progress=None):
+        """Get a directly uploaded file, from local storage or from our S3 bucket"""
+        if os.path.exists(self.url):
+            return self.url
+
+        try:
+            s3_service = S3Service({'region_name': settings.AWS_S3_REGION})
+            s3_service.authenticate()
+            bucket = settings.AWS_STORAGE_BUCKET_NAME
 
-    def _download_from_gdrive(self):
+            if self.storage_key:
+                key = self.storage_key
+                file_info = s3_service.head_file(bucket, key)
+            else:
+                file_info = self.find_storage_key(s3_service)
+                if not file_info:
+                    raise Exception(f"File {self.name} not found in S3 bucket under {self.storage_key_candidates()}")
+                key = file_info['id']
+                # Remembered so the next download goes straight to the key
+                Asset.all_objects.filter(id=self.id).update(storage_key=key)
+                self.storage_key = key
+                logger.info(f"Resolved storage key of asset {self.id}: {key}")
+
+            return self._cached_download(
+                f"s3://{bucket}/{key}",
+                file_info['etag'],
+                lambda path: s3_service.s3_client.download_file(
+                    bucket, key, path, Callback=progress, Config=get_transfer_config()
+                ),
+            )
+        except Exception as e:
+            logger.error(f"Error downloading file from S3: {str(e)}")
+            logger.error(f"Error type: {type(e)}")
+            raise
+
+    def _download_from_gdrive(self, progress=None):
         """Download file from Google Drive using stored credentials or OAuth tokens"""
         if not self.source_file_id:
             raise ValueError("Google Drive file ID is required")
@@ -183,31 +219,24 @@ class Asset(NBaseWithOwnerModel):
             gdrive_service.authenticate()
             logger.info("Authentication successful")
             
-            # Create a temporary directory for downloads
-            download_dir = f"/tmp/unstruct/gdrive/{self.id}"
-            os.makedirs(download_dir, exist_ok=True)
-            logger.info(f"Created download directory: {download_dir}")
-            
-            local_path = os.path.join(download_dir, self.name)
-            logger.info(f"Will download to: {local_path}")
-            
-            file_info = gdrive_service.get_file_by_id(
-                self.source_file_id, 
-                local_path
+            version = gdrive_service.get_file_version(self.source_file_id)
+            local_path = self._cached_download(
+                f"gdrive://{self.source_file_id}",
+                version,
+                lambda path: gdrive_service.download_file(
+                    self.source_file_id,
+                    path,
+                    chunk_size=settings.ASSET_DOWNLOAD_CHUNK_SIZE,
+                    progress=progress,
+                ),
             )
-            
-            if os.path.exists(local_path):
-                file_size = os.path.getsize(local_path)
-                logger.info(f"File downloaded successfully. Size: {file_size} bytes")
-            else:
-                raise Exception(f"File not found at {local_path} after download")
-            
-            return file_info['local_path']
+            logger.info(f"File available at {local_path}. Size: {os.path.getsize(local_path)} bytes")
+            return local_path
         except Exception as e:
             logger.exception(f"Error downloading from Google Drive: {str(e)}")
             raise
 
-    def _download_from_s3(self):
+    def _download_from_s3(self, progress=None):
         """Download file from S3 using stored credentials"""
         if not self.source_file_id:
             raise ValueError("S3 bucket and key are required")
@@ -216,19 +245,21 @@ class Asset(NBaseWithOwnerModel):
             s3_service = S3Service(self.source_credentials)  # Credentials are optional
             s3_service.authenticate()
             
-            # Create a temporary directory for downloads
-            download_dir = f"/tmp/unstruct/s3/{self.id}"
-            os.makedirs(download_dir, exist_ok=True)
+            bucket = (self.metadata or {}).get('bucket')
+            key = self.source_file_id
+            if not bucket:
+                bucket, key = parse_s3_url(self.source_file_id)
             
-            file_info = s3_service.get_file_by_key(
-                self.source_file_id,
-                os.path.join(download_dir, self.name)
+            file_info = s3_service.head_file(bucket, key)
+            return self._cached_download(
+                f"s3://{bucket}/{key}",
+                file_info['etag'],
+                lambda path: s3_service.get_file_by_key(bucket, key, path, progress=progress),
             )
-            return file_info['local_path']
         except Exception as e:
             raise Exception(f"Error downloading from S3: {str(e)}")
 
-    def _download_from_dropbox(self):
+    def _download_from_dropbox(self, progress=None):
         """Download file from Dropbox using stored access token"""
         if not self.source_file_id:
             raise ValueError("Dropbox path and access token are required")
@@ -237,15 +268,17 @@ class Asset(NBaseWithOwnerModel):
             dropbox_service = DropboxService(self.source_credentials)
             dropbox_service.authenticate()
             
-            # Create a temporary directory for downloads
-            download_dir = f"/tmp/unstruct/dropbox/{self.id}"
-            os.makedirs(download_dir, exist_ok=True)
-            
-            file_info = dropbox_service.get_file_by_id(
-                self.source_file_id,
-                os.path.join(download_dir, self.name)
+            file_info = dropbox_service.get_file_metadata(self.source_file_id)
+            return self._cached_download(
+                f"dropbox://{self.source_file_id}",
+                file_info['content_hash'],
+                lambda path: dropbox_service.download_file(
+                    self.source_file_id,
+                    path,
+                    chunk_size=settings.ASSET_DOWNLOAD_CHUNK_SIZE,
+                    progress=progress,
+                ),
             )
-            return file_info['local_path']
         except Exception as e:
             raise Exception(f"Error downloading from Dropbox: {str(e)}")
 
@@ -256,7 +289,7 @@ class Asset(NBaseWithOwnerModel):
     def get_frames_from_video(self):
         local_path = self.get_file_path()
         try:
-            return get_frames(local_path)
+            return list(get_frames(local_path))
         except Exception as e:
             print(e)
 
@@ -297,21 +330,17 @@ class Asset(NBaseWithOwnerModel):
             self.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
 
 def get_frames(video_path):
-    video = cv2.VideoCapture(video_path)
-
-    base64Frames = []
-    while video.isOpened():
-        success, frame = video.read()
-        if not success:
-            break
-        _, buffer = cv2.imencode(".jpg", frame)
-        base64Frames.append(base64.b64encode(buffer).decode("utf-8"))
+    """Yield base64 JPEGs of the frames FrameSampler picks from the video"""
+    import cv2
+    from apps.common.utils.frame_sampler import FrameSampler
 
-    video.release()
-    print(len(base64Frames), "frames read.")
-    return base64Frames
+    for frame in FrameSampler().sample(video_path):
+        _, buffer = cv2.imencode(".jpg", frame.image)
+        yield base64.b64encode(buffer).decode("utf-8")
 
 def get_base64_image(image_path):
+    import cv2
+
     image = cv2.imread(image_path)
     if image is None:
         raise ValueError(f"Could not read image from {image_path}")
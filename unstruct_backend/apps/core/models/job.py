@@ -0,0 +1,72 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from apps.common.models import NBaseModel
+
+from .task import Task
+
+
+class JOB_STATUS(models.TextChoices):
+    QUEUED = "QUEUED", _("Queued")
+    RUNNING = "RUNNING", _("Running")
+    SUCCEEDED = "SUCCEEDED", _("Succeeded")
+    FAILED = "FAILED", _("Failed")
+
+
+# A job in these states still owns its task; a task has at most one
+ACTIVE_JOB_STATUSES = [JOB_STATUS.QUEUED, JOB_STATUS.RUNNING]
+
+
+class Job(NBaseModel):
+    """A unit of background work picked up by the job workers."""
+
+    kind = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=JOB_STATUS.choices,
+        default=JOB_STATUS.QUEUED,
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+
+    # Visibility timeout: a RUNNING job whose lease has expired belongs to a dead worker
+    available_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    worker_id = models.CharField(max_length=200, null=True, blank=True)
+
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="core_job_status_avail_idx"),
+            models.Index(fields=["status", "leased_until"], name="core_job_status_lease_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["task"],
+                condition=models.Q(status__in=ACTIVE_JOB_STATUSES),
+                name="core_job_one_active_per_task",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in (JOB_STATUS.QUEUED, JOB_STATUS.RUNNING)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -49,17 +49,28 @@ class Organization(NBaseModel):
             invitation_accepted=True
         ).exists()
 
-    def reset_usage_if_needed(self):
+    @classmethod
+    def resolve_plan(cls, subscription):
+        """(plan, plan limits, plan display name) for a subscription from StripeService.get_subscription_by_email"""
+        # Use appropriate plan based on subscription
+        if subscription['status'] == 'active' and subscription['plan'] in settings.SUBSCRIPTION_PLANS:
+            plan = subscription['plan']
+        else:
+            plan = 'free'
+        return plan, cls.get_plan_limits(plan), settings.SUBSCRIPTION_PLAN_NAMES.get(plan, 'Free')
+
+    def get_subscription(self):
+        """The owner's subscription (cached by StripeService)"""
+        return StripeService().get_subscription_by_email(self.owner.email)
+
+    def reset_usage_if_needed(self, subscription=None):
         """Reset usage counters if we're in a new billing cycle"""
         now = timezone.now()
-        stripe_service = StripeService()
-        
-        # Get current subscription period
-        subscription_info = stripe_service.get_subscription_info_by_email(self.owner.email)
-        
-        if subscription_info:
-            current_period_start = subscription_info['current_period_start']
-            current_period_end = subscription_info['current_period_end']
+        subscription = subscription or self.get_subscription()
+
+        if subscription['status'] == 'active':
+            current_period_start = subscription['current_period_start']
+            current_period_end = subscription['current_period_end']
             
             # If we have new period dates and they're different from stored ones
             if (current_period_start != self.subscription_current_period_start or 
@@ -98,113 +109,109 @@ class Organization(NBaseModel):
                     'subscription_current_period_end'
                 ])
 
-    def can_process_pdf(self):
-        """Check if organization can process more PDFs based on subscription plan"""
-        self.reset_usage_if_needed()
-        
-        stripe_service = StripeService()
-        subscription_status = stripe_service.get_subscription_status_by_email(self.owner.email)
-        subscription_type = stripe_service.get_subscription_type_by_email(self.owner.email)
-        
-        # Use appropriate plan based on subscription
-        if subscription_status == 'active':
-            plan = subscription_type if subscription_type in settings.SUBSCRIPTION_PLANS else 'free'
-        else:
-            plan = 'free'
-            
-        plan_limits = self.get_plan_limits(plan)
-        plan_name = settings.SUBSCRIPTION_PLAN_NAMES.get(plan, 'Free')
-        
-        if self.pdfs_processed_this_month >= plan_limits['max_pdfs_per_month']:
-            raise ValidationError(
-                f"Organization has reached the maximum PDF processing limit of {plan_limits['max_pdfs_per_month']} "
-                f"for the {plan_name} plan this month"
-            )
-        return True
-
-    def can_process_video(self, size_in_gb):
-        """Check if organization can process more video based on subscription plan"""
-        self.reset_usage_if_needed()
-        
-        stripe_service = StripeService()
-        subscription_status = stripe_service.get_subscription_status_by_email(self.owner.email)
-        subscription_type = stripe_service.get_subscription_type_by_email(self.owner.email)
-        
-        # Use appropriate plan based on subscription
-        if subscription_status == 'active':
-            plan = subscription_type if subscription_type in settings.SUBSCRIPTION_PLANS else 'free'
-        else:
-            plan = 'free'
-            
-        plan_limits = self.get_plan_limits(plan)
-        plan_name = settings.SUBSCRIPTION_PLAN_NAMES.get(plan, 'Free')
-            
-        if self.video_gb_processed_this_month + size_in_gb > plan_limits['max_video_gb_per_month']:
+    def _check_limits(self, plan_limits, plan_name, pdfs=0, video_gb=0.0, audio_gb=0.0):
+        if pdfs:
+            if self.pdfs_processed_this_month >= plan_limits['max_pdfs_per_month']:
+                raise ValidationError(
+                    f"Organization has reached the maximum PDF processing limit of {plan_limits['max_pdfs_per_month']} "
+                    f"for the {plan_name} plan this month"
+                )
+            if self.pdfs_processed_this_month + pdfs > plan_limits['max_pdfs_per_month']:
+                raise ValidationError(
+                    f"Processing {pdfs} PDFs would exceed the {plan_limits['max_pdfs_per_month']} PDF "
+                    f"monthly limit for the {plan_name} plan. "
+                    f"Current usage: {self.pdfs_processed_this_month} PDFs"
+                )
+        if video_gb and self.video_gb_processed_this_month + video_gb > plan_limits['max_video_gb_per_month']:
             raise ValidationError(
                 f"Processing this video would exceed the {plan_limits['max_video_gb_per_month']}GB "
                 f"monthly limit for the {plan_name} plan. "
                 f"Current usage: {self.video_gb_processed_this_month:.2f}GB"
             )
-        return True
-
-    def can_process_audio(self, size_in_gb):
-        """Check if organization can process more audio based on subscription plan"""
-        self.reset_usage_if_needed()
-        
-        stripe_service = StripeService()
-        subscription_status = stripe_service.get_subscription_status_by_email(self.owner.email)
-        subscription_type = stripe_service.get_subscription_type_by_email(self.owner.email)
-        
-        # Use appropriate plan based on subscription
-        if subscription_status == 'active':
-            plan = subscription_type if subscription_type in settings.SUBSCRIPTION_PLANS else 'free'
-        else:
-            plan = 'free'
-            
-        plan_limits = self.get_plan_limits(plan)
-        plan_name = settings.SUBSCRIPTION_PLAN_NAMES.get(plan, 'Free')
-            
-        if self.audio_gb_processed_this_month + size_in_gb > plan_limits['max_audio_gb_per_month']:
+        if audio_gb and self.audio_gb_processed_this_month + audio_gb > plan_limits['max_audio_gb_per_month']:
             raise ValidationError(
                 f"Processing this audio would exceed the {plan_limits['max_audio_gb_per_month']}GB "
                 f"monthly limit for the {plan_name} plan. "
                 f"Current usage: {self.audio_gb_processed_this_month:.2f}GB"
             )
+
+    def check_usage(self, pdfs=0, video_gb=0.0, audio_gb=0.0):
+        """Check a whole task's usage against the plan limits, resolving the plan once"""
+        subscription = self.get_subscription()
+        self.reset_usage_if_needed(subscription)
+        plan, plan_limits, plan_name = self.resolve_plan(subscription)
+        self._check_limits(plan_limits, plan_name, pdfs, video_gb, audio_gb)
         return True
 
+    def reserve_usage(self, task=None, pdfs=0, video_gb=0.0, audio_gb=0.0):
+        """Check and charge a whole task's usage atomically; returns a UsageReservation.
+
+        The organization row is locked while the limits are checked and the counters
+        incremented, so concurrent tasks cannot both pass the check and overshoot. Commit
+        the reservation when the task succeeds, release it to give the usage back.
+        """
+        from apps.core.models.usage_reservation import UsageReservation
+
+        # Resolve the plan before taking the lock, so no Stripe call happens while it is held
+        subscription = self.get_subscription()
+        plan, plan_limits, plan_name = self.resolve_plan(subscription)
+
+        with transaction.atomic():
+            locked = Organization.objects.select_for_update().get(pk=self.pk)
+            locked.reset_usage_if_needed(subscription)
+            locked._check_limits(plan_limits, plan_name, pdfs, video_gb, audio_gb)
+            locked.add_usage(pdfs, video_gb, audio_gb)
+            reservation = UsageReservation.objects.create(
+                organization=self, task=task, pdfs=pdfs, video_gb=video_gb, audio_gb=audio_gb
+            )
+
+        self.refresh_from_db(fields=[
+            'pdfs_processed_this_month', 'video_gb_processed_this_month', 'audio_gb_processed_this_month',
+            'usage_reset_date', 'subscription_current_period_start', 'subscription_current_period_end'
+        ])
+        return reservation
+
+    def add_usage(self, pdfs=0, video_gb=0.0, audio_gb=0.0):
+        """Add a whole task's usage in one update"""
+        Organization.objects.filter(pk=self.pk).update(
+            pdfs_processed_this_month=models.F('pdfs_processed_this_month') + pdfs,
+            video_gb_processed_this_month=models.F('video_gb_processed_this_month') + video_gb,
+            audio_gb_processed_this_month=models.F('audio_gb_processed_this_month') + audio_gb,
+        )
+        self.refresh_from_db(fields=[
+            'pdfs_processed_this_month', 'video_gb_processed_this_month', 'audio_gb_processed_this_month'
+        ])
+
+    def can_process_pdf(self):
+        """Check if organization can process more PDFs based on subscription plan"""
+        return self.check_usage(pdfs=1)
+
+    def can_process_video(self, size_in_gb):
+        """Check if organization can process more video based on subscription plan"""
+        return self.check_usage(video_gb=size_in_gb)
+
+    def can_process_audio(self, size_in_gb):
+        """Check if organization can process more audio based on subscription plan"""
+        return self.check_usage(audio_gb=size_in_gb)
+
     def increment_pdf_count(self):
         """Increment the PDF processing count"""
         self.reset_usage_if_needed()
-        self.pdfs_processed_this_month += 1
-        self.save(update_fields=['pdfs_processed_this_month'])
+        self.add_usage(pdfs=1)
 
     def add_video_usage(self, size_in_gb):
         """Add to the video processing usage"""
         self.reset_usage_if_needed()
-        self.video_gb_processed_this_month += size_in_gb
-        self.save(update_fields=['video_gb_processed_this_month'])
+        self.add_usage(video_gb=size_in_gb)
 
     def add_audio_usage(self, size_in_gb):
         """Add to the audio processing usage"""
         self.reset_usage_if_needed()
-        self.audio_gb_processed_this_month += size_in_gb
-        self.save(update_fields=['audio_gb_processed_this_month'])
+        self.add_usage(audio_gb=size_in_gb)
 
     def can_add_member(self):
         """Check if organization can add more members based on subscription plan"""
-        # Check Stripe subscription status
-        stripe_service = StripeService()
-        subscription_status = stripe_service.get_subscription_status_by_email(self.owner.email)
-        subscription_type = stripe_service.get_subscription_type_by_email(self.owner.email)
-        
-        # Use appropriate plan based on subscription
-        if subscription_status == 'active':
-            plan = subscription_type if subscription_type in settings.SUBSCRIPTION_PLANS else 'free'
-        else:
-            plan = 'free'
-            
-        plan_limits = self.get_plan_limits(plan)
-        plan_name = settings.SUBSCRIPTION_PLAN_NAMES.get(plan, 'Free')
+        plan, plan_limits, plan_name = self.resolve_plan(self.get_subscription())
         
         # Count both accepted members and pending invites
         total_member_count = self.members.count()  # This includes both accepted and pending
@@ -219,19 +226,7 @@ class Organization(NBaseModel):
     @classmethod
     def can_create_organization(cls, user):
         """Check if user can create more organizations based on subscription plan"""
-        # Check Stripe subscription status
-        stripe_service = StripeService()
-        subscription_status = stripe_service.get_subscription_status_by_email(user.email)
-        subscription_type = stripe_service.get_subscription_type_by_email(user.email)
-        
-        # Use appropriate plan based on subscription
-        if subscription_status == 'active':
-            plan = subscription_type if subscription_type in settings.SUBSCRIPTION_PLANS else 'free'
-        else:
-            plan = 'free'
-            
-        plan_limits = cls.get_plan_limits(plan)
-        plan_name = settings.SUBSCRIPTION_PLAN_NAMES.get(plan, 'Free')
+        plan, plan_limits, plan_name = cls.resolve_plan(StripeService().get_subscription_by_email(user.email))
         
         # Count organizations (excluding personal)
         current_org_count = Organization.objects.filter(
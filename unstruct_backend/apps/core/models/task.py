@@ -1,12 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
-from django.db.models import JSONField
-from django.utils import timezone
+from django.db.models import JSONField, F, Window
+from django.db.models.functions import RowNumber
 import json
 
 from apps.common.models import NBaseWithOwnerModel
 
-from .action import Action
+from .action import ACTION_TYPE, Action
 from .asset import Asset
 from .project import Project
 
@@ -45,51 +45,99 @@ class Task(NBaseWithOwnerModel):
     )
     description = models.TextField(null=True, blank=True)
     result_file_url = models.URLField(max_length=2000, blank=True, null=True)
+    # Storage key prefix of the last run's result files (.csv, .ndjson, .parquet, .manifest.json)
+    results_prefix = models.CharField(max_length=500, blank=True, null=True)
     
-    # Store process results
+    # Preview of the results (see get_process_results); full results are TaskResult rows
     process_results = models.TextField(default='[]', blank=True)
     total_files = models.IntegerField(default=0)
     processed_files = models.IntegerField(default=0)
     failed_files = models.IntegerField(default=0)
+    downloaded_bytes = models.BigIntegerField(default=0)
+    # LLM calls of the last run answered from the completion cache, and calls that went to the provider
+    llm_cache_hits = models.IntegerField(default=0)
+    llm_cache_misses = models.IntegerField(default=0)
     
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # Set by TaskProcessor while the task runs: receives each asset's result rows once stored
+    result_sink = None
+
     def __str__(self):
         return self.name
         
-    def add_process_result(self, source_type, source_path, status, asset=None, error=None, result_data=None):
-        """Add a process result to the task"""
-        result = {
-            'source_type': source_type,
-            'source_path': source_path,
-            'status': status,
-            'timestamp': timezone.now().isoformat(),
-            'result_data': result_data
-        }
-        
-        if asset:
-            result['asset_id'] = str(asset.id)
-            result['asset_name'] = asset.name
-            
-        if error:
-            result['error'] = str(error)
-            
+    def record_file_result(self, failed=False):
+        """Atomically count one finished file, so concurrent workers never lose updates"""
+        Task.objects.filter(pk=self.pk).update(
+            processed_files=F('processed_files') + 1,
+            failed_files=F('failed_files') + (1 if failed else 0),
+        )
+
+    def record_asset_results(self, asset, position, responses, failed=False):
+        """Store one finished asset's (action, parsed response) pairs and count the asset.
+
+        Rows are inserted in a single statement and the counters move with F() expressions in
+        the same transaction, so workers finishing assets of the same task never lose updates.
+        """
+        from .task_result import TaskResult
+
+        rows = [
+            TaskResult.from_response(self, action, response, asset=asset, position=position)
+            for action, response in responses
+        ]
+        with transaction.atomic():
+            TaskResult.objects.bulk_create(rows)
+            self.record_file_result(failed=failed)
+        if self.result_sink:
+            self.result_sink.write_rows(rows)
+
+    def record_generations(self, responses):
+        """Store the (action, generated content) pairs of a task"""
+        from .task_result import TaskResult
+
+        TaskResult.objects.bulk_create([
+            TaskResult.from_response(self, action, content) for action, content in responses
+        ])
+
+    def clear_results(self):
+        """Remove the results of a previous run before the task is processed again"""
+        from .task_result import TaskResult
+
+        TaskResult.all_objects.filter(task=self).delete()
+
+    def get_process_results(self, limit=None):
+        """Results in the process_results JSON shape, built from the task's result rows.
+
+        {"extractions": {field: [{"asset", "data", "source"}, ...]}, "generations": {field: content}},
+        with at most `limit` extraction items per field. Tasks processed before results were
+        stored as rows fall back to the saved process_results.
+        """
+        rows = self.results.order_by("position", "created_at")
+        if limit:
+            rows = rows.annotate(
+                rank=Window(RowNumber(), partition_by=[F("field_name")], order_by=[F("position"), F("created_at")])
+            ).filter(rank__lte=limit)
+
+        results = {}
+        for row in rows:
+            if row.action_type == ACTION_TYPE.GENERATION:
+                results.setdefault("generations", {})[row.field_name] = row.value
+            else:
+                results.setdefault("extractions", {}).setdefault(row.field_name, []).append(row.as_item())
+        if results:
+            return results
+
         try:
-            current_results = json.loads(self.process_results)
+            return json.loads(self.process_results or "[]")
         except (json.JSONDecodeError, TypeError):
-            current_results = []
-            
-        current_results.append(result)
-        self.process_results = json.dumps(current_results)
-            
-        # Update counters
-        self.processed_files += 1
-        if status == 'error':
-            self.failed_files += 1
-            
-        self.save()
-        
+            return []
+
+    def record_download_progress(self, nbytes):
+        """Atomically add bytes received while downloading the task's assets"""
+        if nbytes:
+            Task.objects.filter(pk=self.pk).update(downloaded_bytes=F('downloaded_bytes') + nbytes)
+
     def set_total_files(self, count):
         """Set the total number of files to be processed"""
         self.total_files = count
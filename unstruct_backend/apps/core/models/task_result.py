@@ -0,0 +1,97 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from apps.common.models import NBaseModel
+
+from .action import ACTION_TYPE, Action
+from .asset import Asset
+from .task import Task
+
+
+class TASK_RESULT_STATUS(models.TextChoices):
+    SUCCESS = "SUCCESS", _("Success")
+    ERROR = "ERROR", _("Error")
+
+
+class TaskResult(NBaseModel):
+    """The output of one action for one asset of a task.
+
+    Generations are not tied to an asset and have `asset` unset. `position` is the asset's
+    index in the task, so results read back in asset order whatever order they finished in.
+    """
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="results")
+    asset = models.ForeignKey(Asset, on_delete=models.SET_NULL, null=True, blank=True, related_name="task_results")
+    action = models.ForeignKey(Action, on_delete=models.SET_NULL, null=True, blank=True, related_name="task_results")
+    action_type = models.CharField(max_length=200, choices=ACTION_TYPE.choices, default=ACTION_TYPE.EXTRACTION)
+    # Snapshots, so results stay readable after the asset or action is edited or deleted
+    field_name = models.CharField(max_length=200)
+    asset_name = models.CharField(max_length=200, blank=True, default="")
+    source = models.URLField(max_length=500, blank=True, default="")
+    position = models.IntegerField(default=0)
+
+    status = models.CharField(max_length=20, choices=TASK_RESULT_STATUS.choices, default=TASK_RESULT_STATUS.SUCCESS)
+    value = models.JSONField(null=True, blank=True)
+    confidence = models.FloatField(null=True, blank=True)
+    reference = models.TextField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    # Any other keys the model returned alongside the value
+    extra = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ["position", "created_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["task", "asset", "action"], name="core_taskresult_task_asset_action_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["task", "action_type", "position"], name="core_taskresult_task_type_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.field_name} ({self.status})"
+
+    @classmethod
+    def from_response(cls, task, action, response, asset=None, position=0):
+        """Build an unsaved row from a parsed model response ({field, field_confidence, field_reference} or {error})"""
+        field_name = action.output_column_name
+        extra = dict(response) if isinstance(response, dict) else {field_name: response}
+        error = extra.pop("error", None)
+        confidence = extra.pop(f"{field_name}_confidence", None)
+        try:
+            confidence = float(confidence) if confidence is not None else None
+        except (TypeError, ValueError):
+            extra[f"{field_name}_confidence"] = confidence
+            confidence = None
+        reference = extra.pop(f"{field_name}_reference", None)
+        return cls(
+            task=task,
+            asset=asset,
+            action=action,
+            action_type=action.action_type,
+            field_name=field_name,
+            asset_name=asset.name if asset else "",
+            source=asset.url if asset else "",
+            position=position,
+            status=TASK_RESULT_STATUS.ERROR if error else TASK_RESULT_STATUS.SUCCESS,
+            value=extra.pop(field_name, None),
+            confidence=confidence,
+            reference=str(reference) if reference is not None else None,
+            error=str(error) if error else None,
+            extra=extra,
+            organization_id=task.organization_id,
+        )
+
+    def as_data(self):
+        """The parsed response this row was built from"""
+        if self.status == TASK_RESULT_STATUS.ERROR:
+            return {"error": self.error, **self.extra}
+        return {
+            self.field_name: self.value,
+            f"{self.field_name}_confidence": self.confidence,
+            f"{self.field_name}_reference": self.reference,
+            **self.extra,
+        }
+
+    def as_item(self):
+        """The entry for this row in Task.process_results"""
+        return {"asset": self.asset_name, "data": self.as_data(), "source": self.source}
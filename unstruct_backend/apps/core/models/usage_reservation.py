@@ -0,0 +1,70 @@
+from django.db import models, transaction
+from django.utils.translation import gettext_lazy as _
+
+from apps.common.models import NBaseModel
+
+from .organization import Organization
+from .task import Task
+
+
+class RESERVATION_STATUS(models.TextChoices):
+    RESERVED = "RESERVED", _("Reserved")
+    COMMITTED = "COMMITTED", _("Committed")
+    RELEASED = "RELEASED", _("Released")
+
+
+class UsageReservation(NBaseModel):
+    """Usage charged to an organization for one run of a task.
+
+    Created by Organization.reserve_usage, which adds the amounts to the organization's
+    counters up front. The run then commits it, or releases it to give the usage back.
+    """
+
+    task = models.ForeignKey(Task, on_delete=models.SET_NULL, null=True, blank=True, related_name="usage_reservations")
+    status = models.CharField(max_length=20, choices=RESERVATION_STATUS.choices, default=RESERVATION_STATUS.RESERVED)
+    pdfs = models.IntegerField(default=0)
+    video_gb = models.FloatField(default=0.0)
+    audio_gb = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["task", "status"], name="core_usagereserv_task_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pdfs} PDFs, {self.video_gb:.2f}GB video, {self.audio_gb:.2f}GB audio ({self.status})"
+
+    def commit(self):
+        """Keep the reserved usage; returns False if the reservation was already settled"""
+        updated = UsageReservation.objects.filter(id=self.id, status=RESERVATION_STATUS.RESERVED).update(
+            status=RESERVATION_STATUS.COMMITTED
+        )
+        if updated:
+            self.status = RESERVATION_STATUS.COMMITTED
+        return bool(updated)
+
+    def release(self):
+        """Give the reserved usage back; returns False if the reservation was already settled"""
+        with transaction.atomic():
+            updated = UsageReservation.objects.filter(id=self.id, status=RESERVATION_STATUS.RESERVED).update(
+                status=RESERVATION_STATUS.RELEASED
+            )
+            if updated:
+                # Counters reset since the reservation no longer include it
+                Organization.objects.filter(id=self.organization_id, usage_reset_date__lte=self.created_at).update(
+                    pdfs_processed_this_month=models.F("pdfs_processed_this_month") - self.pdfs,
+                    video_gb_processed_this_month=models.F("video_gb_processed_this_month") - self.video_gb,
+                    audio_gb_processed_this_month=models.F("audio_gb_processed_this_month") - self.audio_gb,
+                )
+        if updated:
+            self.status = RESERVATION_STATUS.RELEASED
+        return bool(updated)
+
+    @classmethod
+    def settle(cls, reservation_id, success):
+        """Commit or release a reservation by id, for job handlers; unknown ids are ignored"""
+        reservation = cls.objects.filter(id=reservation_id).first() if reservation_id else None
+        if reservation is None:
+            return False
+        return reservation.commit() if success else reservation.release()
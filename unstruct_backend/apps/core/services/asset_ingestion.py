@@ -0,0 +1,175 @@
+import logging
+from typing import Callable, Dict, Iterable, List
+
+from django.conf import settings
+
+from apps.common.utils.dropbox_utils import DropboxService
+from apps.common.utils.gdrive_utils import GoogleDriveService
+from apps.common.utils.s3_utils import S3Service
+from apps.core.models import Asset, Job, Project
+from apps.core.models.asset import ASSET_UPLOAD_SOURCE, file_type_from_name
+from apps.core.services.job_queue import job_secrets
+
+logger = logging.getLogger(__name__)
+
+# Job kind handled by ingest_assets_job
+INGEST_ASSETS = "ingest_assets"
+# Payload fields holding source credentials; they are enqueued as job secrets, never in the payload
+CREDENTIAL_FIELDS = ("aws_credentials", "service_account_info", "access_token")
+
+
+def _s3_files(payload: Dict) -> Iterable[Dict]:
+    service = S3Service(payload.get("aws_credentials"))
+    service.authenticate()
+    bucket = payload["bucket"]
+    for key in payload.get("keys") or []:
+        yield service.get_file_by_key(bucket, key)
+    if payload.get("prefix"):
+        yield from service.list_files_concurrently(
+            bucket, payload["prefix"], payload.get("recursive", True), settings.ASSET_INGEST_LIST_CONCURRENCY
+        )
+
+
+def _s3_asset(info: Dict, payload: Dict) -> Asset:
+    return Asset(
+        name=info["name"],
+        description=f"S3 file: {info['name']}",
+        upload_source=ASSET_UPLOAD_SOURCE.AWS_S3,
+        file_type=file_type_from_name(info["name"]),
+        size=str(info["size"]) if info.get("size") is not None else None,
+        source_file_id=info["id"],
+        source_credentials=payload.get("aws_credentials"),
+        metadata={"bucket": payload["bucket"]},
+    )
+
+
+def _gdrive_files(payload: Dict) -> Iterable[Dict]:
+    service = GoogleDriveService(credentials_info=payload["service_account_info"])
+    service.authenticate()
+    yield from service.get_files_by_ids(payload.get("file_ids") or [])
+    if payload.get("folder_id"):
+        yield from service.list_folder_tree(
+            payload["folder_id"], payload.get("recursive", True), settings.ASSET_INGEST_LIST_CONCURRENCY
+        )
+
+
+def _gdrive_asset(info: Dict, payload: Dict) -> Asset:
+    return Asset(
+        name=info["name"],
+        description=f"Google Drive file: {info['name']}",
+        upload_source=ASSET_UPLOAD_SOURCE.GOOGLE_DRIVE,
+        file_type=file_type_from_name(info["name"]),
+        mime_type=info.get("mimeType") or info.get("mime_type"),
+        size=info.get("size"),
+        source_file_id=info["id"],
+        source_credentials=payload["service_account_info"],
+    )
+
+
+def _dropbox_files(payload: Dict) -> Iterable[Dict]:
+    service = DropboxService(payload["access_token"])
+    service.authenticate()
+    for path in payload.get("paths") or []:
+        yield {**service.get_file_by_id(path), "id": path}
+    if payload.get("folder_path") is not None:
+        # Dropbox walks the tree server-side and pages through it with one cursor
+        yield from service.list_folder_contents(payload["folder_path"], payload.get("recursive", True))
+
+
+def _dropbox_asset(info: Dict, payload: Dict) -> Asset:
+    return Asset(
+        name=info["name"],
+        description=f"Dropbox file: {info['name']}",
+        upload_source=ASSET_UPLOAD_SOURCE.DROPBOX,
+        file_type=file_type_from_name(info["name"]),
+        mime_type=info.get("mime_type"),
+        size=str(info["size"]) if info.get("size") is not None else None,
+        source_file_id=info["id"],
+        source_credentials=payload["access_token"],
+    )
+
+
+# Per source: a generator of file infos (each with a unique "id") and a function building an unsaved Asset
+SOURCES = {
+    ASSET_UPLOAD_SOURCE.AWS_S3: (_s3_files, _s3_asset),
+    ASSET_UPLOAD_SOURCE.GOOGLE_DRIVE: (_gdrive_files, _gdrive_asset),
+    ASSET_UPLOAD_SOURCE.DROPBOX: (_dropbox_files, _dropbox_asset),
+}
+
+
+class AssetIngestion:
+    """Creates a project's assets from a listing of source files, in bulk batches.
+
+    Files whose id is already an asset of the project from the same source are skipped,
+    so an interrupted ingestion can simply run again. `on_progress` is called with the
+    counts after every batch.
+    """
+
+    def __init__(self, project: Project, upload_source: str, user=None, batch_size: int = None,
+                 on_progress: Callable[[Dict], None] = None):
+        self.project = project
+        self.upload_source = upload_source
+        self.user = user
+        self.batch_size = batch_size or settings.ASSET_INGEST_BATCH_SIZE
+        self.on_progress = on_progress
+        self.progress = {"listed": 0, "created": 0, "skipped": 0}
+        self._seen = set()
+
+    def run(self, files: Iterable[Dict], build_asset: Callable[[Dict], Asset]) -> Dict:
+        batch = []
+        for info in files:
+            self.progress["listed"] += 1
+            if info["id"] in self._seen:
+                self.progress["skipped"] += 1
+                continue
+            self._seen.add(info["id"])
+            batch.append(info)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, build_asset)
+                batch = []
+        self._flush(batch, build_asset)
+        return self.progress
+
+    def _flush(self, batch: List[Dict], build_asset: Callable[[Dict], Asset]):
+        if batch:
+            existing = set(
+                Asset.objects.filter(
+                    project=self.project,
+                    upload_source=self.upload_source,
+                    source_file_id__in=[info["id"] for info in batch],
+                ).values_list("source_file_id", flat=True)
+            )
+            assets = []
+            for info in batch:
+                if info["id"] in existing:
+                    continue
+                asset = build_asset(info)
+                asset.project = self.project
+                asset.organization_id = self.project.organization_id
+                asset.owner = asset.created_by = asset.updated_by = self.user
+                assets.append(asset)
+            Asset.objects.bulk_create(assets, batch_size=self.batch_size)
+            self.progress["created"] += len(assets)
+            self.progress["skipped"] += len(batch) - len(assets)
+        if self.on_progress:
+            self.on_progress(dict(self.progress))
+
+
+def ingest_assets_job(job):
+    """Job handler that lists a source and creates the project's assets, recording counts as job progress"""
+    payload = {**job.payload, **job_secrets(job)}
+    upload_source = payload["upload_source"]
+    if upload_source not in SOURCES:
+        raise ValueError(f"Unsupported upload source for ingestion: {upload_source}")
+    list_files, build_asset = SOURCES[upload_source]
+    project = Project.objects.get(id=payload["project_id"])
+
+    def record_progress(progress):
+        # Also kept on the job object so worker heartbeats do not overwrite it with stale counts
+        job.progress = progress
+        Job.objects.filter(id=job.id).update(progress=progress)
+
+    ingestion = AssetIngestion(project, upload_source, user=job.created_by, on_progress=record_progress)
+    progress = ingestion.run(list_files(payload), lambda info: build_asset(info, payload))
+    logger.info(f"Ingested assets into project {project.id} from {upload_source}: {progress}")
+    return progress
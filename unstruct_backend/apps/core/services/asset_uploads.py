@@ -0,0 +1,307 @@
+import hashlib
+import logging
+import math
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from apps.common.utils.s3_clients import get_s3_client, get_transfer_config
+from apps.core.models import Asset, Project
+from apps.core.models.asset import ASSET_UPLOAD_SOURCE, file_type_from_name
+
+logger = logging.getLogger(__name__)
+
+# S3 multipart limits: parts of at least 5 MiB (except the last) and at most 10,000 parts
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10_000
+# Salt of upload and part tokens, so they cannot be replayed as other signed values
+UPLOAD_TOKEN_SALT = "apps.core.asset_uploads"
+# Uploads completed against the storage at once when a batch is registered
+COMPLETE_CONCURRENCY = 8
+# Bytes copied at a time when streaming parts and files to local storage
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """An upload token or part list the client sent is not valid"""
+
+
+class S3UploadStorage:
+    """Uploads go from the client straight to AWS_STORAGE_BUCKET_NAME through presigned part URLs"""
+
+    def __init__(self, bucket: str, region: str):
+        self.bucket = bucket
+        self.region = region
+        self.client = get_s3_client(region)
+
+    def start(self, key: str, content_type: str) -> str:
+        return self.client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)["UploadId"]
+
+    def part_urls(self, key: str, upload_id: str, part_count: int) -> List[str]:
+        return [
+            self.client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": self.bucket, "Key": key, "UploadId": upload_id, "PartNumber": number},
+                ExpiresIn=settings.ASSET_UPLOAD_URL_EXPIRY,
+            )
+            for number in range(1, part_count + 1)
+        ]
+
+    def complete(self, key: str, upload_id: str, parts: List[Dict]) -> Dict:
+        """Assemble the uploaded parts; returns the object's size and ETag"""
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": p["part_number"], "ETag": p["etag"]} for p in parts]},
+            )
+        except ClientError as e:
+            # NoSuchUpload, InvalidPart, InvalidPartOrder, EntityTooSmall: the client sent a bad completion
+            raise UploadError(f"Upload of {os.path.basename(key)} could not be completed: {e.response['Error']['Code']}")
+        head = self.client.head_object(Bucket=self.bucket, Key=key)
+        return {"size": head["ContentLength"], "etag": head["ETag"].strip('"')}
+
+    def abort(self, key: str, upload_id: str):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str):
+        # upload_fileobj streams large files in multipart parts itself
+        self.client.upload_fileobj(
+            fileobj, self.bucket, key, ExtraArgs={"ContentType": content_type}, Config=get_transfer_config()
+        )
+
+    def url(self, key: str) -> str:
+        # The form Asset._download_upload parses the key back out of
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+
+class LocalUploadStorage:
+    """Development backend following the S3 multipart protocol, stored under ASSET_UPLOAD_LOCAL_DIR.
+
+    Part URLs point to LocalUploadPartView, which accepts a PUT of the part body and
+    answers with its ETag, as S3 does, so client code is the same for both backends.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _parts_dir(self, upload_id: str) -> str:
+        return os.path.join(self.root, ".multipart", upload_id)
+
+    def _part_path(self, upload_id: str, number: int) -> str:
+        return os.path.join(self._parts_dir(upload_id), str(number))
+
+    def start(self, key: str, content_type: str) -> str:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._parts_dir(upload_id), exist_ok=True)
+        return upload_id
+
+    def part_urls(self, key: str, upload_id: str, part_count: int) -> List[str]:
+        return [
+            reverse("asset_upload_part", kwargs={"token": signing.dumps([upload_id, number], salt=UPLOAD_TOKEN_SALT)})
+            for number in range(1, part_count + 1)
+        ]
+
+    def write_part(self, token: str, stream: BinaryIO) -> str:
+        """Store a part uploaded to a part URL; returns its ETag"""
+        try:
+            upload_id, number = signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=settings.ASSET_UPLOAD_URL_EXPIRY)
+        except signing.BadSignature:
+            raise UploadError("Invalid or expired part URL")
+        if not os.path.isdir(self._parts_dir(upload_id)):
+            raise UploadError("Upload not found")
+        digest = hashlib.md5()
+        path = self._part_path(upload_id, number)
+        with open(f"{path}.tmp", "wb") as f:
+            for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(f"{path}.tmp", path)
+        return digest.hexdigest()
+
+    def complete(self, key: str, upload_id: str, parts: List[Dict]) -> Dict:
+        part_paths = [self._part_path(upload_id, int(part["part_number"])) for part in parts]
+        missing = [part["part_number"] for part, part_path in zip(parts, part_paths) if not os.path.exists(part_path)]
+        if missing:
+            raise UploadError(f"Parts {missing} of {key} were not uploaded")
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Same ETag form as S3 multipart objects: MD5 of the parts' MD5s, then the part count
+        digest = hashlib.md5()
+        with open(path, "wb") as out:
+            for part, part_path in zip(parts, part_paths):
+                with open(part_path, "rb") as f:
+                    shutil.copyfileobj(f, out, COPY_CHUNK_SIZE)
+                digest.update(bytes.fromhex(part["etag"].strip('"')))
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+        return {"size": os.path.getsize(path), "etag": f"{digest.hexdigest()}-{len(parts)}"}
+
+    def abort(self, key: str, upload_id: str):
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
+    def delete(self, key: str):
+        try:
+            os.remove(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+    def put_file(self, key: str, fileobj: BinaryIO, content_type: str):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f, COPY_CHUNK_SIZE)
+
+    def url(self, key: str) -> str:
+        # A local path, which Asset._download_upload returns as is
+        return os.path.join(self.root, key)
+
+
+def get_upload_storage():
+    bucket = getattr(settings, "AWS_STORAGE_BUCKET_NAME", None)
+    if settings.ASSET_UPLOAD_BACKEND == "s3" and bucket:
+        return S3UploadStorage(bucket, settings.AWS_S3_REGION)
+    return LocalUploadStorage(settings.ASSET_UPLOAD_LOCAL_DIR)
+
+
+def upload_key(project: Project, filename: str) -> str:
+    """Storage key of a new upload; the random segment keeps same-named files apart"""
+    return f"uploads/{project.organization_id}/{project.id}/{uuid.uuid4().hex}/{os.path.basename(filename)}"
+
+
+def part_size_for(size: int) -> int:
+    """ASSET_UPLOAD_PART_SIZE, raised for files that would otherwise need more than MAX_PARTS parts"""
+    return max(settings.ASSET_UPLOAD_PART_SIZE, MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+
+class AssetUploads:
+    """Direct-to-storage uploads of a project's files.
+
+    `start` opens a multipart upload per file and returns presigned part URLs with a
+    signed token describing the upload. The client PUTs the parts straight to storage and
+    sends the tokens back with the part ETags to `complete`, which assembles every upload
+    and registers the assets in one bulk insert. File bodies never pass through Django.
+    """
+
+    def __init__(self, project: Project, user=None, storage=None):
+        self.project = project
+        self.user = user
+        self.storage = storage or get_upload_storage()
+
+    def start(self, files: List[Dict]) -> List[Dict]:
+        """Open uploads for files given as {"name", "size", "content_type"} (size validated by the caller)"""
+        uploads = []
+        for file in files:
+            name = os.path.basename(file["name"])
+            size = int(file.get("size") or 0)
+            content_type = file.get("content_type") or "application/octet-stream"
+            key = upload_key(self.project, name)
+            upload_id = self.storage.start(key, content_type)
+            part_size = part_size_for(size)
+            part_count = max(math.ceil(size / part_size), 1)
+            token = signing.dumps(
+                {"project_id": str(self.project.id), "key": key, "upload_id": upload_id,
+                 "name": name, "content_type": content_type},
+                salt=UPLOAD_TOKEN_SALT,
+            )
+            uploads.append({
+                "name": name,
+                "upload_token": token,
+                "part_size": part_size,
+                "part_urls": self.storage.part_urls(key, upload_id, part_count),
+            })
+        return uploads
+
+    def _load(self, token: str) -> Dict:
+        try:
+            upload = signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=settings.ASSET_UPLOAD_URL_EXPIRY)
+        except signing.BadSignature:
+            raise UploadError("Invalid or expired upload token")
+        if upload["project_id"] != str(self.project.id):
+            raise UploadError("Upload token belongs to another project")
+        return upload
+
+    def complete(self, completions: List[Dict]) -> List[Asset]:
+        """Assemble uploads given as {"upload_token", "parts": [{"part_number", "etag"}]} and create their assets"""
+        uploads = []
+        for completion in completions:
+            parts = sorted(completion.get("parts") or [], key=lambda p: int(p["part_number"]))
+            if not parts:
+                raise UploadError("Every upload needs its list of parts")
+            uploads.append((self._load(completion["upload_token"]), parts))
+
+        def _complete(item):
+            upload, parts = item
+            try:
+                return self.storage.complete(upload["key"], upload["upload_id"], parts), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=min(COMPLETE_CONCURRENCY, max(len(uploads), 1))) as executor:
+            results = list(executor.map(_complete, uploads))
+
+        assembled = [upload["key"] for (upload, _), (obj, _) in zip(uploads, results) if obj is not None]
+        errors = [error for _, error in results if error is not None]
+        try:
+            if errors:
+                raise errors[0]
+            return Asset.objects.bulk_create([
+                self._asset(upload["name"], upload["key"], upload["content_type"], obj["size"])
+                for (upload, _), (obj, _) in zip(uploads, results)
+            ])
+        except Exception:
+            # The batch is registered all or nothing; objects nothing will point to are removed
+            self._delete(assembled)
+            raise
+
+    def abort(self, tokens: List[str]):
+        for token in tokens:
+            upload = self._load(token)
+            try:
+                self.storage.abort(upload["key"], upload["upload_id"])
+            except Exception as e:
+                logger.warning(f"Failed to abort upload of {upload['key']}: {e}")
+
+    def _delete(self, keys: List[str]):
+        for key in keys:
+            try:
+                self.storage.delete(key)
+            except Exception as e:
+                logger.warning(f"Failed to delete assembled upload {key}: {e}")
+
+    def put_files(self, files) -> List[Asset]:
+        """Store files posted to Django (the form upload endpoint) and create their assets in one insert"""
+        assets = []
+        for file in files:
+            content_type = getattr(file, "content_type", None) or "application/octet-stream"
+            key = upload_key(self.project, file.name)
+            self.storage.put_file(key, file, content_type)
+            assets.append(self._asset(file.name, key, content_type, file.size))
+        return Asset.objects.bulk_create(assets)
+
+    def _asset(self, name: str, key: str, content_type: str, size: int) -> Asset:
+        return Asset(
+            name=name,
+            description=f"Uploaded file: {name}",
+            project=self.project,
+            organization_id=self.project.organization_id,
+            upload_source=ASSET_UPLOAD_SOURCE.UPLOAD,
+            file_type=file_type_from_name(name),
+            mime_type=content_type,
+            size=str(size) if size is not None else None,
+            url=self.storage.url(key),
+            storage_key=key,
+            owner=self.user,
+            created_by=self.user,
+            updated_by=self.user,
+        )
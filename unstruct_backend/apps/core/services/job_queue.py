@@ -0,0 +1,265 @@
+import base64
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+from apps.core.models.job import ACTIVE_JOB_STATUSES, Job, JOB_STATUS
+from apps.core.models.task import Task, TASK_RUNNING_STATUS
+from apps.core.models.usage_reservation import UsageReservation
+
+logger = logging.getLogger(__name__)
+
+# Payload key holding a job's encrypted secrets, dropped once the job has finished
+SECRETS_KEY = "secrets"
+
+
+class ActiveJobExists(Exception):
+    """The task already has a queued or running job, available as `job`"""
+
+    def __init__(self, job: Job):
+        super().__init__(f"Task {job.task_id} already has an active job {job.id}")
+        self.job = job
+
+
+def _fernet():
+    from cryptography.fernet import Fernet
+
+    key = salted_hmac("apps.core.services.job_queue", "job-secrets", algorithm="sha256").digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def encrypt_secrets(secrets: Dict[str, Any]) -> str:
+    return _fernet().encrypt(json.dumps(secrets).encode("utf-8")).decode("ascii")
+
+
+def job_secrets(job: Job) -> Dict[str, Any]:
+    """The secrets the job was enqueued with (empty once it has finished)"""
+    from cryptography.fernet import InvalidToken
+
+    token = job.payload.get(SECRETS_KEY)
+    if not token:
+        return {}
+    try:
+        return json.loads(_fernet().decrypt(token.encode("ascii")))
+    except InvalidToken:
+        raise ValueError(f"Secrets of job {job.id} cannot be decrypted (was SECRET_KEY rotated?)")
+
+
+def without_secrets(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in payload.items() if key != SECRETS_KEY}
+
+
+class BaseJobBroker(ABC):
+    """Interface every job broker implements so the queue backend can be swapped in settings."""
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: Optional[Dict[str, Any]] = None, task=None,
+                organization=None, user=None, secrets: Optional[Dict[str, Any]] = None) -> Job:
+        """Add a job to the queue and return it.
+
+        `secrets` (credentials the handler needs) are stored encrypted, read back with
+        job_secrets() and cleared when the job succeeds or fails for good.
+        Raises ActiveJobExists if `task` already has a queued or running job.
+        """
+
+    @abstractmethod
+    def claim(self, worker_id: str, limit: int = 1) -> List[Job]:
+        """Lease up to `limit` queued jobs to `worker_id`."""
+
+    @abstractmethod
+    def heartbeat(self, job: Job, worker_id: str) -> bool:
+        """Extend the lease of a running job. Returns False if the worker lost the lease."""
+
+    @abstractmethod
+    def complete(self, job: Job, result: Optional[Dict[str, Any]] = None) -> bool:
+        """Mark a job as succeeded. Returns False if the worker no longer holds the lease."""
+
+    @abstractmethod
+    def fail(self, job: Job, error: str) -> bool:
+        """Record a failed attempt, re-queueing the job if it has attempts left.
+
+        Returns False, recording nothing, if the worker no longer holds the lease.
+        """
+
+    @abstractmethod
+    def requeue_expired(self) -> int:
+        """Re-queue running jobs whose lease expired because their worker died."""
+
+
+class DatabaseJobBroker(BaseJobBroker):
+    """Job broker backed by the `Job` table. Works on both Postgres and SQLite.
+
+    Claims use a conditional UPDATE on the job status, so two workers can never lease
+    the same job even on databases without SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+
+    def __init__(self, visibility_timeout: Optional[int] = None, max_attempts: Optional[int] = None):
+        self.visibility_timeout = visibility_timeout or settings.JOB_VISIBILITY_TIMEOUT
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+
+    def _lease_expiry(self):
+        return timezone.now() + timedelta(seconds=self.visibility_timeout)
+
+    def enqueue(self, kind, payload=None, task=None, organization=None, user=None, secrets=None):
+        payload = dict(payload or {})
+        if secrets:
+            payload[SECRETS_KEY] = encrypt_secrets(secrets)
+        try:
+            # The core_job_one_active_per_task constraint settles concurrent enqueues for one task
+            with transaction.atomic():
+                job = Job.objects.create(
+                    kind=kind,
+                    payload=payload,
+                    task=task,
+                    organization=organization,
+                    created_by=user,
+                    updated_by=user,
+                    max_attempts=self.max_attempts,
+                )
+        except IntegrityError:
+            active = Job.objects.filter(task=task, status__in=ACTIVE_JOB_STATUSES).first() if task else None
+            if active is None:
+                raise
+            raise ActiveJobExists(active)
+        logger.info(f"Enqueued job {job.id} of kind {kind}")
+        return job
+
+    def claim(self, worker_id, limit=1):
+        now = timezone.now()
+        claimed = []
+        with transaction.atomic():
+            candidates = list(
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status=JOB_STATUS.QUEUED, available_at__lte=now)
+                .order_by("available_at", "created_at")
+                .values_list("id", flat=True)[:limit]
+            )
+            for job_id in candidates:
+                updated = Job.objects.filter(id=job_id, status=JOB_STATUS.QUEUED).update(
+                    status=JOB_STATUS.RUNNING,
+                    worker_id=worker_id,
+                    leased_until=self._lease_expiry(),
+                    started_at=now,
+                    updated_at=now,
+                )
+                if updated:
+                    claimed.append(job_id)
+        return list(Job.objects.filter(id__in=claimed).select_related("task"))
+
+    def heartbeat(self, job, worker_id):
+        updated = Job.objects.filter(id=job.id, status=JOB_STATUS.RUNNING, worker_id=worker_id).update(
+            leased_until=self._lease_expiry(),
+            progress=job.progress,
+            updated_at=timezone.now(),
+        )
+        return bool(updated)
+
+    def _leased(self, job):
+        """The job's row while it is still leased to the claim `job` was returned by"""
+        # started_at is set by every claim, so it also tells a re-lease to the same worker apart
+        return Job.objects.filter(
+            id=job.id, status=JOB_STATUS.RUNNING, worker_id=job.worker_id, started_at=job.started_at
+        )
+
+    def complete(self, job, result=None):
+        now = timezone.now()
+        updated = self._leased(job).update(
+            status=JOB_STATUS.SUCCEEDED,
+            payload=without_secrets(job.payload),
+            result=result,
+            error=None,
+            leased_until=None,
+            completed_at=now,
+            updated_at=now,
+        )
+        if not updated:
+            logger.warning(f"Worker {job.worker_id} lost the lease on job {job.id}; its result was discarded")
+        return bool(updated)
+
+    def fail(self, job, error):
+        now = timezone.now()
+        with transaction.atomic():
+            leased = self._leased(job).select_for_update().first()
+            if leased is None:
+                logger.warning(f"Worker {job.worker_id} lost the lease on job {job.id}; its failure was discarded")
+                return False
+            job = leased
+            job.attempts += 1
+            job.error = error
+            job.leased_until = None
+            if job.attempts < job.max_attempts:
+                # Back off linearly so a flapping dependency is not hammered
+                job.status = JOB_STATUS.QUEUED
+                job.available_at = now + timedelta(seconds=settings.JOB_RETRY_DELAY * job.attempts)
+                logger.warning(f"Job {job.id} failed (attempt {job.attempts}/{job.max_attempts}), re-queued: {error}")
+            else:
+                job.status = JOB_STATUS.FAILED
+                job.completed_at = now
+                job.payload = without_secrets(job.payload)
+                logger.error(f"Job {job.id} failed permanently after {job.attempts} attempts: {error}")
+            job.save()
+        if job.status == JOB_STATUS.FAILED:
+            self._mark_task_failed(job)
+        return True
+
+    def requeue_expired(self):
+        now = timezone.now()
+        requeued = 0
+        with transaction.atomic():
+            expired = list(
+                Job.objects.select_for_update(skip_locked=True).filter(
+                    status=JOB_STATUS.RUNNING,
+                    leased_until__lt=now,
+                )
+            )
+            for job in expired:
+                job.attempts += 1
+                job.leased_until = None
+                job.error = f"Lease expired on worker {job.worker_id}"
+                if job.attempts < job.max_attempts:
+                    job.status = JOB_STATUS.QUEUED
+                    job.available_at = now
+                    requeued += 1
+                else:
+                    job.status = JOB_STATUS.FAILED
+                    job.completed_at = now
+                    job.payload = without_secrets(job.payload)
+                job.save()
+        for job in expired:
+            if job.status == JOB_STATUS.FAILED:
+                self._mark_task_failed(job)
+        if expired:
+            logger.warning(f"Recovered {len(expired)} expired job(s), {requeued} re-queued")
+        return requeued
+
+    def _mark_task_failed(self, job):
+        if job.task_id:
+            Task.objects.filter(id=job.task_id).update(
+                status=TASK_RUNNING_STATUS.FAILED,
+                completed_at=timezone.now(),
+            )
+        # Give back the usage reserved for the run
+        UsageReservation.settle(job.payload.get("reservation_id"), success=False)
+
+
+@lru_cache(maxsize=None)
+def get_job_broker() -> BaseJobBroker:
+    """Return the process-wide broker configured by JOB_QUEUE_BROKER."""
+    return import_string(settings.JOB_QUEUE_BROKER)()
+
+
+def get_job_handler(kind: str):
+    """Resolve the callable registered for a job kind in JOB_HANDLERS."""
+    handler_path = settings.JOB_HANDLERS.get(kind)
+    if not handler_path:
+        raise ValueError(f"No job handler registered for kind '{kind}'")
+    return import_string(handler_path)
@@ -0,0 +1,88 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.core.models.job import Job
+from .job_queue import BaseJobBroker, get_job_broker, get_job_handler
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Polls the job broker and runs jobs on a bounded thread pool.
+
+    Running jobs have their lease renewed by a heartbeat thread. If the worker process
+    dies, the lease expires after JOB_VISIBILITY_TIMEOUT seconds and any other worker
+    re-queues the job.
+    """
+
+    def __init__(self, concurrency: int = None, poll_interval: float = None, broker: BaseJobBroker = None):
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_WORKER_POLL_INTERVAL
+        self.broker = broker or get_job_broker()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once: bool = False):
+        logger.info(f"Job worker {self.worker_id} started with concurrency {self.concurrency}")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job-worker") as executor:
+            while not self._stop.is_set():
+                close_old_connections()
+                self.broker.requeue_expired()
+
+                with self._lock:
+                    free_slots = self.concurrency - len(self._running)
+                jobs = self.broker.claim(self.worker_id, limit=free_slots) if free_slots > 0 else []
+                for job in jobs:
+                    with self._lock:
+                        self._running[str(job.id)] = job
+                    executor.submit(self._run_job, job)
+
+                if once and not jobs:
+                    break
+                self._stop.wait(self.poll_interval)
+        self._stop.set()
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+    def _run_job(self, job: Job):
+        logger.info(f"Worker {self.worker_id} running job {job.id} ({job.kind})")
+        try:
+            handler = get_job_handler(job.kind)
+            result = handler(job)
+            self.broker.complete(job, result=result)
+            logger.info(f"Job {job.id} succeeded")
+        except Exception as e:
+            logger.error(f"Job {job.id} raised: {e}\n{traceback.format_exc()}")
+            self.broker.fail(job, str(e))
+        finally:
+            with self._lock:
+                self._running.pop(str(job.id), None)
+            close_old_connections()
+
+    def _heartbeat_loop(self):
+        interval = max(1, settings.JOB_VISIBILITY_TIMEOUT // 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                jobs = list(self._running.values())
+            for job in jobs:
+                try:
+                    if not self.broker.heartbeat(job, self.worker_id):
+                        logger.warning(f"Worker {self.worker_id} lost the lease on job {job.id}")
+                except Exception as e:
+                    logger.error(f"Heartbeat failed for job {job.id}: {e}")
+            close_old_connections()
@@ -1,147 +1,133 @@
+import hashlib
 import stripe
 import logging
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+FREE_SUBSCRIPTION = {
+    'status': None,
+    'plan': 'free',
+    'customer_id': None,
+    'subscription_id': None,
+    'current_period_start': None,
+    'current_period_end': None,
+}
+
+
+def subscription_cache_key(email):
+    digest = hashlib.sha256((email or '').strip().lower().encode('utf-8')).hexdigest()
+    return f"stripe_subscription:{digest}"
+
+
+def invalidate_subscription(email):
+    """Drop the cached subscription of a customer, so the next lookup goes to Stripe"""
+    cache.delete(subscription_cache_key(email))
+
+
 class StripeService:
     def __init__(self):
         self.api_key = settings.STRIPE_SECRET_KEY
         stripe.api_key = self.api_key
 
-    def get_subscription_status_by_email(self, email):
-        """Get subscription status for a customer by email"""
+    def get_subscription_by_email(self, email):
+        """Status, plan and current period of a customer's subscription, in one Stripe lookup.
+
+        Results are cached for SUBSCRIPTION_CACHE_TTL seconds and dropped by the Stripe webhook
+        when the customer's subscription changes. Stripe errors are not cached.
+        """
         if not self.api_key:
-            logger.info(f"Stripe API key is empty. Skipping subscription status check for email: {email}")
-            return None
+            logger.info(f"Stripe API key is empty. Skipping subscription lookup for email: {email}")
+            return dict(FREE_SUBSCRIPTION)
+
+        key = subscription_cache_key(email)
+        subscription = cache.get(key)
+        if subscription is not None:
+            return subscription
 
         try:
-            logger.info(f"Checking subscription status for email: {email}")
-            
-            # Find customer by email
-            customers = stripe.Customer.list(email=email, limit=1)
-            if not customers.data:
-                logger.info(f"No Stripe customer found for email: {email}")
-                return None
-                
-            customer = customers.data[0]
-            logger.info(f"Found Stripe customer: {customer.id}")
-            
-            # Get active subscriptions for the customer
-            subscriptions = stripe.Subscription.list(
-                customer=customer.id,
-                status='active',
-                limit=1
-            )
-            
-            if subscriptions.data:
-                logger.info(f"Found active subscription for customer: {customer.id}")
-                return 'active'
-            
-            logger.info(f"No active subscriptions found for customer: {customer.id}")
-            return None
-            
+            subscription = self._fetch_subscription(email)
         except stripe.error.StripeError as e:
-            logger.error(f"Stripe error checking subscription status: {str(e)}")
-            return None
+            logger.error(f"Stripe error getting subscription: {str(e)}")
+            return dict(FREE_SUBSCRIPTION)
 
-    def get_subscription_info_by_email(self, email):
-        """Get subscription period information for a customer by email"""
-        if not self.api_key:
-            logger.info(f"Stripe API key is empty. Skipping subscription info retrieval for email: {email}")
-            return None
+        cache.set(key, subscription, settings.SUBSCRIPTION_CACHE_TTL)
+        return subscription
 
-        try:
-            logger.info(f"Getting subscription info for email: {email}")
-            
-            # Find customer by email
-            customers = stripe.Customer.list(email=email, limit=1)
-            if not customers.data:
-                logger.info(f"No Stripe customer found for email: {email}")
-                return None
-                
-            customer = customers.data[0]
-            logger.info(f"Found Stripe customer: {customer.id}")
-            
-            # Get active subscriptions for the customer
-            subscriptions = stripe.Subscription.list(
-                customer=customer.id,
-                status='active',
-                limit=1
-            )
-            
-            if not subscriptions.data:
-                logger.info(f"No active subscriptions found for customer: {customer.id}")
-                return None
-            
-            subscription = subscriptions.data[0]
-            
-            # Convert timestamps to datetime
-            current_period_start = timezone.datetime.fromtimestamp(
-                subscription.current_period_start, 
+    def _fetch_subscription(self, email):
+        logger.info(f"Getting subscription for email: {email}")
+
+        # Find customer by email
+        customers = stripe.Customer.list(email=email, limit=1)
+        if not customers.data:
+            logger.info(f"No Stripe customer found for email: {email}")
+            return dict(FREE_SUBSCRIPTION)
+
+        customer = customers.data[0]
+        logger.info(f"Found Stripe customer: {customer.id}")
+
+        # Get the active subscription with its product, for the plan name
+        subscriptions = stripe.Subscription.list(
+            customer=customer.id,
+            status='active',
+            limit=1,
+            expand=['data.plan.product']
+        )
+
+        if not subscriptions.data:
+            logger.info(f"No active subscriptions found for customer: {customer.id}")
+            return {**FREE_SUBSCRIPTION, 'customer_id': customer.id}
+
+        subscription = subscriptions.data[0]
+        product_name = subscription.plan.product.name.lower()
+        logger.info(f"Product name: {product_name}")
+
+        # Match product name with available plans; no match means the free plan
+        plan = 'free'
+        for plan_name, display_name in settings.SUBSCRIPTION_PLAN_NAMES.items():
+            if display_name.lower() == product_name:
+                plan = plan_name
+                break
+
+        return {
+            'status': 'active',
+            'plan': plan,
+            'customer_id': customer.id,
+            'subscription_id': subscription.id,
+            'current_period_start': timezone.datetime.fromtimestamp(
+                subscription.current_period_start,
                 tz=timezone.get_current_timezone()
-            )
-            current_period_end = timezone.datetime.fromtimestamp(
+            ),
+            'current_period_end': timezone.datetime.fromtimestamp(
                 subscription.current_period_end,
                 tz=timezone.get_current_timezone()
-            )
-            
-            return {
-                'current_period_start': current_period_start,
-                'current_period_end': current_period_end,
-                'subscription_id': subscription.id
-            }
-            
-        except stripe.error.StripeError as e:
-            logger.error(f"Stripe error getting subscription info: {str(e)}")
+            ),
+        }
+
+    def get_subscription_status_by_email(self, email):
+        """Get subscription status for a customer by email"""
+        return self.get_subscription_by_email(email)['status']
+
+    def get_subscription_info_by_email(self, email):
+        """Get subscription period information for a customer by email"""
+        subscription = self.get_subscription_by_email(email)
+        if subscription['status'] != 'active':
             return None
+        return {
+            'current_period_start': subscription['current_period_start'],
+            'current_period_end': subscription['current_period_end'],
+            'subscription_id': subscription['subscription_id']
+        }
 
     def get_subscription_type_by_email(self, email):
         """Get subscription type for a customer by email"""
-        if not self.api_key:
-            logger.info(f"Stripe API key is empty. Skipping subscription type check for email: {email}")
-            return 'free'
+        return self.get_subscription_by_email(email)['plan']
 
-        try:
-            logger.info(f"Checking subscription type for email: {email}")
-            
-            # Find customer by email
-            customers = stripe.Customer.list(email=email, limit=1)
-            if not customers.data:
-                logger.info(f"No Stripe customer found for email: {email}")
-                return 'free'
-                
-            customer = customers.data[0]
-            logger.info(f"Found Stripe customer: {customer.id}")
-            
-            # Get active subscriptions for the customer
-            subscriptions = stripe.Subscription.list(
-                customer=customer.id,
-                status='active',
-                limit=1,
-                expand=['data.plan.product']
-            )
-            
-            if not subscriptions.data:
-                logger.info(f"No active subscriptions found for customer: {customer.id}")
-                return 'free'
-                
-            # Get the subscription type from the product name
-            subscription = subscriptions.data[0]
-            product = subscription.plan.product
-            product_name = product.name.lower()
-            
-            logger.info(f"Product name: {product_name}")
-            
-            # Match product name with available plans
-            for plan_name in settings.SUBSCRIPTION_PLAN_NAMES.keys():
-                if settings.SUBSCRIPTION_PLAN_NAMES[plan_name].lower() == product_name:
-                    return plan_name
-            
-            # If no match found, return free plan
-            return 'free'
-            
-        except stripe.error.StripeError as e:
-            logger.error(f"Stripe error checking subscription type: {str(e)}")
-            return 'free' 
\ No newline at end of file
+    def construct_webhook_event(self, payload, signature):
+        """Verify a webhook request against STRIPE_WEBHOOK_SECRET and parse its event"""
+        return stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+
+    def get_customer_email(self, customer_id):
+        return stripe.Customer.retrieve(customer_id).email
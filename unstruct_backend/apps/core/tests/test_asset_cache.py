@@ -0,0 +1,120 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from apps.common.utils.asset_cache import AssetCache, hash_file
+
+
+def writer(content):
+    calls = []
+
+    def fetch(path):
+        calls.append(path)
+        with open(path, "wb") as f:
+            f.write(content)
+
+    return fetch, calls
+
+
+class AssetCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = AssetCache(root=self.tmp.name, max_bytes=0, min_age=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_second_lookup_is_a_hit(self):
+        fetch, calls = writer(b"hello")
+        first = self.cache.get_or_fetch("s3://bucket/a.pdf", "etag-1", "a.pdf", fetch)
+        second = self.cache.get_or_fetch("s3://bucket/a.pdf", "etag-1", "a.pdf", fetch)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(first.endswith(".pdf"))
+        self.assertEqual(self.cache.content_hash(first), hash_file(first))
+
+    def test_new_version_is_a_miss(self):
+        fetch, calls = writer(b"v1")
+        self.cache.get_or_fetch("gdrive://file", "md5-1", "a.pdf", fetch)
+        fetch, calls = writer(b"v2")
+        path = self.cache.get_or_fetch("gdrive://file", "md5-2", "a.pdf", fetch)
+
+        self.assertEqual(len(calls), 1)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"v2")
+
+    def test_identical_content_is_stored_once(self):
+        first = self.cache.get_or_fetch("s3://bucket/a.pdf", "1", "a.pdf", writer(b"same")[0])
+        second = self.cache.get_or_fetch("dropbox:///b.pdf", "2", "b.pdf", writer(b"same")[0])
+        self.assertEqual(first, second)
+
+    def test_failed_fetch_is_resumed(self):
+        def failing_fetch(path):
+            with open(path, "ab") as f:
+                f.write(b"part")
+            raise IOError("connection reset")
+
+        with self.assertRaises(IOError):
+            self.cache.get_or_fetch("s3://bucket/a.pdf", "1", "a.pdf", failing_fetch)
+        self.assertIsNone(self.cache.get("s3://bucket/a.pdf", "1"))
+
+        def resuming_fetch(path):
+            with open(path, "ab") as f:
+                f.write(b"ial")
+
+        path = self.cache.get_or_fetch("s3://bucket/a.pdf", "1", "a.pdf", resuming_fetch)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"partial")
+        self.assertEqual(os.listdir(self.cache.tmp_dir), [])
+
+    def test_concurrent_fills_download_once(self):
+        calls = []
+
+        def fetch(path):
+            calls.append(path)
+            time.sleep(0.05)
+            with open(path, "wb") as f:
+                f.write(b"data")
+
+        paths = []
+        threads = [
+            threading.Thread(target=lambda: paths.append(self.cache.get_or_fetch("s3://bucket/a", "1", "a", fetch)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(paths)), 1)
+
+    def test_least_recently_used_blob_is_evicted(self):
+        cache = AssetCache(root=self.tmp.name, max_bytes=10, min_age=0)
+        old = cache.get_or_fetch("k1", "1", "a", writer(b"x" * 6)[0])
+        os.utime(old, (time.time() - 60, time.time() - 60))
+        new = cache.get_or_fetch("k2", "1", "b", writer(b"y" * 6)[0])
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+        self.assertIsNone(cache.get("k1", "1"))
+
+    def test_eviction_removes_refs_and_locks(self):
+        cache = AssetCache(root=self.tmp.name, max_bytes=10, min_age=0)
+        old = cache.get_or_fetch("k1", "1", "a", writer(b"x" * 6)[0])
+        os.utime(old, (time.time() - 60, time.time() - 60))
+        def failing_fetch(path):
+            raise IOError("connection reset")
+
+        with self.assertRaises(IOError):
+            cache.get_or_fetch("k3", "1", "c", failing_fetch)
+        cache.get_or_fetch("k2", "1", "b", writer(b"y" * 6)[0])
+
+        kept = os.path.basename(cache._ref_path("k2", "1"))
+        self.assertEqual(sorted(os.listdir(cache.ref_dir)), [kept, f"{kept}.lock"])
+        # The entry can be filled again after its lock file is gone
+        self.assertTrue(os.path.exists(cache.get_or_fetch("k1", "1", "a", writer(b"x" * 6)[0])))
@@ -0,0 +1,131 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from apps.common.utils.s3_utils import S3Service
+from apps.common.utils.tree_walk import walk_concurrently
+from apps.core.models import Asset, Project
+from apps.core.models.asset import ASSET_FILE_TYPE, ASSET_UPLOAD_SOURCE
+from apps.core.services.asset_ingestion import INGEST_ASSETS, SOURCES, AssetIngestion, ingest_assets_job
+from apps.core.services.job_queue import DatabaseJobBroker
+
+User = get_user_model()
+
+# Keys of a bucket, listed one "folder" level at a time by FakePaginator
+BUCKET = ["a.pdf", "docs/", "docs/b.pdf", "docs/2024/c.mp3", "docs/2024/d.txt", "img/e.png"]
+
+
+class FakePaginator:
+    def paginate(self, Bucket, Prefix, Delimiter):
+        contents, prefixes = [], []
+        for key in BUCKET:
+            if not key.startswith(Prefix):
+                continue
+            rest = key[len(Prefix):]
+            if Delimiter in rest.rstrip(Delimiter):
+                prefix = Prefix + rest.split(Delimiter)[0] + Delimiter
+                if prefix not in prefixes:
+                    prefixes.append(prefix)
+            else:
+                contents.append({"Key": key, "Size": 10, "LastModified": None})
+        # Two pages, as S3 returns for large levels
+        yield {"Contents": contents[:1], "CommonPrefixes": [{"Prefix": p} for p in prefixes]}
+        yield {"Contents": contents[1:]}
+
+
+class ConcurrentListingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.service = S3Service()
+        self.service.s3_client = type("Client", (), {"get_paginator": lambda self, name: FakePaginator()})()
+
+    def test_walk_visits_every_folder(self):
+        tree = {"root": (["1"], ["a", "b"]), "a": (["2", "3"], ["c"]), "b": ([], []), "c": (["4"], [])}
+        self.assertCountEqual(walk_concurrently(["root"], tree.get, max_workers=3), ["1", "2", "3", "4"])
+
+    def test_walk_raises_listing_errors(self):
+        def list_children(folder):
+            raise RuntimeError("forbidden")
+
+        with self.assertRaises(RuntimeError):
+            list(walk_concurrently(["root"], list_children, max_workers=2))
+
+    def test_list_level_splits_files_and_prefixes(self):
+        files, prefixes = self.service.list_level("bucket", "docs/")
+        self.assertEqual([f["id"] for f in files], ["docs/b.pdf"])
+        self.assertEqual(prefixes, ["docs/2024/"])
+
+    def test_recursive_listing_covers_every_prefix(self):
+        keys = [f["id"] for f in self.service.list_files_concurrently("bucket", max_workers=4)]
+        self.assertCountEqual(keys, [key for key in BUCKET if not key.endswith("/")])
+
+        keys = [f["id"] for f in self.service.list_files_concurrently("bucket", "docs", recursive=False)]
+        self.assertEqual(keys, ["docs/b.pdf"])
+
+
+class AssetIngestionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(
+            name="Invoices", description="", owner=self.user, organization=self.user.personal_organization
+        )
+        self.progress = []
+
+    def files(self, *names):
+        return [{"id": f"folder/{name}", "name": name} for name in names]
+
+    def build_asset(self, info):
+        return Asset(
+            name=info["name"],
+            description="",
+            upload_source=ASSET_UPLOAD_SOURCE.AWS_S3,
+            source_file_id=info["id"],
+        )
+
+    def ingest(self, files):
+        ingestion = AssetIngestion(
+            self.project, ASSET_UPLOAD_SOURCE.AWS_S3, user=self.user, batch_size=2, on_progress=self.progress.append
+        )
+        return ingestion.run(files, self.build_asset)
+
+    def test_assets_are_created_in_batches(self):
+        progress = self.ingest(self.files("a.pdf", "b.pdf", "c.pdf"))
+        self.assertEqual(progress, {"listed": 3, "created": 3, "skipped": 0})
+        self.assertEqual([p["created"] for p in self.progress], [2, 3])
+
+        asset = Asset.objects.get(source_file_id="folder/a.pdf")
+        self.assertEqual(asset.project, self.project)
+        self.assertEqual(asset.organization, self.project.organization)
+        self.assertEqual(asset.owner, self.user)
+
+    def test_existing_and_repeated_files_are_skipped(self):
+        self.ingest(self.files("a.pdf"))
+        progress = self.ingest(self.files("a.pdf", "b.pdf", "b.pdf"))
+        self.assertEqual(progress, {"listed": 3, "created": 1, "skipped": 2})
+        self.assertEqual(Asset.objects.filter(project=self.project).count(), 2)
+
+    def test_job_records_progress(self):
+        job = DatabaseJobBroker().enqueue(
+            INGEST_ASSETS,
+            payload={
+                "project_id": str(self.project.id),
+                "upload_source": ASSET_UPLOAD_SOURCE.DROPBOX,
+                "paths": ["/report.txt"],
+            },
+            user=self.user,
+            secrets={"access_token": "token"},
+        )
+        self.assertNotIn("token", json.dumps(job.payload))
+        # Listing needs the Dropbox API; the source's asset builder is used as is
+        list_files = lambda payload: [{"id": "/report.txt", "name": "report.txt", "size": 5}]
+        build_asset = SOURCES[ASSET_UPLOAD_SOURCE.DROPBOX][1]
+        with mock.patch.dict(SOURCES, {ASSET_UPLOAD_SOURCE.DROPBOX: (list_files, build_asset)}):
+            progress = ingest_assets_job(job)
+
+        self.assertEqual(progress, {"listed": 1, "created": 1, "skipped": 0})
+        job.refresh_from_db()
+        self.assertEqual(job.progress["created"], 1)
+        asset = Asset.objects.get(project=self.project)
+        self.assertEqual((asset.file_type, asset.size), (ASSET_FILE_TYPE.TXT, "5"))
+        self.assertEqual(asset.source_credentials, "token")
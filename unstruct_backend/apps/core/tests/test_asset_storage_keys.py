@@ -0,0 +1,148 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.common.utils.s3_utils import S3Service
+from apps.core.models import Asset, Project
+from apps.core.models.asset import ASSET_UPLOAD_SOURCE, storage_key_from_url
+
+User = get_user_model()
+
+
+class FakeS3Service:
+    """S3Service over a dict of objects, recording every key HEAD requests are made for"""
+
+    objects = {}
+    heads = []
+
+    def __init__(self, credentials=None):
+        self.s3_client = self
+
+    def authenticate(self):
+        pass
+
+    def _info(self, bucket, key):
+        return {"id": key, "bucket": bucket, "etag": f"etag-{key}", "size": len(self.objects[key])}
+
+    def head_file(self, bucket, key):
+        self.heads.append(key)
+        if key not in self.objects:
+            raise Exception(f"File not found: {key}")
+        return self._info(bucket, key)
+
+    def head_first(self, bucket, keys):
+        for key in keys:
+            self.heads.append(key)
+            if key in self.objects:
+                return self._info(bucket, key)
+        return None
+
+    def list_files_concurrently(self, bucket, prefix, recursive, max_workers):
+        for key in self.objects:
+            if key.startswith(prefix):
+                yield {"id": key, "name": os.path.basename(key)}
+
+    def download_file(self, bucket, key, path, Callback=None, Config=None):
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+
+class StorageKeyFromUrlTestCase(SimpleTestCase):
+    @override_settings(AWS_STORAGE_BUCKET_NAME="unstruct-files")
+    def test_recognises_bucket_urls(self):
+        urls = {
+            "https://unstruct-files.s3.us-east-2.amazonaws.com/a/b%20c.pdf": "a/b%20c.pdf",
+            "https://unstruct-files.s3.amazonaws.com/scan.pdf": "scan.pdf",
+            "https://s3.us-east-2.amazonaws.com/unstruct-files/x/scan.pdf": "x/scan.pdf",
+            "s3://unstruct-files/scan.pdf": "scan.pdf",
+        }
+        for url, key in urls.items():
+            self.assertEqual(storage_key_from_url(url), key)
+
+    @override_settings(AWS_STORAGE_BUCKET_NAME="unstruct-files")
+    def test_other_urls_have_no_key(self):
+        self.assertIsNone(storage_key_from_url("https://other.s3.us-east-2.amazonaws.com/scan.pdf"))
+        self.assertIsNone(storage_key_from_url("/tmp/unstruct/assets/1/scan.pdf"))
+        self.assertIsNone(storage_key_from_url("https://example.com/unstruct-files/scan.pdf"))
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME="unstruct-files", ASSET_STORAGE_KEY_PREFIXES=["", "legacy/"])
+class StorageKeyResolutionTestCase(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        cache_settings = override_settings(ASSET_CACHE_DIR=cache_dir.name)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        FakeS3Service.objects = {
+            "legacy/scan.pdf": b"pdf", "exports/2023/notes.txt": b"txt", "exports/2023/q1 report.pdf": b"pdf",
+        }
+        FakeS3Service.heads = []
+        for target in ("apps.core.models.asset.S3Service",
+                       "apps.core.management.commands.backfill_asset_storage_keys.S3Service"):
+            patcher = mock.patch(target, FakeS3Service)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(
+            name="Invoices", description="", owner=user, organization=user.personal_organization
+        )
+
+    def make_asset(self, url, storage_key=None):
+        return Asset.objects.create(
+            name=os.path.basename(url),
+            description="",
+            project=self.project,
+            upload_source=ASSET_UPLOAD_SOURCE.UPLOAD,
+            url=url,
+            storage_key=storage_key,
+        )
+
+    def test_stored_key_is_used_directly(self):
+        asset = self.make_asset("/tmp/unstruct/assets/1/scan.pdf", storage_key="legacy/scan.pdf")
+        with open(asset.get_file_path(), "rb") as f:
+            self.assertEqual(f.read(), b"pdf")
+        self.assertEqual(FakeS3Service.heads, ["legacy/scan.pdf"])
+
+    def test_legacy_key_is_found_under_a_prefix_and_remembered(self):
+        asset = self.make_asset("/tmp/unstruct/assets/1/scan.pdf")
+        asset.get_file_path()
+        self.assertEqual(FakeS3Service.heads, ["scan.pdf", "legacy/scan.pdf"])
+        asset.refresh_from_db()
+        self.assertEqual(asset.storage_key, "legacy/scan.pdf")
+
+    def test_backfill_resolves_in_batches(self):
+        found = self.make_asset("https://unstruct-files.s3.us-east-2.amazonaws.com/legacy/scan.pdf")
+        scanned = self.make_asset("/tmp/unstruct/assets/2/notes.txt")
+        missing = self.make_asset("/tmp/unstruct/assets/3/gone.pdf")
+        quoted = self.make_asset("https://unstruct-files.s3.us-east-2.amazonaws.com/old/q1%20report.pdf")
+
+        out = io.StringIO()
+        call_command("backfill_asset_storage_keys", "--batch-size", "2", "--scan-prefix", "exports/", stdout=out)
+
+        keys = dict(Asset.objects.values_list("id", "storage_key"))
+        self.assertEqual(keys[found.id], "legacy/scan.pdf")
+        self.assertEqual(keys[scanned.id], "exports/2023/notes.txt")
+        self.assertEqual(keys[quoted.id], "exports/2023/q1 report.pdf")
+        self.assertIsNone(keys[missing.id])
+        self.assertIn("Resolved 3 assets; 1 left unresolved", out.getvalue())
+
+
+class HeadFirstTestCase(SimpleTestCase):
+    def test_forbidden_keys_are_treated_as_missing(self):
+        def head_object(Bucket, Key):
+            if Key != "legacy/scan.pdf":
+                raise ClientError({"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject")
+            return {"ETag": '"abc"', "ContentLength": 3, "LastModified": None}
+
+        service = S3Service()
+        service.s3_client = mock.Mock(head_object=head_object)
+        info = service.head_first("unstruct-files", ["scan.pdf", "legacy/scan.pdf"])
+        self.assertEqual((info["id"], info["size"]), ("legacy/scan.pdf", 3))
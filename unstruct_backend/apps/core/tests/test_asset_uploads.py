@@ -0,0 +1,114 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from apps.core.models import Asset, Project
+from apps.core.models.asset import ASSET_FILE_TYPE
+from apps.core.services.asset_uploads import (
+    MAX_PARTS,
+    UPLOAD_TOKEN_SALT,
+    AssetUploads,
+    UploadError,
+    part_size_for,
+)
+
+User = get_user_model()
+
+UPLOAD_DIR = tempfile.mkdtemp()
+PART_SIZE = 5 * 1024 * 1024
+
+
+@override_settings(ASSET_UPLOAD_BACKEND="local", ASSET_UPLOAD_LOCAL_DIR=UPLOAD_DIR, ASSET_UPLOAD_PART_SIZE=PART_SIZE)
+class AssetUploadsTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.project = Project.objects.create(
+            name="Invoices", description="", owner=self.user, organization=self.user.personal_organization
+        )
+        self.uploads = AssetUploads(self.project, user=self.user)
+
+    def put_parts(self, upload, body):
+        """PUT the body in parts to the part URLs, as a browser would; returns the parts list"""
+        parts = []
+        for number, url in enumerate(upload["part_urls"], start=1):
+            chunk = body[(number - 1) * upload["part_size"]:number * upload["part_size"]]
+            response = self.client.put(url, data=chunk, content_type="application/octet-stream")
+            self.assertEqual(response.status_code, 200)
+            parts.append({"part_number": number, "etag": response["ETag"]})
+        return parts
+
+    def test_parts_are_assembled_and_registered(self):
+        body = os.urandom(PART_SIZE + 1000)
+        uploads = self.uploads.start([
+            {"name": "scan.pdf", "size": len(body), "content_type": "application/pdf"},
+            {"name": "notes.txt", "size": 5, "content_type": "text/plain"},
+        ])
+        self.assertEqual([len(u["part_urls"]) for u in uploads], [2, 1])
+
+        assets = self.uploads.complete([
+            {"upload_token": uploads[0]["upload_token"], "parts": self.put_parts(uploads[0], body)},
+            {"upload_token": uploads[1]["upload_token"], "parts": self.put_parts(uploads[1], b"hello")},
+        ])
+
+        scan = Asset.objects.get(id=assets[0].id)
+        self.assertEqual(
+            (scan.file_type, scan.size, scan.mime_type), (ASSET_FILE_TYPE.PDF, str(len(body)), "application/pdf")
+        )
+        self.assertEqual((scan.organization, scan.owner), (self.project.organization, self.user))
+        with open(scan.get_file_path(), "rb") as f:
+            self.assertEqual(hashlib.sha256(f.read()).digest(), hashlib.sha256(body).digest())
+
+    def test_missing_part_is_rejected(self):
+        upload = self.uploads.start([{"name": "scan.pdf", "size": 2 * PART_SIZE}])[0]
+        first_only = {**upload, "part_urls": upload["part_urls"][:1]}
+        parts = self.put_parts(first_only, os.urandom(PART_SIZE)) + [{"part_number": 2, "etag": "00"}]
+        with self.assertRaises(UploadError):
+            self.uploads.complete([{"upload_token": upload["upload_token"], "parts": parts}])
+        self.assertFalse(Asset.objects.exists())
+
+    def test_failed_upload_removes_the_batch_assembled_objects(self):
+        good, bad = self.uploads.start([{"name": "notes.txt", "size": 5}, {"name": "scan.pdf", "size": 5}])
+        with self.assertRaises(UploadError):
+            self.uploads.complete([
+                {"upload_token": good["upload_token"], "parts": self.put_parts(good, b"hello")},
+                {"upload_token": bad["upload_token"], "parts": [{"part_number": 1, "etag": "00"}]},
+            ])
+        self.assertFalse(Asset.objects.exists())
+        key = signing.loads(good["upload_token"], salt=UPLOAD_TOKEN_SALT)["key"]
+        self.assertFalse(os.path.exists(os.path.join(UPLOAD_DIR, key)))
+
+    def test_tokens_are_bound_to_their_project(self):
+        upload = self.uploads.start([{"name": "scan.pdf", "size": 10}])[0]
+        other = Project.objects.create(
+            name="Other", description="", owner=self.user, organization=self.user.personal_organization
+        )
+        parts = [{"part_number": 1, "etag": "00"}]
+        with self.assertRaises(UploadError):
+            AssetUploads(other).complete([{"upload_token": upload["upload_token"], "parts": parts}])
+
+        tampered_url = upload["part_urls"][0][:-2] + "x/"
+        response = self.client.put(tampered_url, data=b"x", content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 403)
+
+    def test_form_uploads_are_stored_in_one_insert(self):
+        files = [SimpleUploadedFile(f"page{i}.png", b"png", content_type="image/png") for i in range(3)]
+        with self.assertNumQueries(1):
+            assets = self.uploads.put_files(files)
+        self.assertEqual(len(assets), 3)
+        self.assertTrue(all(os.path.exists(asset.url) for asset in assets))
+
+    def test_part_size_keeps_under_the_part_limit(self):
+        self.assertEqual(part_size_for(10), PART_SIZE)
+        size = 200 * 1024 ** 3
+        self.assertLessEqual(-(-size // part_size_for(size)), MAX_PARTS)
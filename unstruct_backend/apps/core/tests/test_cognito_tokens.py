@@ -0,0 +1,122 @@
+import json
+import time
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from jwt.algorithms import RSAAlgorithm
+from pycognito.exceptions import TokenVerificationException
+
+from apps.common.auth.cognito_tokens import CognitoTokenVerifier, JWKSCache, VerifiedTokenCache
+
+User = get_user_model()
+
+ISSUER = "https://cognito-idp.us-east-1.amazonaws.com/pool"
+
+
+class SigningKeys:
+    """Stand-in for a user pool's JWKS endpoint that counts fetches"""
+
+    def __init__(self):
+        self.keys = {}
+        self.fetches = 0
+        self.rotate("key-1")
+
+    def rotate(self, kid):
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def __call__(self, url):
+        self.fetches += 1
+        return {"keys": [
+            {**json.loads(RSAAlgorithm.to_jwk(key.public_key())), "kid": kid} for kid, key in self.keys.items()
+        ]}
+
+    def token(self, kid="key-1", expires_in=3600, **claims):
+        payload = {
+            "sub": "7a0e7a1e-0000-4000-8000-000000000001", "email": "user@example.com", "aud": "client",
+            "iss": ISSUER, "token_use": "id", "exp": int(time.time()) + expires_in, **claims,
+        }
+        return jwt.encode(payload, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+def verifier(keys):
+    return CognitoTokenVerifier("pool", "client", "us-east-1", JWKSCache(
+        f"{ISSUER}/.well-known/jwks.json", ttl=3600, refresh_interval=0, fetch=keys,
+    ))
+
+
+class CognitoTokenVerifierTestCase(SimpleTestCase):
+    def setUp(self):
+        self.keys = SigningKeys()
+        self.verifier = verifier(self.keys)
+
+    def test_signing_keys_are_fetched_once(self):
+        for _ in range(3):
+            self.assertEqual(self.verifier.verify(self.keys.token())["email"], "user@example.com")
+        self.assertEqual(self.keys.fetches, 1)
+
+    def test_rotated_key_triggers_a_refresh(self):
+        self.verifier.verify(self.keys.token())
+        self.keys.rotate("key-2")
+        self.verifier.verify(self.keys.token(kid="key-2"))
+        self.assertEqual(self.keys.fetches, 2)
+
+    def test_invalid_tokens_are_rejected(self):
+        for token in (
+            self.keys.token(expires_in=-10),
+            self.keys.token(aud="other-client"),
+            self.keys.token(token_use="access"),
+        ):
+            with self.assertRaises(TokenVerificationException):
+                self.verifier.verify(token)
+
+
+class VerifiedTokenCacheTestCase(SimpleTestCase):
+    def test_entries_expire_with_the_token(self):
+        cache = VerifiedTokenCache(max_size=10)
+        cache.set("live", "user-1", time.time() + 60)
+        cache.set("expired", "user-2", time.time() - 1)
+        self.assertEqual(cache.get("live"), "user-1")
+        self.assertIsNone(cache.get("expired"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = VerifiedTokenCache(max_size=2)
+        for token in ("a", "b"):
+            cache.set(token, token, time.time() + 60)
+        cache.get("a")
+        cache.set("c", "c", time.time() + 60)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a")
+
+
+@override_settings(ENABLE_COGNITO_AUTH=True)
+class SimpleAuthenticationTestCase(TestCase):
+    def setUp(self):
+        from apps.common.auth.simple_auth import SimpleAuthentication
+
+        self.keys = SigningKeys()
+        self.verifier = verifier(self.keys)
+        self.token_cache = VerifiedTokenCache(max_size=10)
+        for target, value in (("get_token_verifier", self.verifier), ("get_verified_token_cache", self.token_cache)):
+            patcher = mock.patch(f"apps.common.auth.simple_auth.{target}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.authentication = SimpleAuthentication()
+
+    def request(self, token):
+        return RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_verified_token_skips_verification_until_expiry(self):
+        token = self.keys.token()
+        user, _ = self.authentication.authenticate(self.request(token))
+        self.assertEqual(user.email, "user@example.com")
+
+        with mock.patch.object(self.verifier, "verify") as verify:
+            again, _ = self.authentication.authenticate(self.request(token))
+        verify.assert_not_called()
+        self.assertEqual(again.id, user.id)
+
+    def test_bad_token_is_not_authenticated(self):
+        self.assertIsNone(self.authentication.authenticate(self.request(self.keys.token(aud="other-client"))))
@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.common.utils.frame_sampler import FrameSampler, plan_frame_indices, select_frames
+
+
+def write_video(path, colors, seconds_per_color=2, fps=10, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for color in colors:
+        frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        frame[:] = color
+        for _ in range(seconds_per_color * fps):
+            writer.write(frame)
+    writer.release()
+
+
+class PlanFrameIndicesTestCase(SimpleTestCase):
+    def test_fixed_rate(self):
+        self.assertEqual(plan_frame_indices(90, 30, 1, max_frames=0), [0, 30, 60])
+
+    def test_long_video_is_spread_to_the_budget(self):
+        # 10 minutes at 30fps with a budget of 10 frames decodes at most 40 candidates
+        indices = plan_frame_indices(18000, 30, 1, max_frames=10)
+        self.assertLessEqual(len(indices), 40)
+        self.assertGreater(indices[-1], 17000)
+
+    def test_unknown_length(self):
+        self.assertEqual(plan_frame_indices(0, 30, 1, max_frames=10), [])
+
+
+class SelectFramesTestCase(SimpleTestCase):
+    def test_best_candidate_per_span(self):
+        candidates = [(0, 1.0), (10, 0.4), (20, 0.9), (30, 0.5), (40, 0.2), (50, 0.6)]
+        self.assertEqual(select_frames(candidates, 3), [0, 20, 50])
+
+    def test_empty_spans_go_to_the_best_remaining(self):
+        candidates = [(0, 1.0), (5, 0.5), (6, 0.9), (100, 0.3)]
+        self.assertEqual(select_frames(candidates, 3), [0, 6, 100])
+
+
+class FrameSamplerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "scenes.avi")
+        write_video(self.path, [(255, 0, 0), (0, 255, 0), (0, 0, 255)])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_keeps_one_frame_per_scene(self):
+        frames = list(FrameSampler(fps=1, scene_threshold=0.3, max_frames=100).sample(self.path))
+        self.assertEqual([frame.index for frame in frames], [0, 20, 40])
+
+    def test_without_scene_detection_samples_at_fixed_rate(self):
+        frames = list(FrameSampler(fps=1, scene_threshold=0, max_frames=100).sample(self.path))
+        self.assertEqual(len(frames), 6)
+
+    def test_respects_max_frames(self):
+        frames = list(FrameSampler(fps=1, scene_threshold=0, max_frames=2).sample(self.path))
+        self.assertEqual(len(frames), 2)
+
+    def test_frames_cover_the_end_of_a_long_clip(self):
+        path = os.path.join(self.tmp.name, "long.avi")
+        # A scene change every second for 30 seconds
+        write_video(path, [(255, 0, 0), (0, 0, 255)] * 15, seconds_per_color=1)
+        frames = list(FrameSampler(fps=1, scene_threshold=0.3, max_frames=3).sample(path))
+
+        self.assertEqual(len(frames), 3)
+        self.assertGreaterEqual(frames[-1].index, 200)
+        self.assertEqual([frame.index for frame in frames], sorted(frame.index for frame in frames))
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.core.models import Job, JOB_STATUS, Project, Task
+from apps.core.services.job_queue import ActiveJobExists, DatabaseJobBroker, job_secrets
+
+
+@override_settings(JOB_VISIBILITY_TIMEOUT=60, JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=0)
+class DatabaseJobBrokerTestCase(TestCase):
+    def setUp(self):
+        self.broker = DatabaseJobBroker()
+
+    def test_claim_leases_job_once(self):
+        job = self.broker.enqueue("noop")
+        first = self.broker.claim("worker-a", limit=5)
+        second = self.broker.claim("worker-b", limit=5)
+        self.assertEqual([j.id for j in first], [job.id])
+        self.assertEqual(second, [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, JOB_STATUS.RUNNING)
+        self.assertEqual(job.worker_id, "worker-a")
+        self.assertIsNotNone(job.leased_until)
+
+    def test_fail_requeues_until_max_attempts(self):
+        job = self.broker.enqueue("noop")
+        [claimed] = self.broker.claim("worker-a")
+        self.assertTrue(self.broker.fail(claimed, "boom"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, JOB_STATUS.QUEUED)
+        self.assertEqual(job.attempts, 1)
+
+        [claimed] = self.broker.claim("worker-a")
+        self.assertTrue(self.broker.fail(claimed, "boom again"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, JOB_STATUS.FAILED)
+        self.assertEqual(job.error, "boom again")
+
+    def test_expired_lease_is_requeued(self):
+        job = self.broker.enqueue("noop")
+        self.broker.claim("worker-a")
+        Job.objects.filter(id=job.id).update(leased_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.broker.requeue_expired(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JOB_STATUS.QUEUED)
+        self.assertEqual([j.id for j in self.broker.claim("worker-b")], [job.id])
+
+    def test_heartbeat_requires_lease_owner(self):
+        job = self.broker.enqueue("noop")
+        self.broker.claim("worker-a")
+        self.assertTrue(self.broker.heartbeat(job, "worker-a"))
+        self.assertFalse(self.broker.heartbeat(job, "worker-b"))
+
+    def test_expired_holder_cannot_record_a_result(self):
+        self.broker.enqueue("noop")
+        [stale] = self.broker.claim("worker-a")
+        Job.objects.filter(id=stale.id).update(leased_until=timezone.now() - timedelta(seconds=1))
+        self.broker.requeue_expired()
+        [current] = self.broker.claim("worker-b")
+
+        self.assertFalse(self.broker.complete(stale, result={"from": "worker-a"}))
+        self.assertFalse(self.broker.fail(stale, "late failure"))
+        self.assertTrue(self.broker.complete(current, result={"from": "worker-b"}))
+        current.refresh_from_db()
+        self.assertEqual((current.status, current.result), (JOB_STATUS.SUCCEEDED, {"from": "worker-b"}))
+
+    def test_task_has_one_active_job(self):
+        project = Project.objects.create(name="Invoices", description="")
+        task = Task.objects.create(name="Extract", project=project, system_prompt="")
+        job = self.broker.enqueue("process_task", task=task)
+        with self.assertRaises(ActiveJobExists) as raised:
+            self.broker.enqueue("process_task", task=task)
+        self.assertEqual(raised.exception.job.id, job.id)
+
+        [claimed] = self.broker.claim("worker-a")
+        self.broker.complete(claimed)
+        self.assertNotEqual(self.broker.enqueue("process_task", task=task).id, job.id)
+
+    def test_secrets_are_encrypted_and_cleared_when_the_job_ends(self):
+        succeeded = self.broker.enqueue("noop", payload={"path": "/a"}, secrets={"access_token": "token"})
+        failed = self.broker.enqueue("noop", secrets={"access_token": "token"})
+        self.assertNotIn("token", str(Job.objects.get(id=succeeded.id).payload))
+
+        [claimed] = self.broker.claim("worker-a")
+        self.assertEqual(job_secrets(claimed), {"access_token": "token"})
+        self.broker.complete(claimed)
+        for _ in range(2):
+            [claimed] = self.broker.claim("worker-a")
+            self.assertEqual(job_secrets(claimed), {"access_token": "token"})
+            self.broker.fail(claimed, "boom")
+
+        for job in (succeeded, failed):
+            job.refresh_from_db()
+            self.assertEqual(job_secrets(job), {})
+        self.assertEqual(succeeded.payload, {"path": "/a"})
@@ -0,0 +1,37 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from apps.common.utils.locks import KeyedLock
+
+
+class KeyedLockTestCase(SimpleTestCase):
+    def test_same_key_is_serialized(self):
+        lock = KeyedLock()
+        inside = []
+        overlaps = []
+
+        def work():
+            with lock("asset"):
+                inside.append(1)
+                overlaps.append(len(inside))
+                threading.Event().wait(0.005)
+                inside.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(overlaps), 1)
+
+    def test_released_keys_are_dropped(self):
+        lock = KeyedLock()
+        with lock("a"):
+            with lock("a"):
+                self.assertEqual(len(lock), 1)
+            self.assertEqual(len(lock), 1)
+        for key in range(100):
+            with lock(key):
+                pass
+        self.assertEqual(len(lock), 0)
@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.common.utils.pdf_rasterizer import PdfRasterizer, RenderedPage, page_ranges
+
+
+class PageRangesTestCase(SimpleTestCase):
+    def test_ranges_cover_every_page(self):
+        self.assertEqual(page_ranges(10, 4), [(1, 4), (5, 8), (9, 10)])
+
+    def test_single_range(self):
+        self.assertEqual(page_ranges(3, 8), [(1, 3)])
+
+    def test_empty_document(self):
+        self.assertEqual(page_ranges(0, 8), [])
+
+
+class PdfRasterizerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.rendered = []
+
+        def render_range(pdf_path, output_dir, first_page, last_page):
+            self.rendered.append((first_page, last_page))
+            return [RenderedPage(number, f"{output_dir}/{number}.jpg") for number in range(first_page, last_page + 1)]
+
+        self.rasterizer = PdfRasterizer(dpi=100, fmt="jpeg", workers=2, pages_per_range=3)
+        patcher = mock.patch.object(self.rasterizer, "_render_range", side_effect=render_range)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(self.rasterizer, "page_count", return_value=20)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_renders_every_page_once(self):
+        pages = list(self.rasterizer.render("doc.pdf", "/tmp/pages"))
+        self.assertEqual(sorted(page.number for page in pages), list(range(1, 21)))
+        self.assertEqual(sorted(self.rendered), page_ranges(20, 3))
+
+    def test_ranges_are_rendered_ahead_of_the_consumer_only_up_to_workers(self):
+        pages = self.rasterizer.render("doc.pdf", "/tmp/pages")
+        next(pages)
+        # Two ranges were in flight; one finished and was replaced
+        self.assertLessEqual(len(self.rendered), 3)
+        pages.close()
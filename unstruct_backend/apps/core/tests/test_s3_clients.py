@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase, override_settings
+
+from apps.common.utils import s3_clients
+from apps.common.utils.s3_clients import get_s3_client, get_transfer_config
+
+CREDENTIALS = {"aws_access_key_id": "AKIAEXAMPLE", "aws_secret_access_key": "secret"}
+
+
+class S3ClientRegistryTestCase(SimpleTestCase):
+    def setUp(self):
+        s3_clients._reset_after_fork()
+        self.addCleanup(s3_clients._reset_after_fork)
+
+    def test_clients_are_shared_per_region_and_credentials(self):
+        client = get_s3_client("us-east-2", CREDENTIALS)
+        self.assertIs(get_s3_client("us-east-2", dict(CREDENTIALS, region_name="ignored")), client)
+        self.assertIsNot(get_s3_client("us-west-2", CREDENTIALS), client)
+        self.assertIsNot(get_s3_client("us-east-2", dict(CREDENTIALS, aws_secret_access_key="other")), client)
+        self.assertIsNot(get_s3_client("us-east-2", CREDENTIALS, endpoint_url="http://localhost:9000"), client)
+
+    @override_settings(S3_MAX_POOL_CONNECTIONS=24)
+    def test_clients_pool_connections(self):
+        self.assertEqual(get_s3_client("us-east-2", CREDENTIALS).meta.config.max_pool_connections, 24)
+
+    def test_forked_children_start_without_clients(self):
+        client = get_s3_client("us-east-2", CREDENTIALS)
+        s3_clients._reset_after_fork()
+        self.assertIsNot(get_s3_client("us-east-2", CREDENTIALS), client)
+
+    def test_least_recently_used_clients_are_dropped(self):
+        first = get_s3_client("us-east-2", dict(CREDENTIALS, aws_session_token="token-0"))
+        for i in range(1, s3_clients.MAX_CLIENTS + 1):
+            get_s3_client("us-east-2", dict(CREDENTIALS, aws_session_token=f"token-{i}"))
+        self.assertEqual(len(s3_clients._clients), s3_clients.MAX_CLIENTS)
+        self.assertIsNot(get_s3_client("us-east-2", dict(CREDENTIALS, aws_session_token="token-0")), first)
+
+    @override_settings(S3_TRANSFER_THRESHOLD=32, S3_TRANSFER_CHUNK_SIZE=16, S3_TRANSFER_CONCURRENCY=4)
+    def test_transfer_config_splits_large_downloads(self):
+        config = get_transfer_config()
+        self.assertEqual((config.multipart_threshold, config.multipart_chunksize, config.max_concurrency), (32, 16, 4))
+        self.assertTrue(config.use_threads)
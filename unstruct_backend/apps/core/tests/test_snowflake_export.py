@@ -0,0 +1,76 @@
+import datetime
+import uuid
+
+import pyarrow as pa
+from django.test import SimpleTestCase
+
+from apps.common.utils.snowflake_local import LocalSnowflake
+from apps.common.utils.snowflake_utils import SnowflakeManager, close_pools
+
+
+def results(values, vendor="Acme", names=None):
+    return pa.table({
+        "TASK_ID": pa.array(["t1"] * len(values)),
+        "ASSET_ID": pa.array([f"a{i}" for i in range(len(values))]),
+        "ASSET": pa.array(names or [f"doc{i}.pdf" for i in range(len(values))]),
+        "EXTRACTION_TYPE": pa.array(["EXTRACT"] * len(values)),
+        "TOTAL": pa.array(values, type=pa.float64()),
+        "DUE": pa.array([datetime.date(2024, 1, 1)] * len(values)),
+        "VENDOR": pa.array([vendor] * len(values)),
+    })
+
+
+class SnowflakeBulkLoadTestCase(SimpleTestCase):
+    def setUp(self):
+        self.snowflake = LocalSnowflake()
+        config = {field: "x" for field in ("user", "password", "warehouse", "database", "schema", "role")}
+        self.manager = SnowflakeManager(
+            {**config, "account": uuid.uuid4().hex}, connect=lambda config: self.snowflake.connect(**config),
+            rows_per_file=2,
+        )
+        self.addCleanup(close_pools)
+
+    def test_chunked_files_are_loaded_with_one_copy(self):
+        result = self.manager.bulk_load(results([1, 2, 3, 4, 5]), "task_results")
+
+        self.assertEqual(result["files"], 3)
+        self.assertEqual(result["rows_uploaded"], 5)
+        self.assertEqual([row["TOTAL"] for row in self.snowflake.rows("TASK_RESULTS")], [1, 2, 3, 4, 5])
+        self.assertEqual(self.snowflake.columns("TASK_RESULTS")["DUE"], "DATE")
+        self.assertEqual(sum(sql.startswith("COPY INTO") for sql in self.snowflake.statements), 1)
+        self.assertEqual(sum(sql.startswith("PUT") for sql in self.snowflake.statements), 1)
+        self.assertEqual(self.snowflake.stages, {})
+
+    def test_merge_updates_matching_rows(self):
+        self.manager.bulk_load(results([1, 2]), "task_results")
+        result = self.manager.bulk_load(results([10, 20, 30], vendor="Globex"), "task_results", mode="merge")
+
+        self.assertEqual((result["rows_inserted"], result["rows_updated"]), (1, 2))
+        rows = self.snowflake.rows("TASK_RESULTS")
+        self.assertEqual([row["TOTAL"] for row in rows], [10, 20, 30])
+        self.assertEqual({row["VENDOR"] for row in rows}, {"Globex"})
+        self.assertEqual(set(self.snowflake.tables), {"TASK_RESULTS"})
+
+    def test_merge_keeps_assets_sharing_a_name(self):
+        result = self.manager.bulk_load(results([1, 2], names=["scan.pdf"] * 2), "task_results", mode="merge")
+
+        self.assertEqual(result["rows_inserted"], 2)
+        self.assertEqual([row["TOTAL"] for row in self.snowflake.rows("TASK_RESULTS")], [1, 2])
+
+    def test_new_fields_become_columns(self):
+        self.manager.bulk_load(results([1]), "task_results")
+        self.manager.bulk_load(results([2]).append_column("PO_NUMBER", pa.array(["PO-7"])), "task_results")
+
+        self.assertEqual(self.snowflake.columns("TASK_RESULTS")["PO_NUMBER"], "VARCHAR")
+        self.assertEqual([row["PO_NUMBER"] for row in self.snowflake.rows("TASK_RESULTS")], [None, "PO-7"])
+
+    def test_connections_are_reused(self):
+        for _ in range(3):
+            self.manager.bulk_load(results([1]), "task_results")
+        self.assertEqual(self.snowflake.connections, 1)
+
+    def test_invalid_requests_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.manager.bulk_load(results([1]), "results; DROP TABLE users")
+        with self.assertRaises(ValueError):
+            self.manager.bulk_load(results([1]).drop(["EXTRACTION_TYPE"]), "task_results", mode="merge")
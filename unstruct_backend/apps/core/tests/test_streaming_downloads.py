@@ -0,0 +1,140 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.common.utils.dropbox_utils import DropboxService
+from apps.common.utils.gdrive_utils import GoogleDriveService
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+class DropboxStreamingDownloadTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "video.mp4")
+        self.service = DropboxService("token")
+        self.service.client = mock.Mock()
+        self.service.client.files_get_temporary_link.return_value = SimpleNamespace(link="https://dl/video.mp4")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streams_in_chunks_and_reports_progress(self):
+        received = []
+        with mock.patch("apps.common.utils.dropbox_utils.requests.get", return_value=FakeResponse(200, b"x" * 10)):
+            self.service.download_file("/video.mp4", self.path, chunk_size=4, progress=received.append)
+
+        self.assertEqual(received, [4, 4, 2])
+        self.assertEqual(os.path.getsize(self.path), 10)
+
+    def test_resumes_after_existing_bytes(self):
+        with open(self.path, "wb") as f:
+            f.write(b"0123")
+
+        with mock.patch(
+            "apps.common.utils.dropbox_utils.requests.get", return_value=FakeResponse(206, b"4567")
+        ) as get:
+            self.service.download_file("/video.mp4", self.path, chunk_size=4)
+
+        self.assertEqual(get.call_args.kwargs["headers"], {"Range": "bytes=4-"})
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"01234567")
+
+    def test_retries_from_partial_file(self):
+        calls = []
+
+        def flaky_get(url, headers, stream, timeout):
+            calls.append(headers)
+            if len(calls) == 1:
+                return FakeResponse(500, b"")
+            return FakeResponse(200, b"data")
+
+        with mock.patch("apps.common.utils.dropbox_utils.requests.get", side_effect=flaky_get), \
+                mock.patch("apps.common.utils.dropbox_utils.time.sleep"):
+            self.service.download_file("/video.mp4", self.path, retries=2)
+
+        self.assertEqual(len(calls), 2)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"data")
+
+
+class FakeDriveFiles:
+    """files() of a Drive client serving one file, answering media requests by their Range header"""
+
+    def __init__(self, body, mime_type="video/mp4"):
+        self.body = body
+        self.mime_type = mime_type
+        self.ranges = []
+
+    def get(self, fileId, fields):
+        metadata = {"id": fileId, "name": "video.mp4", "mimeType": self.mime_type}
+        if self.body is not None:
+            metadata["size"] = str(len(self.body))
+        return SimpleNamespace(execute=lambda: metadata)
+
+    def get_media(self, fileId):
+        request = SimpleNamespace(headers={})
+
+        def execute(num_retries=0):
+            self.ranges.append(request.headers["Range"])
+            start, end = map(int, request.headers["Range"][len("bytes="):].split("-"))
+            return self.body[start:end + 1]
+
+        request.execute = execute
+        return request
+
+
+class DriveStreamingDownloadTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "video.mp4")
+        self.files = FakeDriveFiles(b"0123456789")
+        self.service = GoogleDriveService(oauth_tokens={"access_token": "token"})
+        self.service.service = SimpleNamespace(files=lambda: self.files)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resumes_with_range_requests(self):
+        with open(self.path, "wb") as f:
+            f.write(b"0123")
+        received = []
+
+        self.service.download_file("file-id", self.path, chunk_size=4, progress=received.append)
+
+        self.assertEqual(self.files.ranges, ["bytes=4-7", "bytes=8-9"])
+        self.assertEqual(received, [4, 2])
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"0123456789")
+
+    def test_files_without_a_size_are_refused(self):
+        # Drive omits the size of native Docs, Sheets and Slides
+        self.files.body = None
+        self.files.mime_type = "application/vnd.google-apps.document"
+
+        with self.assertRaisesMessage(Exception, "no size"):
+            self.service.download_file("file-id", self.path)
+
+        self.assertEqual(self.files.ranges, [])
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.services.stripe_service import StripeService
+
+User = get_user_model()
+
+
+def stripe_subscription(product_name="Pro"):
+    return SimpleNamespace(
+        id="sub_1",
+        current_period_start=1704067200,
+        current_period_end=1706745600,
+        plan=SimpleNamespace(product=SimpleNamespace(name=product_name)),
+    )
+
+
+@override_settings(STRIPE_SECRET_KEY="sk_test", STRIPE_WEBHOOK_SECRET="whsec_test")
+class SubscriptionCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.organization = self.user.personal_organization
+        customers = mock.patch("stripe.Customer.list", return_value=SimpleNamespace(data=[SimpleNamespace(id="cus_1")]))
+        subscriptions = mock.patch("stripe.Subscription.list", return_value=SimpleNamespace(data=[stripe_subscription()]))
+        self.customers = customers.start()
+        self.subscriptions = subscriptions.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_one_lookup_resolves_status_plan_and_period(self):
+        service = StripeService()
+        subscription = service.get_subscription_by_email("owner@example.com")
+        self.assertEqual((subscription["status"], subscription["plan"]), ("active", "pro"))
+        self.assertEqual(service.get_subscription_type_by_email("owner@example.com"), "pro")
+        self.assertEqual(service.get_subscription_info_by_email("owner@example.com")["subscription_id"], "sub_1")
+        self.assertEqual(self.customers.call_count, 1)
+        self.assertEqual(self.subscriptions.call_count, 1)
+
+    def test_task_quota_is_checked_in_one_pass(self):
+        self.organization.check_usage(pdfs=40, video_gb=1.0)
+        self.organization.add_usage(pdfs=40, video_gb=1.0)
+        self.assertEqual(self.organization.pdfs_processed_this_month, 40)
+        with self.assertRaises(ValidationError):
+            self.organization.check_usage(pdfs=61)
+        self.assertEqual(self.customers.call_count, 1)
+
+    def test_webhook_invalidates_the_cached_subscription(self):
+        StripeService().get_subscription_by_email("owner@example.com")
+        event = {
+            "type": "customer.subscription.updated",
+            "data": {"object": {"object": "subscription", "customer": "cus_1"}},
+        }
+        with mock.patch("stripe.Webhook.construct_event", return_value=event), \
+                mock.patch("stripe.Customer.retrieve", return_value=SimpleNamespace(email="owner@example.com")):
+            response = self.client.post(reverse("stripe_webhook"), data=b"{}", content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        self.subscriptions.return_value = SimpleNamespace(data=[])
+        self.assertEqual(StripeService().get_subscription_type_by_email("owner@example.com"), "free")
+        self.assertEqual(self.customers.call_count, 2)
+
+    def test_webhook_rejects_bad_signatures(self):
+        response = self.client.post(
+            reverse("stripe_webhook"), data=b"{}", content_type="application/json", HTTP_STRIPE_SIGNATURE="bad"
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,67 @@
+import json
+
+from django.test import TestCase
+
+from apps.core.models import Action, Asset, Project, Task, TaskResult, TASK_RESULT_STATUS
+from apps.core.models.action import ACTION_TYPE
+
+
+class TaskResultTestCase(TestCase):
+    def setUp(self):
+        project = Project.objects.create(name="Invoices", description="")
+        self.task = Task.objects.create(name="Extract", project=project, system_prompt="", total_files=3)
+        self.assets = [
+            Asset.objects.create(name=f"doc{i}.pdf", description="", project=project, url=f"https://example.com/doc{i}.pdf")
+            for i in range(3)
+        ]
+        self.total = Action.objects.create(output_column_name="total", description="Invoice total")
+        self.summary = Action.objects.create(
+            output_column_name="summary", description="Summarize", action_type=ACTION_TYPE.GENERATION
+        )
+
+    def record(self, index, response, failed=False):
+        self.task.record_asset_results(self.assets[index], index, [(self.total, response)], failed=failed)
+
+    def test_rows_are_typed_and_counted(self):
+        self.record(0, {"total": 12.5, "total_confidence": "0.9", "total_reference": "Page 1"})
+        self.record(1, {"error": "Invalid JSON response"}, failed=True)
+
+        ok, failed = TaskResult.objects.filter(task=self.task).order_by("position")
+        self.assertEqual(ok.value, 12.5)
+        self.assertEqual(ok.confidence, 0.9)
+        self.assertEqual(ok.reference, "Page 1")
+        self.assertEqual(failed.status, TASK_RESULT_STATUS.ERROR)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.processed_files, self.task.failed_files), (2, 1))
+
+    def test_process_results_view_keeps_asset_order(self):
+        # Assets finish out of order
+        for index in (2, 0, 1):
+            self.record(index, {"total": index, "total_confidence": 1, "total_reference": "p1"})
+        self.task.record_generations([(self.summary, "Three invoices")])
+
+        results = self.task.get_process_results()
+        self.assertEqual([item["asset"] for item in results["extractions"]["total"]], ["doc0.pdf", "doc1.pdf", "doc2.pdf"])
+        self.assertEqual(
+            results["extractions"]["total"][1],
+            {
+                "asset": "doc1.pdf",
+                "data": {"total": 1, "total_confidence": 1.0, "total_reference": "p1"},
+                "source": "https://example.com/doc1.pdf",
+            },
+        )
+        self.assertEqual(results["generations"], {"summary": "Three invoices"})
+
+        preview = self.task.get_process_results(limit=2)
+        self.assertEqual([item["asset"] for item in preview["extractions"]["total"]], ["doc0.pdf", "doc1.pdf"])
+
+    def test_tasks_without_rows_fall_back_to_saved_results(self):
+        saved = {"extractions": {"total": [{"asset": "old.pdf", "data": {"total": 1}, "source": ""}]}}
+        self.task.process_results = json.dumps(saved)
+        self.task.save()
+        self.assertEqual(self.task.get_process_results(), saved)
+
+    def test_clear_results(self):
+        self.record(0, {"total": 1})
+        self.task.clear_results()
+        self.assertFalse(TaskResult.all_objects.filter(task=self.task).exists())
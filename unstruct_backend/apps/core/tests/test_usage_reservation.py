@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from apps.core.models import RESERVATION_STATUS, Project, Task, UsageReservation
+from apps.core.services.job_queue import DatabaseJobBroker
+
+User = get_user_model()
+
+
+@override_settings(STRIPE_SECRET_KEY="", JOB_MAX_ATTEMPTS=1)
+class UsageReservationTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="owner", email="owner@example.com", password="password123")
+        self.organization = user.personal_organization
+        project = Project.objects.create(name="Invoices", description="", organization=self.organization)
+        self.task = Task.objects.create(name="Extract", project=project, system_prompt="", organization=self.organization)
+
+    def test_reservation_charges_the_whole_task(self):
+        reservation = self.organization.reserve_usage(self.task, pdfs=6, video_gb=0.25)
+        self.assertEqual(reservation.status, RESERVATION_STATUS.RESERVED)
+        self.assertEqual(self.organization.pdfs_processed_this_month, 6)
+        self.assertEqual(self.organization.video_gb_processed_this_month, 0.25)
+
+    def test_reservation_over_the_limit_charges_nothing(self):
+        self.organization.reserve_usage(self.task, pdfs=6)
+        with self.assertRaises(ValidationError):
+            self.organization.reserve_usage(self.task, pdfs=5)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.pdfs_processed_this_month, 6)
+        self.assertEqual(UsageReservation.objects.count(), 1)
+
+    def test_release_gives_usage_back_once(self):
+        reservation = self.organization.reserve_usage(self.task, pdfs=6)
+        self.assertTrue(reservation.release())
+        self.assertFalse(reservation.release())
+        self.assertFalse(reservation.commit())
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.pdfs_processed_this_month, 0)
+
+    def test_committed_usage_stays_charged(self):
+        reservation = self.organization.reserve_usage(self.task, pdfs=6)
+        self.assertTrue(reservation.commit())
+        self.assertFalse(reservation.release())
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.pdfs_processed_this_month, 6)
+
+    def test_failed_job_releases_its_reservation(self):
+        reservation = self.organization.reserve_usage(self.task, pdfs=6)
+        broker = DatabaseJobBroker()
+        broker.enqueue("process_task", payload={"reservation_id": str(reservation.id)}, task=self.task)
+        [job] = broker.claim("worker-a")
+        broker.fail(job, "boom")
+
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, RESERVATION_STATUS.RELEASED)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.pdfs_processed_this_month, 0)
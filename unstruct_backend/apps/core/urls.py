@@ -4,12 +4,14 @@ from rest_framework import routers
 from apps.core.views import (
     ActionViewSet, AssetViewSet, ProjectViewSet, TaskViewSet, UserViewSet,
     GoogleDriveFilesView, GoogleDriveAuthView, GoogleDriveCallbackView, OrganizationViewSet,
-    HealthCheckView
+    HealthCheckView, StripeWebhookView, LocalUploadPartView
 )
 from apps.core.views.transformation_template_view import TransformationTemplateViewSet
 
 urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health_check'),
+    path('stripe/webhook/', StripeWebhookView.as_view(), name='stripe_webhook'),
+    path('uploads/parts/<str:token>/', LocalUploadPartView.as_view(), name='asset_upload_part'),
     path('google-drive/files/', GoogleDriveFilesView.as_view(), name='google_drive_files'),
     path('google-drive/auth/', GoogleDriveAuthView.as_view(), name='google_drive_auth'),
     path('google-drive/callback/', GoogleDriveCallbackView.as_view(), name='google_drive_callback'),
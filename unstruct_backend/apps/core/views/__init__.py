@@ -1,10 +1,12 @@
 """Core models for the Unstruct backend application."""
 
 from .action_view import ActionViewSet
+from .asset_upload_view import LocalUploadPartView
 from .asset_view import AssetViewSet
 from .auth_views import CognitoLoginView
 from .google_drive_view import GoogleDriveFilesView, GoogleDriveAuthView, GoogleDriveCallbackView
 from .project_view import ProjectViewSet
+from .stripe_webhook_view import StripeWebhookView
 from .task_view import TaskViewSet
 from .user_view import UserViewSet
 from .views import ApiRoot, HealthCheckView
@@ -17,10 +19,12 @@ __all__ = [
     "ActionViewSet",
     "TaskViewSet",
     "AssetViewSet",
+    "LocalUploadPartView",
     "UserViewSet",
     "OrganizationViewSet",
     "GoogleDriveFilesView",
     "GoogleDriveAuthView",
     "GoogleDriveCallbackView",
     "HealthCheckView",
+    "StripeWebhookView",
 ]
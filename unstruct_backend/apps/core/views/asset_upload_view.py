@@ -0,0 +1,31 @@
+import io
+import logging
+
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.core.services.asset_uploads import LocalUploadStorage, UploadError, get_upload_storage
+
+logger = logging.getLogger(__name__)
+
+
+class LocalUploadPartView(APIView):
+    """Receives upload parts for the local upload backend, standing in for S3's presigned part URLs"""
+
+    permission_classes = [AllowAny]
+    authentication_classes = []  # Part URLs are verified by their signed token instead
+
+    def put(self, request, token):
+        storage = get_upload_storage()
+        if not isinstance(storage, LocalUploadStorage):
+            return Response({"error": "Uploads go to object storage"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            etag = storage.write_part(token, request.stream or io.BytesIO())
+        except UploadError as e:
+            logger.warning(f"Rejected upload part: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        response = Response(status=status.HTTP_200_OK)
+        response["ETag"] = f'"{etag}"'
+        return response
@@ -9,15 +9,14 @@ import traceback
 from django.conf import settings
 
 from apps.common.views import NBaselViewSet
-from apps.core.models import Asset, Project
-from apps.core.models.asset import ASSET_UPLOAD_SOURCE
+from apps.core.models import Asset, Job, Project
+from apps.core.models.asset import ASSET_UPLOAD_SOURCE, file_type_from_name
 from apps.core.serializers import AssetSerializer
 from apps.core.models.asset import ASSET_FILE_TYPE
-from apps.agent_management.services.ai_service.vector_store import VectorStore
-from apps.common.utils.gdrive_utils import GoogleDriveService
-from apps.common.utils.s3_utils import S3Service
-from apps.common.utils.dropbox_utils import DropboxService
 from apps.common.mixins.organization_mixin import OrganizationMixin
+from apps.core.services.asset_ingestion import CREDENTIAL_FIELDS, INGEST_ASSETS
+from apps.core.services.asset_uploads import AssetUploads, UploadError
+from apps.core.services.job_queue import get_job_broker
 
 
 class AssetViewSet(OrganizationMixin, NBaselViewSet):
@@ -50,34 +49,81 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
             logger.error(f"Project not found for project_id: {project_id}")
             return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        assets = []
-        for file in files:
-            logger.debug(f"Processing file: {file.name}")
-            asset = Asset(
-                name=file.name,
-                description=f"Uploaded file: {file.name}",
-                project=project,
-                upload_source=ASSET_UPLOAD_SOURCE.UPLOAD,
-                file_type=self.get_file_type(file.name),
-            )
-            asset.save()
+        # Files are streamed to upload storage and registered in one insert; large files
+        # should use the direct uploads endpoints, which bypass Django entirely
+        assets = AssetUploads(project, user=request.user).put_files(files)
 
-            # Save the file using Django's default file storage
+        logger.debug(f"Finished processing {len(assets)} assets for project_id: {project_id}")
+        serializer = self.get_serializer(assets, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-            local_path = f"/tmp/unstruct/assets/{asset.id}/{file.name}"
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)  # Ensure the directory exists
-            with open(local_path, 'wb') as destination:
-                for chunk in file.chunks():
-                    destination.write(chunk)
-            asset.url = local_path  # Update the URL accordingly
-            asset.save()
-            logger.debug(f"Saved asset id: {asset.id}; file_path: {local_path}; url: {asset.url}")
-            assets.append(asset)
+    def _upload_project(self, request):
+        project_id = request.data.get("project_id")
+        if not project_id:
+            return None, Response({"error": "Project ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+        project = Project.objects.filter(id=project_id, organization=self.get_organization()).first()
+        if project is None:
+            return None, Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
+        return project, None
+
+    @action(detail=False, methods=["post"], url_path="uploads")
+    def start_uploads(self, request):
+        """Open direct multipart uploads for files given as {"name", "size", "content_type"}.
+
+        Each file gets presigned part URLs to PUT its `part_size` byte parts to, and an
+        upload token to send back to `uploads/complete` with the ETags of the parts.
+        """
+        project, error = self._upload_project(request)
+        if error:
+            return error
+        files = request.data.get("files") or []
+        if not files or any(not isinstance(file, dict) or not file.get("name") for file in files):
+            return Response({"error": "files with a name are required"}, status=status.HTTP_400_BAD_REQUEST)
+        for file in files:
+            try:
+                file["size"] = int(file.get("size") or 0)
+            except (TypeError, ValueError):
+                file["size"] = -1
+            if file["size"] < 0:
+                return Response(
+                    {"error": f"size of {file['name']} must be a non-negative number of bytes"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        uploads = AssetUploads(project, user=request.user).start(files)
+        for upload in uploads:
+            upload["part_urls"] = [request.build_absolute_uri(url) for url in upload["part_urls"]]
+        return Response({"uploads": uploads}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="uploads/complete")
+    def complete_uploads(self, request):
+        """Assemble uploaded parts and create all the uploads' assets in one insert"""
+        project, error = self._upload_project(request)
+        if error:
+            return error
+        completions = request.data.get("uploads") or []
+        if not completions:
+            return Response({"error": "uploads are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        logger.debug(f"Finished processing {len(assets)} assets for project_id: {project_id}")
+        try:
+            assets = AssetUploads(project, user=request.user).complete(completions)
+        except (UploadError, KeyError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = self.get_serializer(assets, many=True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="uploads/abort")
+    def abort_uploads(self, request):
+        """Discard uploads the client gave up on, along with their stored parts"""
+        project, error = self._upload_project(request)
+        if error:
+            return error
+        try:
+            AssetUploads(project, user=request.user).abort(request.data.get("upload_tokens") or [])
+        except UploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=False, methods=["post"])
     def assets(self, request):
         """Create assets from various sources"""
@@ -93,7 +139,7 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
             return self.create_assets_for_project(request)
         
         # Handle Google Drive uploads
-        if upload_source == ASSET_UPLOAD_SOURCE.GDRIVE:
+        if upload_source == ASSET_UPLOAD_SOURCE.GOOGLE_DRIVE:
             return self.create_assets_from_gdrive(request)
             
         # Handle S3 uploads
@@ -110,11 +156,10 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
         )
 
     def create_assets_from_gdrive(self, request):
-        """Create assets from Google Drive files or folders"""
+        """Queue a background import of Google Drive files or folders"""
         project_id = request.data.get("project_id")
         file_ids = request.data.get("file_ids", [])  # List of file IDs
         folder_id = request.data.get("folder_id")    # Optional folder ID
-        recursive = request.data.get("recursive", True)  # For folder processing
         service_account_info = request.data.get("service_account_info")
 
         if not project_id:
@@ -132,69 +177,19 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            project = Project.objects.get(id=project_id)
-        except Project.DoesNotExist:
-            return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        try:
-            # Initialize Google Drive service with service account
-            gdrive_service = GoogleDriveService(service_account_info=service_account_info)
-            gdrive_service.authenticate()
-
-            assets = []
-
-            # Process individual files if provided
-            if file_ids:
-                for file_info in gdrive_service.get_files_by_ids(file_ids):
-                    asset = self._create_asset_from_gdrive_file(
-                        project=project,
-                        gdrive_file_id=file_info['id'],
-                        file_info=file_info,
-                        service_account_info=service_account_info
-                    )
-                    assets.append(asset)
-
-            # Process folder if provided
-            if folder_id:
-                for file_info in gdrive_service.list_folder_contents(folder_id, recursive=recursive):
-                    asset = self._create_asset_from_gdrive_file(
-                        project=project,
-                        gdrive_file_id=file_info['id'],
-                        file_info=file_info,
-                        service_account_info=service_account_info
-                    )
-                    assets.append(asset)
-
-            serializer = self.get_serializer(assets, many=True)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def _create_asset_from_gdrive_file(self, project, gdrive_file_id, file_info, service_account_info):
-        """Helper method to create an asset from a Google Drive file"""
-        asset = Asset(
-            name=file_info['name'],
-            description=f"Google Drive file: {file_info['name']}",
-            project=project,
-            upload_source=ASSET_UPLOAD_SOURCE.GDRIVE,
-            file_type=self.get_file_type(file_info['name']),
-            gdrive_file_id=gdrive_file_id,
-            gdrive_credentials=service_account_info,
-        )
-        asset.save()
-
-        return asset
+        return self._enqueue_ingestion(request, project_id, ASSET_UPLOAD_SOURCE.GOOGLE_DRIVE, {
+            "file_ids": file_ids,
+            "folder_id": folder_id,
+            "recursive": request.data.get("recursive", True),
+            "service_account_info": service_account_info,
+        })
 
     def create_assets_from_s3(self, request):
-        """Create assets from S3 bucket"""
+        """Queue a background import of S3 keys or prefixes"""
         project_id = request.data.get("project_id")
         bucket = request.data.get("bucket")
         keys = request.data.get("keys", [])  # List of S3 keys
         prefix = request.data.get("prefix")  # Optional prefix/folder path
-        recursive = request.data.get("recursive", True)
-        aws_credentials = request.data.get("aws_credentials")
 
         if not project_id:
             return Response({"error": "Project ID is required"}, status=status.HTTP_400_BAD_REQUEST)
@@ -208,70 +203,19 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            project = Project.objects.get(id=project_id)
-        except Project.DoesNotExist:
-            return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        try:
-            # Initialize S3 service
-            s3_service = S3Service(aws_credentials)
-            s3_service.authenticate()
-
-            assets = []
-
-            # Process individual files if provided
-            if keys:
-                for key in keys:
-                    file_info = s3_service.get_file_by_key(bucket, key)
-                    asset = self._create_asset_from_s3_file(
-                        project=project,
-                        bucket=bucket,
-                        key=key,
-                        file_info=file_info,
-                        aws_credentials=aws_credentials
-                    )
-                    assets.append(asset)
-
-            # Process prefix/folder if provided
-            if prefix:
-                for file_info in s3_service.get_files_from_bucket(bucket, prefix, recursive):
-                    asset = self._create_asset_from_s3_file(
-                        project=project,
-                        bucket=bucket,
-                        key=file_info['id'],
-                        file_info=file_info,
-                        aws_credentials=aws_credentials
-                    )
-                    assets.append(asset)
-
-            serializer = self.get_serializer(assets, many=True)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def _create_asset_from_s3_file(self, project, bucket, key, file_info, aws_credentials):
-        """Helper method to create an asset from an S3 file"""
-        asset = Asset(
-            name=file_info['name'],
-            description=f"S3 file: {file_info['name']}",
-            project=project,
-            upload_source=ASSET_UPLOAD_SOURCE.AWS_S3,
-            file_type=self.get_file_type(file_info['name']),
-            s3_bucket=bucket,
-            s3_key=key,
-            s3_credentials=aws_credentials
-        )
-        asset.save()
-        return asset
+        return self._enqueue_ingestion(request, project_id, ASSET_UPLOAD_SOURCE.AWS_S3, {
+            "bucket": bucket,
+            "keys": keys,
+            "prefix": prefix,
+            "recursive": request.data.get("recursive", True),
+            "aws_credentials": request.data.get("aws_credentials"),
+        })
 
     def create_assets_from_dropbox(self, request):
-        """Create assets from Dropbox files or folders"""
+        """Queue a background import of Dropbox files or folders"""
         project_id = request.data.get("project_id")
         paths = request.data.get("paths", [])  # List of file paths
         folder_path = request.data.get("folder_path")  # Optional folder path
-        recursive = request.data.get("recursive", True)
         access_token = request.data.get("access_token")
 
         if not project_id:
@@ -289,82 +233,55 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        return self._enqueue_ingestion(request, project_id, ASSET_UPLOAD_SOURCE.DROPBOX, {
+            "paths": paths,
+            "folder_path": folder_path,
+            "recursive": request.data.get("recursive", True),
+            "access_token": access_token,
+        })
+
+    def _enqueue_ingestion(self, request, project_id, upload_source, payload):
+        """Queue an ingest_assets job; listing and asset creation run on a job worker"""
         try:
-            project = Project.objects.get(id=project_id)
+            project = Project.objects.get(id=project_id, organization=self.get_organization())
         except Project.DoesNotExist:
             return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            # Initialize Dropbox service
-            dropbox_service = DropboxService(access_token)
-            print(access_token)
-            dropbox_service.authenticate()
-
-            assets = []
-
-            # Process individual files if provided
-            if paths:
-                for path in paths:
-                    file_info = dropbox_service.get_file_by_id(path)
-                    asset = self._create_asset_from_dropbox_file(
-                        project=project,
-                        file_path=path,
-                        file_info=file_info,
-                        access_token=access_token
-                    )
-                    assets.append(asset)
-
-            # Process folder if provided
-            if folder_path:
-                for file_info in dropbox_service.list_folder_contents(folder_path, recursive):
-                    asset = self._create_asset_from_dropbox_file(
-                        project=project,
-                        file_path=file_info['id'],
-                        file_info=file_info,
-                        access_token=access_token
-                    )
-                    assets.append(asset)
-
-            serializer = self.get_serializer(assets, many=True)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    def _create_asset_from_dropbox_file(self, project, file_path, file_info, access_token):
-        """Helper method to create an asset from a Dropbox file"""
-        asset = Asset(
-            name=file_info['name'],
-            description=f"Dropbox file: {file_info['name']}",
-            project=project,
-            upload_source=ASSET_UPLOAD_SOURCE.DROPBOX,
-            file_type=self.get_file_type(file_info['name']),
-            dropbox_path=file_path,
-            dropbox_access_token=access_token
+        # Credentials are encrypted and dropped from the job once it finishes
+        secrets = {field: payload.pop(field) for field in CREDENTIAL_FIELDS if field in payload}
+        job = get_job_broker().enqueue(
+            INGEST_ASSETS,
+            payload={"project_id": str(project.id), "upload_source": upload_source, **payload},
+            organization=project.organization,
+            user=request.user if request.user.is_authenticated else None,
+            secrets=secrets,
         )
-        asset.save()
-        return asset
+        return Response(self._ingestion_status(job), status=status.HTTP_202_ACCEPTED)
+
+    def _ingestion_status(self, job):
+        return {
+            "job_id": str(job.id),
+            "job_status": job.status,
+            "attempts": job.attempts,
+            "error": job.error,
+            "project_id": job.payload.get("project_id"),
+            "upload_source": job.payload.get("upload_source"),
+            "progress": job.progress,
+            "result": job.result,
+        }
+
+    @action(detail=False, methods=["get"], url_path=r"ingestions/(?P<job_id>[^/.]+)")
+    def ingestion_status(self, request, job_id=None):
+        """Return the status and progress counts of an asset ingestion job"""
+        job = Job.objects.filter(
+            id=job_id, kind=INGEST_ASSETS, organization=self.get_organization()
+        ).first()
+        if job is None:
+            return Response({"error": "Ingestion job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._ingestion_status(job), status=status.HTTP_200_OK)
 
     def get_file_type(self, filename):
-        extension = filename.split(".")[-1].lower()
-        if extension == "pdf":
-            return ASSET_FILE_TYPE.PDF
-        elif extension in ["doc", "docx"]:
-            return ASSET_FILE_TYPE.DOC
-        elif extension == "txt":
-            return ASSET_FILE_TYPE.TXT
-        elif extension == 'mp4':
-            return ASSET_FILE_TYPE.MP4
-        elif extension == 'jpeg':
-            return ASSET_FILE_TYPE.JPEG
-        elif extension == 'jpg':
-            return ASSET_FILE_TYPE.JPG
-        elif extension == 'png':
-            return ASSET_FILE_TYPE.PNG
-        elif extension == 'mp3':
-            return ASSET_FILE_TYPE.MP3
-        else:
-            return ASSET_FILE_TYPE.OTHER
+        return file_type_from_name(filename)
 
     def handle_file_upload(self, request):
         file_key = request.data.get('file_key')
@@ -388,7 +305,8 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
             project=project,
             upload_source=ASSET_UPLOAD_SOURCE.UPLOAD,
             file_type=self.get_file_type(file_key),
-            url=f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION}.amazonaws.com/{file_key}"
+            url=f"https://{settings.AWS_STORAGE_BUCKET_NAME}.s3.{settings.AWS_S3_REGION}.amazonaws.com/{file_key}",
+            storage_key=file_key,
         )
         asset.save()
 
@@ -554,15 +472,8 @@ class AssetViewSet(OrganizationMixin, NBaselViewSet):
         """Soft delete the asset"""
         try:
             instance = self.get_object()
-            # Clean up any temporary files
-            try:
-                if instance.upload_source == ASSET_UPLOAD_SOURCE.GOOGLE_DRIVE:
-                    download_dir = f"/tmp/unstruct/gdrive/{instance.id}"
-                    if os.path.exists(download_dir):
-                        import shutil
-                        shutil.rmtree(download_dir)
-            except Exception as e:
-                logger.warning(f"Failed to clean up downloaded files: {e}")
+            # Downloaded copies live in the shared asset cache, which may serve other
+            # assets with the same content; they are evicted once unused
             
             # Perform soft delete (default behavior)
             instance.delete()
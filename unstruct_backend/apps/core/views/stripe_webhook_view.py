@@ -0,0 +1,57 @@
+import logging
+
+import stripe
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.core.services.stripe_service import StripeService, invalidate_subscription
+
+logger = logging.getLogger(__name__)
+
+# Events after which a customer's cached subscription may be out of date
+SUBSCRIPTION_EVENTS = (
+    "customer.subscription.",
+    "customer.updated",
+    "customer.deleted",
+    "invoice.paid",
+    "invoice.payment_failed",
+    "checkout.session.completed",
+)
+
+
+class StripeWebhookView(APIView):
+    """Receives Stripe events and drops the cached subscription of the customer they concern"""
+
+    permission_classes = [AllowAny]
+    authentication_classes = []  # Requests are verified by their Stripe signature instead
+
+    def post(self, request):
+        stripe_service = StripeService()
+        try:
+            event = stripe_service.construct_webhook_event(request.body, request.headers.get("Stripe-Signature", ""))
+        except (ValueError, stripe.error.SignatureVerificationError) as e:
+            logger.warning(f"Rejected Stripe webhook: {e}")
+            return Response({"error": "Invalid webhook signature."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not event["type"].startswith(SUBSCRIPTION_EVENTS):
+            return Response({"received": True}, status=status.HTTP_200_OK)
+
+        obj = event["data"]["object"]
+        if obj.get("object") == "customer":
+            email = obj.get("email")
+        else:
+            email = obj.get("customer_email") or obj.get("customer_details", {}).get("email")
+            if not email and obj.get("customer"):
+                try:
+                    email = stripe_service.get_customer_email(obj["customer"])
+                except stripe.error.StripeError as e:
+                    # Let Stripe retry the delivery; the cache entry expires on its own otherwise
+                    logger.error(f"Stripe error resolving customer of {event['type']} event: {e}")
+                    return Response({"error": "Customer lookup failed."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        if email:
+            invalidate_subscription(email)
+            logger.info(f"Invalidated cached subscription after {event['type']} for {email}")
+        return Response({"received": True}, status=status.HTTP_200_OK)
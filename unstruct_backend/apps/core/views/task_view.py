@@ -7,24 +7,26 @@ import os
 import time
 
 from apps.common.views import NBaselViewSet
-from apps.core.models import Task
+from apps.core.models import Task, JOB_STATUS
 from apps.core.serializers import TaskSerializer
-from apps.agent_management.services.task_processor import TaskProcessor
+from apps.core.services.job_queue import ActiveJobExists, get_job_broker
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-import pandas as pd
 from django.http import HttpResponse
 from datetime import datetime
-import json
-from apps.common.utils.snowflake_utils import SnowflakeManager
 from apps.common.mixins.organization_mixin import OrganizationMixin
 from django.core.exceptions import ValidationError
 from apps.core.models.asset import ASSET_FILE_TYPE
+from apps.core.models.action import ACTION_TYPE
 from apps.common.middleware.timing_middleware import ViewTimingContextManager
 
 logger = logging.getLogger(__name__)
 
+# Result rows returned per page by the results endpoint, by default and at most
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 1000
+
 class TaskViewSet(OrganizationMixin, NBaselViewSet):
     name = "task"
     serializer_class = TaskSerializer
@@ -100,41 +102,56 @@ class TaskViewSet(OrganizationMixin, NBaselViewSet):
                 else:
                     timings.append("get_assets;dur=0;desc='Get Assets'")
             
+            # Processing is already queued or running: report the existing job instead of charging usage twice
+            active_job = task.jobs.filter(status__in=[JOB_STATUS.QUEUED, JOB_STATUS.RUNNING]).first()
+            if active_job:
+                response = Response(self._job_status(task, active_job), status=status.HTTP_202_ACCEPTED)
+                response["Server-Timing"] = ", ".join(timings)
+                return response
+
             with ViewTimingContextManager("process_assets") as timing:
+                # Total the task's usage first, so the plan is resolved and quota checked once per task
+                usage = {"pdfs": 0, "video_gb": 0.0, "audio_gb": 0.0}
                 for asset in assets:
-                    file_path = asset.get_file_path()
-                    size_in_gb = os.path.getsize(file_path) / (1024 * 1024 * 1024)
-                    
                     if asset.file_type == ASSET_FILE_TYPE.PDF:
-                        organization.can_process_pdf()
-                        organization.increment_pdf_count()
-                    elif asset.file_type == ASSET_FILE_TYPE.MP4:
-                        organization.can_process_video(size_in_gb)
-                        organization.add_video_usage(size_in_gb)
-                    elif asset.file_type == ASSET_FILE_TYPE.MP3:
-                        organization.can_process_audio(size_in_gb)
-                        organization.add_audio_usage(size_in_gb)
+                        usage["pdfs"] += 1
+                    elif asset.file_type in (ASSET_FILE_TYPE.MP4, ASSET_FILE_TYPE.MP3):
+                        file_path = asset.get_file_path()
+                        size_in_gb = os.path.getsize(file_path) / (1024 * 1024 * 1024)
+                        usage["video_gb" if asset.file_type == ASSET_FILE_TYPE.MP4 else "audio_gb"] += size_in_gb
+                reservation = organization.reserve_usage(task, **usage)
                 if hasattr(timing, 'duration') and timing.duration is not None:
                     timings.append(f"process_assets;dur={timing.duration:.2f};desc='Process Assets'")
                 else:
                     timings.append("process_assets;dur=0;desc='Process Assets'")
             
-            with ViewTimingContextManager("task_processing") as timing:
-                task.status = "RUNNING"
-                task.save()
-                
-                processor = TaskProcessor()
-                structured_output = processor.process(task)
-                
-                task.process_results = structured_output
-                task.status = "FINISHED"
-                task.save()
+            with ViewTimingContextManager("enqueue_task") as timing:
+                try:
+                    task.status = "PENDING"
+                    task.result_file_url = None
+                    task.save(update_fields=['status', 'result_file_url', 'updated_at'])
+                    job = get_job_broker().enqueue(
+                        "process_task",
+                        payload={"reservation_id": str(reservation.id)},
+                        task=task,
+                        organization=organization,
+                        user=request.user,
+                    )
+                except ActiveJobExists as e:
+                    # A concurrent request queued the task first
+                    reservation.release()
+                    response = Response(self._job_status(task, e.job), status=status.HTTP_202_ACCEPTED)
+                    response["Server-Timing"] = ", ".join(timings)
+                    return response
+                except Exception:
+                    reservation.release()
+                    raise
                 if hasattr(timing, 'duration') and timing.duration is not None:
-                    timings.append(f"task_processing;dur={timing.duration:.2f};desc='Task Processing'")
+                    timings.append(f"enqueue_task;dur={timing.duration:.2f};desc='Enqueue Task'")
                 else:
-                    timings.append("task_processing;dur=0;desc='Task Processing'")
-            
-            response = Response(structured_output, status=status.HTTP_200_OK)
+                    timings.append("enqueue_task;dur=0;desc='Enqueue Task'")
+
+            response = Response(self._job_status(task, job), status=status.HTTP_202_ACCEPTED)
             response["Server-Timing"] = ", ".join(timings)
             return response
             
@@ -151,65 +168,138 @@ class TaskViewSet(OrganizationMixin, NBaselViewSet):
                 task.save()
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=["get"], url_path="job")
+    def job_status(self, request, pk=None):
+        """Return the status of the most recent processing job for the task"""
+        task = self.get_object()
+        job = task.jobs.order_by("-created_at").first()
+        if not job:
+            return Response(
+                {"error": "This task has not been queued for processing."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(self._job_status(task, job), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="results")
+    def results(self, request, pk=None):
+        """Return the extraction results stored so far, in asset order; available while the task is running"""
+        task = self.get_object()
+        try:
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+            limit = min(max(int(request.query_params.get("limit", RESULTS_PAGE_SIZE)), 1), RESULTS_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "offset and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = task.results.filter(action_type=ACTION_TYPE.EXTRACTION).order_by("position", "created_at")
+        page = list(rows[offset:offset + limit + 1])
+        task.refresh_from_db(fields=['status', 'total_files', 'processed_files', 'failed_files'])
+        return Response({
+            "task_id": str(task.id),
+            "task_status": task.status,
+            "total_files": task.total_files,
+            "processed_files": task.processed_files,
+            "failed_files": task.failed_files,
+            "offset": offset,
+            "has_more": len(page) > limit,
+            "results": [{"field": row.field_name, **row.as_item()} for row in page[:limit]],
+        }, status=status.HTTP_200_OK)
+
+    def _job_status(self, task, job):
+        task.refresh_from_db(fields=[
+            'status', 'total_files', 'processed_files', 'failed_files', 'downloaded_bytes', 'result_file_url',
+            'llm_cache_hits', 'llm_cache_misses',
+        ])
+        return {
+            "job_id": str(job.id),
+            "job_status": job.status,
+            "attempts": job.attempts,
+            "error": job.error,
+            "task_id": str(task.id),
+            "task_status": task.status,
+            "total_files": task.total_files,
+            "processed_files": task.processed_files,
+            "failed_files": task.failed_files,
+            "downloaded_bytes": task.downloaded_bytes,
+            "progress": task.get_progress(),
+            "results_url": task.result_file_url,
+            "llm_cache": {"hits": task.llm_cache_hits, "misses": task.llm_cache_misses},
+        }
+
+    def _results_table(self, task):
+        """The task's results as an Arrow table (read from its Parquet file once materialized), or None if empty"""
+        from apps.agent_management.services.result_table import load_results_table
+
+        table = load_results_table(task)
+        return table if table.num_rows else None
+
+    def _export_response(self, task, body, content_type, extension):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        response = HttpResponse(body, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="task_results_{task.id}_{timestamp}.{extension}"'
+        return response
+
     @action(detail=True, methods=["get"], url_path="exporttoexcel")
     def export_to_excel(self, request, pk=None):
         try:
             task = self.get_object()
-            
-            if not task.process_results:
+            table = self._results_table(task)
+            if table is None:
                 return Response(
                     {"error": "No results available for this task."},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            # Parse the JSON string if it's a string
-            results_data = (
-                json.loads(task.process_results)
-                if isinstance(task.process_results, str)
-                else task.process_results
+
+            from apps.agent_management.services.result_table import table_to_excel
+
+            return self._export_response(
+                task,
+                table_to_excel(table),
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                "xlsx",
             )
-            
-            # Ensure results_data is a list
-            if not isinstance(results_data, list):
-                results_data = [results_data]
-            
-            # Flatten the JSON data
-            flattened_data = []
-            for result in results_data:
-                if 'extractions' in result:
-                    for extraction_type, extractions in result['extractions'].items():
-                        if isinstance(extractions, list):
-                            for item in extractions:
-                                row = {
-                                    'TASK_ID': str(task.id),
-                                    'EXTRACTION_TYPE': extraction_type,
-                                    'ASSET': item.get('asset', ''),
-                                    'SOURCE': item.get('source', '')
-                                }
-                                # Add all fields from the nested 'data' dictionary
-                                if 'data' in item:
-                                    # Convert data keys to uppercase
-                                    data_dict = {k.upper(): v for k, v in item['data'].items()}
-                                    row.update(data_dict)
-                                flattened_data.append(row)
-            
-            # Convert flattened data to DataFrame
-            df = pd.DataFrame(flattened_data)
-            
-            # Create Excel response
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"task_results_{task.id}_{timestamp}.xlsx"
-            
-            response = HttpResponse(
-                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to export results: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            response["Content-Disposition"] = f'attachment; filename="{filename}"'
-            
-            # Write DataFrame to Excel
-            df.to_excel(response, index=False, engine="openpyxl")
-            
-            return response
-            
+
+    @action(detail=True, methods=["get"], url_path="exporttocsv")
+    def export_to_csv(self, request, pk=None):
+        try:
+            task = self.get_object()
+            table = self._results_table(task)
+            if table is None:
+                return Response(
+                    {"error": "No results available for this task."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            from apps.agent_management.services.result_table import table_to_csv
+
+            return self._export_response(task, table_to_csv(table), "text/csv", "csv")
+
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to export results: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=True, methods=["get"], url_path="exporttoparquet")
+    def export_to_parquet(self, request, pk=None):
+        try:
+            task = self.get_object()
+            table = self._results_table(task)
+            if table is None:
+                return Response(
+                    {"error": "No results available for this task."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            from apps.agent_management.services.result_table import PARQUET_CONTENT_TYPE, table_to_parquet
+
+            return self._export_response(task, table_to_parquet(table), PARQUET_CONTENT_TYPE, "parquet")
+
         except Exception as e:
             return Response(
                 {"error": f"Failed to export results: {str(e)}"},
@@ -232,50 +322,25 @@ class TaskViewSet(OrganizationMixin, NBaselViewSet):
                     )
                 snowflake_config[field] = request.data[field]
             
-            if not task.process_results:
+            table = self._results_table(task)
+            if table is None:
                 return Response(
                     {"error": "No results available for this task."},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            # Parse the JSON string if it's a string
-            results_data = (
-                json.loads(task.process_results)
-                if isinstance(task.process_results, str)
-                else task.process_results
-            )
-            
-            # Ensure results_data is a list
-            if not isinstance(results_data, list):
-                results_data = [results_data]
-            
-            # Flatten the JSON data
-            flattened_data = []
-            for result in results_data:
-                if 'extractions' in result:
-                    for extraction_type, extractions in result['extractions'].items():
-                        if isinstance(extractions, list):
-                            for item in extractions:
-                                row = {
-                                    'TASK_ID': str(task.id),
-                                    'EXTRACTION_TYPE': extraction_type,
-                                    'ASSET': item.get('asset', ''),
-                                    'SOURCE': item.get('source', '')
-                                }
-                                # Add all fields from the nested 'data' dictionary
-                                if 'data' in item:
-                                    # Convert data keys to uppercase
-                                    data_dict = {k.upper(): v for k, v in item['data'].items()}
-                                    row.update(data_dict)
-                                flattened_data.append(row)
-            
-            # Convert flattened data to DataFrame
-            df = pd.DataFrame(flattened_data)
-            
-            # Upload to Snowflake
+
+            from apps.agent_management.services.result_table import with_extraction_type
+            from apps.common.utils.snowflake_utils import SnowflakeManager
+
+            # Bulk load into Snowflake; "merge" updates the rows of assets exported before and inserts
+            # the rest (rows of assets since removed from the task are kept)
             snowflake = SnowflakeManager(snowflake_config)
             table_name = request.data.get('table_name', 'TASK_RESULTS')
-            result = snowflake.upload_dataframe(df, table_name)
+            mode = request.data.get('mode', 'append')
+            try:
+                result = snowflake.bulk_load(with_extraction_type(table), table_name, mode=mode)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response(
                 {
@@ -290,4 +355,4 @@ class TaskViewSet(OrganizationMixin, NBaselViewSet):
             return Response(
                 {"error": f"Failed to export to Snowflake: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
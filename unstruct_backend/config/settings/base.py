@@ -44,6 +44,9 @@ ENABLE_COGNITO_AUTH = env.bool("ENABLE_COGNITO_AUTH", default=True)
 
 # Stripe Settings
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY', default='')
+STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET', default='')
+# Seconds a customer's resolved subscription is cached; the Stripe webhook drops it earlier on changes
+SUBSCRIPTION_CACHE_TTL = env.int('SUBSCRIPTION_CACHE_TTL', default=300)
 
 # Subscription Plan Names - Configurable through env
 SUBSCRIPTION_PLAN_NAMES = {
@@ -188,6 +191,12 @@ DATABASES = {
     }
 }
 
+# Shared cache (subscription lookups and similar); point CACHE_URL at Redis or Memcached so
+# every worker sees webhook invalidations, e.g. redis://host:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -274,6 +283,11 @@ GOOGLE_DRIVE_CREDENTIALS = {
 USER_POOL_ID = env('USER_POOL_ID', default='')
 AWS_REGION = env('AWS_REGION', default='')
 USER_POOL_CLIENT_ID = env('USER_POOL_CLIENT_ID', default='')
+# Seconds the pool's signing keys (JWKS) are kept, minimum seconds between refetches for an
+# unknown key id (key rotation), and verified tokens remembered until they expire
+COGNITO_JWKS_TTL = env.int('COGNITO_JWKS_TTL', default=6 * 60 * 60)
+COGNITO_JWKS_REFRESH_INTERVAL = env.int('COGNITO_JWKS_REFRESH_INTERVAL', default=60)
+COGNITO_TOKEN_CACHE_SIZE = env.int('COGNITO_TOKEN_CACHE_SIZE', default=10000)
 
 # Logging configuration
 
@@ -347,6 +361,152 @@ OPENAI_API_KEY = env("OPENAI_API_KEY", default='')
 
 GEMINI_API_KEY = env("GEMINI_API_KEY", default='')
 
+# Background job queue
+# Tasks are processed by `python manage.py run_job_worker`, not inside the web workers
+JOB_QUEUE_BROKER = env("JOB_QUEUE_BROKER", default="apps.core.services.job_queue.DatabaseJobBroker")
+JOB_WORKER_CONCURRENCY = env.int("JOB_WORKER_CONCURRENCY", default=2)
+JOB_WORKER_POLL_INTERVAL = env.float("JOB_WORKER_POLL_INTERVAL", default=2.0)  # seconds
+JOB_VISIBILITY_TIMEOUT = env.int("JOB_VISIBILITY_TIMEOUT", default=300)  # seconds before a silent worker's job is re-queued
+JOB_MAX_ATTEMPTS = env.int("JOB_MAX_ATTEMPTS", default=3)
+JOB_RETRY_DELAY = env.int("JOB_RETRY_DELAY", default=30)  # seconds, multiplied by the attempt number
+JOB_HANDLERS = {
+    "process_task": "apps.agent_management.jobs.process_task_job",
+    "ingest_assets": "apps.core.services.asset_ingestion.ingest_assets_job",
+}
+# Callables run once when a worker starts, so the first job does not pay for loading models
+JOB_WORKER_PRELOAD = env.list(
+    "JOB_WORKER_PRELOAD",
+    default=["apps.agent_management.services.ai_service.vector_store.preload"],
+)
+
+# Maximum concurrent LLM calls per provider in one worker process
+LLM_DEFAULT_MAX_IN_FLIGHT = env.int("LLM_DEFAULT_MAX_IN_FLIGHT", default=4)
+LLM_MAX_IN_FLIGHT = {
+    "openai": env.int("OPENAI_MAX_IN_FLIGHT", default=8),
+    "gemini": env.int("GEMINI_MAX_IN_FLIGHT", default=4),
+}
+
+# Provider rate limits per API key, shared by all workers through the database ("local" keeps
+# them per process); 0 means unlimited. Concurrency adapts below LLM_MAX_IN_FLIGHT: halved on
+# 429/503 or calls slower than LLM_LATENCY_TARGET seconds (0 = ignore latency). Overload and
+# server errors are retried up to LLM_RETRY_MAX_ATTEMPTS times with jittered exponential backoff
+LLM_RATE_LIMIT_BACKEND = env("LLM_RATE_LIMIT_BACKEND", default="database")
+LLM_RATE_LIMITS = {
+    "openai": {
+        "requests_per_minute": env.int("OPENAI_REQUESTS_PER_MINUTE", default=500),
+        "tokens_per_minute": env.int("OPENAI_TOKENS_PER_MINUTE", default=200_000),
+    },
+    "gemini": {
+        "requests_per_minute": env.int("GEMINI_REQUESTS_PER_MINUTE", default=300),
+        "tokens_per_minute": env.int("GEMINI_TOKENS_PER_MINUTE", default=1_000_000),
+    },
+}
+LLM_LATENCY_TARGET = env.float("LLM_LATENCY_TARGET", default=0)
+LLM_RETRY_MAX_ATTEMPTS = env.int("LLM_RETRY_MAX_ATTEMPTS", default=6)
+LLM_RETRY_BASE_DELAY = env.float("LLM_RETRY_BASE_DELAY", default=1.0)
+LLM_RETRY_MAX_DELAY = env.float("LLM_RETRY_MAX_DELAY", default=60.0)
+
+# Persistent LLM completion cache: identical requests (model, prompt, retrieved context, asset
+# content) are answered from the database; each organization's least recently used entries
+# are evicted past LLM_CACHE_MAX_BYTES_PER_ORG after a task runs (0 = no limit)
+LLM_CACHE_ENABLED = env.bool("LLM_CACHE_ENABLED", default=True)
+LLM_CACHE_MAX_BYTES_PER_ORG = env.int("LLM_CACHE_MAX_BYTES_PER_ORG", default=256 * 1024 ** 2)
+
+# Gemini Files API uploads, recorded in the database and shared by all workers: PDFs uploaded
+# concurrently before extraction, and seconds an upload must still be valid to be reused
+GEMINI_UPLOAD_CONCURRENCY = env.int("GEMINI_UPLOAD_CONCURRENCY", default=8)
+GEMINI_UPLOAD_EXPIRY_MARGIN = env.int("GEMINI_UPLOAD_EXPIRY_MARGIN", default=2 * 60 * 60)
+
+# Local content-addressed cache for downloaded asset files, shared by all workers on a host
+ASSET_CACHE_DIR = env("ASSET_CACHE_DIR", default="/tmp/unstruct/cache")
+ASSET_CACHE_MAX_BYTES = env.int("ASSET_CACHE_MAX_BYTES", default=20 * 1024 ** 3)  # least recently used files are evicted past this
+ASSET_CACHE_MIN_AGE = env.int("ASSET_CACHE_MIN_AGE", default=600)  # seconds a file is kept after its last use, regardless of size
+ASSET_DOWNLOAD_CHUNK_SIZE = env.int("ASSET_DOWNLOAD_CHUNK_SIZE", default=8 * 1024 * 1024)  # bytes held in memory per streamed download
+ASSET_PREFETCH_CONCURRENCY = env.int("ASSET_PREFETCH_CONCURRENCY", default=4)  # parallel downloads before extraction starts
+
+# Shared S3 clients: connections pooled per client (enough for concurrent transfers), attempts per
+# request, and downloads above S3_TRANSFER_THRESHOLD bytes fetched as S3_TRANSFER_CONCURRENCY
+# parallel ranged GETs of S3_TRANSFER_CHUNK_SIZE bytes
+S3_MAX_POOL_CONNECTIONS = env.int("S3_MAX_POOL_CONNECTIONS", default=50)
+S3_MAX_ATTEMPTS = env.int("S3_MAX_ATTEMPTS", default=5)
+S3_TRANSFER_THRESHOLD = env.int("S3_TRANSFER_THRESHOLD", default=16 * 1024 * 1024)
+S3_TRANSFER_CHUNK_SIZE = env.int("S3_TRANSFER_CHUNK_SIZE", default=8 * 1024 * 1024)
+S3_TRANSFER_CONCURRENCY = env.int("S3_TRANSFER_CONCURRENCY", default=8)
+
+# Direct uploads: "s3" hands out presigned multipart URLs for AWS_STORAGE_BUCKET_NAME, "local"
+# (or s3 without a bucket) stores under ASSET_UPLOAD_LOCAL_DIR through signed part URLs served
+# by Django, for development; part size (raised for very large files) and URL lifetime in seconds
+ASSET_UPLOAD_BACKEND = env("ASSET_UPLOAD_BACKEND", default="s3")
+ASSET_UPLOAD_LOCAL_DIR = env("ASSET_UPLOAD_LOCAL_DIR", default="/tmp/unstruct/uploads")
+ASSET_UPLOAD_PART_SIZE = env.int("ASSET_UPLOAD_PART_SIZE", default=16 * 1024 * 1024)
+ASSET_UPLOAD_URL_EXPIRY = env.int("ASSET_UPLOAD_URL_EXPIRY", default=6 * 60 * 60)
+
+# Prefixes of AWS_STORAGE_BUCKET_NAME where uploads created before storage keys were recorded may
+# be stored under their file name; each is tried with one HEAD request ("" is the bucket root)
+ASSET_STORAGE_KEY_PREFIXES = env.list("ASSET_STORAGE_KEY_PREFIXES", default=[""])
+
+# Bulk imports from S3, Google Drive and Dropbox: assets inserted per query, and folders listed in parallel
+ASSET_INGEST_BATCH_SIZE = env.int("ASSET_INGEST_BATCH_SIZE", default=1000)
+ASSET_INGEST_LIST_CONCURRENCY = env.int("ASSET_INGEST_LIST_CONCURRENCY", default=8)
+
+# Video frame sampling: candidate rate, scene-change threshold (histogram distance 0-1, 0 keeps every
+# candidate) and an upper bound on frames per video
+VIDEO_SAMPLE_FPS = env.float("VIDEO_SAMPLE_FPS", default=1.0)
+VIDEO_SCENE_THRESHOLD = env.float("VIDEO_SCENE_THRESHOLD", default=0.3)
+VIDEO_MAX_FRAMES = env.int("VIDEO_MAX_FRAMES", default=64)
+
+# Audio transcription: "deepgram" or "local" (placeholder words, for development and tests).
+# Audio longer than TRANSCRIPTION_CHUNK_SECONDS is cut in the longest silence (quieter than
+# TRANSCRIPTION_SILENCE_DB for at least TRANSCRIPTION_MIN_SILENCE_SECONDS) found within the
+# TRANSCRIPTION_SILENCE_SEARCH_SECONDS before each limit; chunks are transcribed concurrently
+# with retries, and transcripts are embedded in segments of about TRANSCRIPT_SEGMENT_SECONDS
+DEEPGRAM_API_KEY = env.str("DEEPGRAM_API_KEY", default="")
+TRANSCRIPTION_BACKEND = env.str("TRANSCRIPTION_BACKEND", default="deepgram")
+TRANSCRIPTION_CHUNK_SECONDS = env.float("TRANSCRIPTION_CHUNK_SECONDS", default=300.0)
+TRANSCRIPTION_SILENCE_SEARCH_SECONDS = env.float("TRANSCRIPTION_SILENCE_SEARCH_SECONDS", default=30.0)
+TRANSCRIPTION_SILENCE_DB = env.float("TRANSCRIPTION_SILENCE_DB", default=-40.0)
+TRANSCRIPTION_MIN_SILENCE_SECONDS = env.float("TRANSCRIPTION_MIN_SILENCE_SECONDS", default=0.3)
+TRANSCRIPTION_CONCURRENCY = env.int("TRANSCRIPTION_CONCURRENCY", default=4)
+TRANSCRIPTION_MAX_ATTEMPTS = env.int("TRANSCRIPTION_MAX_ATTEMPTS", default=3)
+TRANSCRIPT_SEGMENT_SECONDS = env.float("TRANSCRIPT_SEGMENT_SECONDS", default=30.0)
+
+# PDF page rendering for image indexing: resolution and image format of rendered pages, page
+# ranges rendered in parallel (0 = one per CPU) and pages per range
+PDF_RASTER_DPI = env.int("PDF_RASTER_DPI", default=200)
+PDF_RASTER_FORMAT = env("PDF_RASTER_FORMAT", default="jpeg")
+PDF_RASTER_WORKERS = env.int("PDF_RASTER_WORKERS", default=0)
+PDF_RASTER_PAGES_PER_RANGE = env.int("PDF_RASTER_PAGES_PER_RANGE", default=8)
+
+# Task result files (CSV, NDJSON and a manifest), streamed while a task runs: "s3" uploads
+# to AWS_STORAGE_BUCKET_NAME in multipart parts of RESULT_UPLOAD_PART_SIZE bytes, "local"
+# (or s3 without a bucket) writes under RESULT_LOCAL_DIR for development
+RESULT_STORAGE_BACKEND = env("RESULT_STORAGE_BACKEND", default="s3")
+RESULT_UPLOAD_PART_SIZE = env.int("RESULT_UPLOAD_PART_SIZE", default=8 * 1024 * 1024)
+RESULT_LOCAL_DIR = env("RESULT_LOCAL_DIR", default="/tmp/unstruct/results")
+
+# Snowflake exports: rows per staged Parquet file, files PUT concurrently, idle connections kept
+# per credential set and how long they stay reusable; "local" loads into an in-process test double
+SNOWFLAKE_BACKEND = env("SNOWFLAKE_BACKEND", default="snowflake")
+SNOWFLAKE_EXPORT_ROWS_PER_FILE = env.int("SNOWFLAKE_EXPORT_ROWS_PER_FILE", default=500_000)
+SNOWFLAKE_PUT_PARALLEL = env.int("SNOWFLAKE_PUT_PARALLEL", default=8)
+SNOWFLAKE_POOL_SIZE = env.int("SNOWFLAKE_POOL_SIZE", default=2)
+SNOWFLAKE_POOL_IDLE_TIMEOUT = env.int("SNOWFLAKE_POOL_IDLE_TIMEOUT", default=10 * 60)
+
+# LanceDB root for vector tables. A local path is private to each host, which then builds and
+# keeps its own tables; a shared URI (e.g. s3://bucket/vectors) lets all hosts reuse them
+VECTOR_STORE_URI = env.str("VECTOR_STORE_URI", default="/tmp")
+
+# CLIP embedding: images/texts per forward pass, image decode threads, torch intra-op threads (0 = torch default)
+CLIP_BATCH_SIZE = env.int("CLIP_BATCH_SIZE", default=32)
+CLIP_PREPROCESS_WORKERS = env.int("CLIP_PREPROCESS_WORKERS", default=4)
+CLIP_TORCH_THREADS = env.int("CLIP_TORCH_THREADS", default=0)
+
+# Extraction mode: "per_field" sends one request per field, "multi_field" packs all fields
+# of an asset into as few requests as fit the batch limits below
+EXTRACTION_MODE = env("EXTRACTION_MODE", default="per_field")
+EXTRACTION_MAX_FIELDS_PER_CALL = env.int("EXTRACTION_MAX_FIELDS_PER_CALL", default=25)
+EXTRACTION_BATCH_TOKEN_BUDGET = env.int("EXTRACTION_BATCH_TOKEN_BUDGET", default=6000)  # field list + JSON response
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ['*']
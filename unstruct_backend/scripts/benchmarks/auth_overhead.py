@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Measure the per-request cost of authenticating a Cognito ID token.
+
+Compares three paths for the same token:
+
+    fetch + verify   signing keys fetched for every request, as when a new Cognito object
+                     was built per request (the fetch is simulated with --jwks-latency ms)
+    verify           signature and claims checked against the process-wide JWKS cache
+    token cache hit  the token was verified before; only the LRU lookup remains
+
+The one user lookup by primary key that follows a cache hit is not included. Keys and
+tokens are generated locally, so nothing is sent to AWS:
+
+    python scripts/benchmarks/auth_overhead.py
+    python scripts/benchmarks/auth_overhead.py --requests 5000 --jwks-latency 80
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BACKEND_DIR)
+
+from apps.common.auth.cognito_tokens import CognitoTokenVerifier, JWKSCache, VerifiedTokenCache  # noqa: E402
+
+REGION = "us-east-1"
+POOL_ID = "us-east-1_benchmark"
+CLIENT_ID = "benchmark-client"
+
+
+def make_token():
+    import jwt
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jwt.algorithms import RSAAlgorithm
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwks = {"keys": [{**json.loads(RSAAlgorithm.to_jwk(key.public_key())), "kid": "benchmark"}]}
+    token = jwt.encode(
+        {
+            "sub": "00000000-0000-4000-8000-000000000001",
+            "email": "benchmark@example.com",
+            "aud": CLIENT_ID,
+            "iss": f"https://cognito-idp.{REGION}.amazonaws.com/{POOL_ID}",
+            "token_use": "id",
+            "exp": int(time.time()) + 3600,
+        },
+        key,
+        algorithm="RS256",
+        headers={"kid": "benchmark"},
+    )
+    return token, jwks
+
+
+def per_request(fn, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per measured path")
+    parser.add_argument("--jwks-latency", type=float, default=50.0, help="simulated JWKS fetch time in ms")
+    args = parser.parse_args()
+
+    token, jwks = make_token()
+
+    def slow_fetch(url):
+        time.sleep(args.jwks_latency / 1000)
+        return jwks
+
+    def verifier(fetch):
+        cache = JWKSCache("https://example.invalid/jwks.json", ttl=3600, refresh_interval=60, fetch=fetch)
+        return CognitoTokenVerifier(POOL_ID, CLIENT_ID, REGION, jwks=cache)
+
+    shared = verifier(lambda url: jwks)
+    shared.verify(token)
+    token_cache = VerifiedTokenCache(max_size=10000)
+    token_cache.set(token, "00000000-0000-4000-8000-000000000001", time.time() + 3600)
+
+    # Fetching for every request is slow enough that a tenth of the requests gives a stable figure
+    results = [
+        ("fetch + verify", per_request(lambda: verifier(slow_fetch).verify(token), max(args.requests // 10, 1))),
+        ("verify", per_request(lambda: shared.verify(token), args.requests)),
+        ("token cache hit", per_request(lambda: token_cache.get(token), args.requests)),
+    ]
+
+    print(f"{args.requests} requests, simulated JWKS fetch {args.jwks_latency:.0f}ms")
+    print(f"{'path':>16}  {'us/request':>12}")
+    for name, seconds in results:
+        print(f"{name:>16}  {seconds * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
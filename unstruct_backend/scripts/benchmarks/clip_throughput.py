@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Measure CLIP image embedding throughput (images/sec) for different batch sizes.
+
+Embeds the same set of images with CLIPEmbeddings at each batch size and reports images
+per second. Batch size 1 matches the old one-image-per-forward-pass behaviour. Uses the
+images in --image-dir if given, otherwise generates random 1024x768 JPEGs:
+
+    python scripts/benchmarks/clip_throughput.py
+    python scripts/benchmarks/clip_throughput.py --image-dir /tmp/frames --batch-sizes 1,16,64 --threads 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BACKEND_DIR)
+
+from apps.agent_management.services.ai_service.clip_embeddings import CLIPEmbeddings  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def generate_images(directory, count):
+    import numpy as np
+    from PIL import Image
+
+    paths = []
+    rng = np.random.default_rng(0)
+    for index in range(count):
+        path = os.path.join(directory, f"image_{index:05d}.jpg")
+        Image.fromarray(rng.integers(0, 255, (768, 1024, 3), dtype=np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image-dir", help="directory of images to embed instead of generated ones")
+    parser.add_argument("--images", type=int, default=128, help="number of images to generate")
+    parser.add_argument("--batch-sizes", default="1,8,16,32,64", help="comma-separated batch sizes")
+    parser.add_argument("--workers", type=int, default=4, help="image preprocessing threads")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.image_dir:
+            paths = sorted(
+                os.path.join(args.image_dir, name)
+                for name in os.listdir(args.image_dir)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+        else:
+            paths = generate_images(tmp, args.images)
+
+        embeddings = CLIPEmbeddings(preprocess_workers=args.workers, torch_threads=args.threads)
+        # Warm up so one-off allocation is not counted against the first batch size
+        embeddings.embed_image(paths[:2])
+
+        print(f"{len(paths)} images, {args.workers} preprocessing threads")
+        print(f"{'batch size':>10}  {'seconds':>8}  {'images/sec':>10}")
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            embeddings.batch_size = batch_size
+            started = time.perf_counter()
+            embeddings.embed_image(paths)
+            elapsed = time.perf_counter() - started
+            print(f"{batch_size:>10}  {elapsed:>8.2f}  {len(paths) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
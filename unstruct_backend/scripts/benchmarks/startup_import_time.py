@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""Measure how long Django takes to start, and which imports it spends that time on.
+
+Runs `python -X importtime manage.py check` several times and reports the median wall
+time, the total time spent importing modules and the most expensive top-level imports.
+With --rev the same measurement is taken on another git revision, checked out into a
+temporary worktree, to compare before and after a change:
+
+    python scripts/benchmarks/startup_import_time.py
+    python scripts/benchmarks/startup_import_time.py --rev HEAD~1 --runs 5
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# import time: self [us] | cumulative | imported package
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure_once(backend_dir):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "manage.py", "check"],
+        cwd=backend_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        tail = "\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"manage.py check failed in {backend_dir}:\n{tail}")
+
+    total_us = 0
+    top_level = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        total_us += int(self_us)
+        # importtime indents nested imports by two spaces per level
+        if len(indent) <= 1:
+            top_level[module] = top_level.get(module, 0) + int(cumulative_us)
+    return wall, total_us / 1e6, top_level
+
+
+def measure(backend_dir, runs):
+    walls, imports, modules = [], [], {}
+    for _ in range(runs):
+        wall, import_seconds, top_level = measure_once(backend_dir)
+        walls.append(wall)
+        imports.append(import_seconds)
+        for module, cumulative_us in top_level.items():
+            modules.setdefault(module, []).append(cumulative_us / 1e6)
+    return {
+        "wall": statistics.median(walls),
+        "imports": statistics.median(imports),
+        "modules": {module: statistics.median(values) for module, values in modules.items()},
+    }
+
+
+def checkout(rev):
+    """Check out `rev` into a temporary worktree and return (worktree, backend dir inside it)"""
+    toplevel = subprocess.check_output(["git", "rev-parse", "--show-toplevel"], cwd=BACKEND_DIR, text=True).strip()
+    worktree = tempfile.mkdtemp(prefix="startup-bench-")
+    subprocess.run(["git", "worktree", "add", "--detach", worktree, rev], cwd=toplevel, check=True, capture_output=True)
+    backend_dir = os.path.join(worktree, os.path.relpath(BACKEND_DIR, toplevel))
+    # Settings read .env files, which are not tracked
+    for name in (".env", os.path.join("..", ".env")):
+        source = os.path.join(BACKEND_DIR, name)
+        if os.path.exists(source):
+            shutil.copy(source, os.path.join(backend_dir, name))
+    return worktree, backend_dir
+
+
+def remove_worktree(worktree):
+    subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=BACKEND_DIR, capture_output=True)
+    shutil.rmtree(worktree, ignore_errors=True)
+
+
+def report(label, stats, top):
+    print(f"{label}: wall {stats['wall']:.2f}s, imports {stats['imports']:.2f}s")
+    heaviest = sorted(stats["modules"].items(), key=lambda item: item[1], reverse=True)[:top]
+    for module, seconds in heaviest:
+        print(f"    {seconds:7.3f}s  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rev", help="git revision to compare the working tree against")
+    parser.add_argument("--runs", type=int, default=3, help="runs per tree; the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="number of top-level imports to list")
+    args = parser.parse_args()
+
+    current = measure(BACKEND_DIR, args.runs)
+    if args.rev:
+        worktree, backend_dir = checkout(args.rev)
+        try:
+            before = measure(backend_dir, args.runs)
+        finally:
+            remove_worktree(worktree)
+        report(args.rev, before, args.top)
+        print()
+    report("working tree", current, args.top)
+
+    if args.rev:
+        print()
+        print(f"wall time:   {before['wall']:.2f}s -> {current['wall']:.2f}s")
+        print(f"import time: {before['imports']:.2f}s -> {current['imports']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+#!/bin/sh
+
+# Change to the directory containing manage.py (we're already in /app/unstruct_backend)
+cd /app/unstruct_backend
+
+echo "Starting job worker"
+exec python manage.py run_job_worker \
+    --concurrency "${JOB_WORKER_CONCURRENCY:-2}"